@@ -1,20 +1,34 @@
-import requests
-import numpy as np
-
+# numpy, pdfminer and the pools are imported on first use, so that importing this module
+# (e.g. in every worker process of a pool) stays cheap and works without pdfminer
+import os
+import re
 import sys
-try:
-    from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
-    from pdfminer.pdfpage import PDFPage
-    from pdfminer.converter import XMLConverter, HTMLConverter, TextConverter
-    from pdfminer.layout import LAParams
-except ImportError:
-    raise ImportError('pdfminer is not installed. Install with pip install pdfminer.six')
+import mmap
+from contextlib import contextmanager
 import io
 
-def _pdfparser(filename):
-    ''' Parses a pdf into plain text string using pdfminer
+import httpcache
+import tracing
+
+# Code hosting sites whose repositories are extracted from the papers
+REPOSITORY_HOSTS = ('github.com', 'gitlab.com', 'bitbucket.org')
+
+# Downloaded pdfs, one file per arxiv id
+PDF_CACHE_DIR = os.path.join(httpcache.CACHE_DIR, 'arxiv')
+
+def _pdfpages(filename, max_pages=None):
+    ''' Yields the plain text of each page of a pdf in turn, using pdfminer
+
+        `filename` can also be a binary file object. Stops after `max_pages` pages if given.
     '''
-    fp = open(filename, 'rb')
+    try:
+        from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+        from pdfminer.pdfpage import PDFPage
+        from pdfminer.converter import TextConverter
+        from pdfminer.layout import LAParams
+    except ImportError:
+        raise ImportError('pdfminer is not installed. Install with pip install pdfminer.six')
+    fp = open(filename, 'rb') if isinstance(filename, str) else filename
     rsrcmgr = PDFResourceManager()
     retstr = io.StringIO()
     codec = 'utf-8'
@@ -22,45 +36,247 @@ def _pdfparser(filename):
     device = TextConverter(rsrcmgr, retstr, codec=codec, laparams=laparams)
     # Create a PDF interpreter object.
     interpreter = PDFPageInterpreter(rsrcmgr, device)
-    # Process each page contained in the document.
-    strs = []
-    for idx, page in enumerate(PDFPage.get_pages(fp)):
-        interpreter.process_page(page)
-        strs.append(retstr.getvalue().replace('\n', ' '))
-    return(' '.join(strs))
+    try:
+        # Process each page contained in the document.
+        for page in PDFPage.get_pages(fp, maxpages=max_pages or 0):
+            interpreter.process_page(page)
+            yield retstr.getvalue().replace('\n', ' ')
+            # Empty the buffer so that every page is only returned once
+            retstr.seek(0)
+            retstr.truncate(0)
+    finally:
+        device.close()
+        if fp is not filename:
+            fp.close()
+
+
+def _pdfparser(filename, max_pages=None):
+    ''' Parses a pdf into plain text string using pdfminer
+
+        `filename` can also be a binary file object.
+    '''
+    return ' '.join(_pdfpages(filename, max_pages))
+
+
+def _pdf_path(arxiv_id):
+    ''' Returns the location of an arxiv pdf in `PDF_CACHE_DIR`
+    '''
+    return os.path.join(PDF_CACHE_DIR, arxiv_id.replace('arXiv:', '').replace('/', '_') + '.pdf')
+
+
+def _fetch_pdf(arxiv_id):
+    ''' Returns the path of an arxiv pdf, downloading it only if it is not yet in `PDF_CACHE_DIR`
+
+        The download is streamed to a temporary file which is renamed once complete, so that
+        parallel workers never read a partial pdf or overwrite each other's downloads.
+    '''
+    path = _pdf_path(arxiv_id)
+    if os.path.exists(path):
+        return path
+    url = 'https://arxiv.org/pdf/{}.pdf'.format(arxiv_id)
+    # pdfs are cached here rather than in the response cache
+    response = httpcache.get(url, cache=False, stream=True)
+    response.raise_for_status()
+    import tempfile
+    os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=PDF_CACHE_DIR, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=1 << 16):
+                f.write(chunk)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return path
+
+
+@contextmanager
+def _open_pdf(path):
+    ''' Memory-maps a pdf, for pdfminer to read without copying it
+    '''
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError('{} is empty'.format(path))
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as pdf:
+            yield pdf
 
 
 def arxiv2string(arxiv_id):
     ''' Download a pdf from arxiv and convert it into a plain text string
     '''
-    url = 'https://arxiv.org/pdf/{}.pdf'.format(arxiv_id)
-    response = requests.get(url)
-    with open('/tmp/temparxiv.pdf', 'wb') as f:
-        f.write(response.content)
-    return _pdfparser('/tmp/temparxiv.pdf')
+    with _open_pdf(_fetch_pdf(arxiv_id)) as pdf, tracing.span('pdf_parse', arxiv_id=arxiv_id):
+        return _pdfparser(pdf)
 
 
 def search_in_string(string, search_term):
     ''' Given a string, will find the unique instances of `search_term` up to the nearest
         space or full stop.
     '''
-    start = 0
-    hit = np.nan
-    matches = []
-    while hit != -1:
-        hit = string.find(search_term, start, len(string))
-        endpoints = np.asarray([string.find(endpoint, hit + len(search_term), hit  + len(search_term) + 100) for endpoint in [' ', '.']])
-        endpoints = endpoints[endpoints != -1]
-        if len(endpoints) < 1:
-            hit_end = len(string)
-        else:
-            hit_end = np.min(endpoints)
-        matches.append(string[hit:hit_end])
-        start = hit + len(search_term)
-    matches = np.unique(np.asarray(matches))
+    import numpy as np
+    pattern = re.compile(re.escape(search_term) + '[^ .]*')
+    matches = np.unique(np.asarray(pattern.findall(string), dtype=str))
     matches = matches[matches != '']
     return matches
 
-def arxiv2github(arxiv_id):
-    string = arxiv2string(arxiv_id)
-    return search_in_string(string, 'github.com/')
+
+def _preceded_by(start):
+    ''' Returns lookbehinds checking that the text before the current position is `start`, which
+        does not continue a longer name (e.g. 'notgithub.'), optionally after 'www.'
+    '''
+    start = re.escape(start)
+    return r'(?<={0})(?:(?<![\w.-]{0})|(?<=www\.{0})(?<![\w.-]www\.{0}))'.format(start)
+
+
+def _repository_pattern(hosts):
+    ''' Compiles a single regex matching repository urls on `hosts` as well as zenodo records
+
+        Every alternative starts at the last '.' of the host name, with the rest of the host
+        checked by a lookbehind, so that `re` can skip ahead to the next '.' instead of trying
+        each alternative at every character. Group `h<i>` is set when `hosts[i]` matched.
+    '''
+    alternatives = []
+    for idx, host in enumerate(hosts):
+        dot = host.rindex('.')
+        alternatives.append(r'{}(?P<h{}>){}'.format(_preceded_by(host[:dot + 1]), idx, re.escape(host[dot + 1:])))
+    return re.compile(r'\.(?:(?:{})/(?P<owner>[\w.-]+)/(?P<repo>[\w.-]+)'
+                      r'|{}org/records?/(?P<record>\d+)'
+                      r'|{}5281/zenodo\.(?P<doi>\d+))'.format('|'.join(alternatives), _preceded_by('zenodo.'),
+                                                              _preceded_by('10.')))
+
+
+_REPOSITORY_PATTERNS = {}
+
+
+def extract_repositories(string, hosts=REPOSITORY_HOSTS):
+    ''' Finds the unique code repositories mentioned in a string in a single regex pass.
+
+        Returns a sorted list of lowercase `(host, owner, repo)` tuples. Trailing full stops
+        and `.git` suffixes are dropped from repository names, and parentheses, commas and
+        line breaks end a url, as in `githubwebstats._clean`. A host must not continue a
+        longer name, e.g. 'notgithub.com/a/b' is not a repository. Zenodo DOIs and record
+        urls are returned as `('zenodo.org', 'record', record_id)`.
+    '''
+    hosts = tuple(host.lower() for host in hosts)
+    if hosts not in _REPOSITORY_PATTERNS:
+        _REPOSITORY_PATTERNS[hosts] = _repository_pattern(hosts)
+    repositories = set()
+    for match in _REPOSITORY_PATTERNS[hosts].finditer(string.lower()):
+        record = match.group('record') or match.group('doi')
+        if record is not None:
+            repositories.add(('zenodo.org', 'record', record))
+            continue
+        host = next(host for idx, host in enumerate(hosts) if match.group('h{}'.format(idx)) is not None)
+        repo = match.group('repo').rstrip('.')
+        if repo.endswith('.git'):
+            repo = repo[:-4]
+        if len(repo) > 0:
+            repositories.add((host, match.group('owner'), repo))
+    return sorted(repositories)
+
+
+def repositories_in_pages(pages, hosts=REPOSITORY_HOSTS):
+    ''' Like `extract_repositories`, but reads an iterable of page texts one page at a time and
+        returns the repositories as sorted 'host/owner/repo' urls, e.g. 'github.com/a/b'.
+    '''
+    repositories = set()
+    for page in pages:
+        repositories.update(extract_repositories(page, hosts))
+    return ['/'.join(repository) for repository in sorted(repositories)]
+
+
+def arxiv2github(arxiv_id, max_pages=None, hosts=REPOSITORY_HOSTS):
+    ''' Finds the repository urls in an arxiv paper, reading at most `max_pages` pages.
+    '''
+    with _open_pdf(_fetch_pdf(arxiv_id)) as pdf, tracing.span('url_extraction', arxiv_id=arxiv_id):
+        return repositories_in_pages(tracing.timed(_pdfpages(pdf, max_pages), 'pdf_parse', arxiv_id=arxiv_id),
+                                     hosts)
+
+
+def _search_pdf(path, hosts, max_pages=None):
+    ''' Parses a downloaded pdf and extracts its repositories; runs in a worker process.
+    '''
+    name = os.path.basename(path)
+    with _open_pdf(path) as pdf, tracing.span('url_extraction', pdf=name):
+        return repositories_in_pages(tracing.timed(_pdfpages(pdf, max_pages), 'pdf_parse', pdf=name), hosts)
+
+
+def arxiv2github_many(arxiv_ids, workers=None, download_workers=8, hosts=REPOSITORY_HOSTS, max_pages=None):
+    ''' Finds the repository urls (see `repositories_in_pages`) in many arxiv papers in parallel.
+
+        Papers are downloaded (unless already in `PDF_CACHE_DIR`) on `download_workers` threads
+        and parsed on a pool of `workers` processes (default: one per core), with a bounded
+        number of papers in flight. The processes are not forked from this one, which may
+        hold locks of other threads (e.g. the downloaders, or other stages of pipeline.py).
+        Yields `(arxiv_id, urls)` as each paper finishes, so not in input order.
+        A paper which fails to download or parse is reported and yielded with `urls = None`;
+        if it crashes its worker process, so are the other papers in the pool, which is replaced.
+        Only the first `max_pages` pages of each paper are read if given.
+    '''
+    import multiprocessing
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+    from concurrent.futures.process import BrokenProcessPool
+    # A forked child may inherit a lock held by another thread, e.g. the one of `tracing`, and deadlock
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+    arxiv_ids = iter(arxiv_ids)
+    workers = workers or os.cpu_count()
+    window = download_workers + 2 * workers
+    pending = {}
+    parser = ProcessPoolExecutor(workers, mp_context=context)
+    with ThreadPoolExecutor(download_workers) as downloader:
+        def fill():
+            for arxiv_id in arxiv_ids:
+                pending[downloader.submit(_fetch_pdf, arxiv_id)] = ('download', arxiv_id)
+                if len(pending) >= window:
+                    return
+
+        try:
+            fill()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, arxiv_id = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # A worker which died (e.g. pdfminer crashing or running out of memory)
+                        # fails all papers in its pool with a BrokenProcessPool
+                        print('Warning: could not {} {}: {!r}'.format(stage, arxiv_id, e))
+                        yield arxiv_id, None
+                        continue
+                    if stage == 'parse':
+                        yield arxiv_id, result
+                        continue
+                    try:
+                        future = parser.submit(_search_pdf, result, hosts, max_pages)
+                    except BrokenProcessPool:
+                        parser.shutdown(wait=False)
+                        parser = ProcessPoolExecutor(workers, mp_context=context)
+                        future = parser.submit(_search_pdf, result, hosts, max_pages)
+                    pending[future] = ('parse', arxiv_id)
+                fill()
+        finally:
+            parser.shutdown()
+
+def main(args=None):
+    import argparse
+    import pandas as pd
+    import shards
+    from ledger import Ledger
+    parser = argparse.ArgumentParser(description='Find the repository urls in arxiv papers; writes arxiv2github.csv.')
+    parser.add_argument('--ids', default='ads_papers.csv', help='csv file with an arxiv_id column '
+                                                                '(default: ads_papers.csv, see pipeline.py)')
+    parser.add_argument('--shard', help='only read shard i of N (i/N); see shards.py')
+    args = parser.parse_args(args)
+    arxiv_ids = shards.select(pd.read_csv(args.ids)['arxiv_id'], args.shard)
+    with Ledger(shards.shard_path('arxiv2github.jsonl', args.shard)) as ledger:
+        for arxiv_id, urls in arxiv2github_many(ledger.todo(arxiv_ids)):
+            if urls is not None:
+                ledger.record(arxiv_id, {'arxiv_id': arxiv_id, 'urls': urls})
+        df = ledger.to_frame(arxiv_ids, columns=['arxiv_id', 'urls'])
+    df.to_csv(shards.shard_path('arxiv2github.csv', args.shard), index=False)
+
+
+if __name__ == "__main__":
+    main()
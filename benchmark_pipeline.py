@@ -0,0 +1,200 @@
+"""End-to-end benchmark of the crawl pipeline against `fixture_server`.
+
+Every stage of the pipeline is run on fake worlds of 10, 100, 1000 and 10000
+repositories and papers served with a fixed latency, each stage in a fresh
+process with empty caches.  For every scenario and stage it reports the
+requests issued, the bytes transferred, the wall-clock and CPU time and the
+peak resident memory.  Results are appended to `benchmark_pipeline.jsonl`
+together with the current git commit, so that a change can be compared
+against an earlier commit with `--compare`.
+
+Stages
+------
+ads        `query_ads.query_ads_many` over the repository urls
+arxiv      `arxiv2github.arxiv2github_many`: download, parse, extract urls
+urls       `githubwebstats._clean_github_urls` on an arxiv2github.csv
+web        `githubwebstats.github2stats` (probe mode)
+web-tree   `githubwebstats.github2stats` (tree mode)
+web-async  `githubwebstats.github2stats_async` (probe mode)
+api        `github_api_stats.get_repo_stats_many`
+
+Example use
+-----------
+$ python benchmark_pipeline.py --scales 10 100 --latency 0.02
+$ python benchmark_pipeline.py --scales 10 100 --compare HEAD~1
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+import fixture_server
+
+STAGES = ['ads', 'arxiv', 'urls', 'web', 'web-tree', 'web-async', 'api']
+SCALES = [10, 100, 1000, 10000]
+RESULTS = 'benchmark_pipeline.jsonl'
+
+
+def _serve(scale, seed, latency, queue):
+    """Runs a fixture server for a scenario; meant for a separate process."""
+    server = fixture_server.FixtureServer(fixture_server.make_world(scale, seed=seed), latency=latency,
+                                          rate_limit=10**9, seed=seed)
+    queue.put(server.url)
+    server.serve_forever()
+
+
+def _server_stats(url):
+    return requests.get(url + '/_fixture/stats').json()
+
+
+def _prepare(stage, world, workdir):
+    """Returns the function timed for `stage`; everything it needs is set up beforehand."""
+    import arxiv2github
+    import githubwebstats
+    github_urls = fixture_server.github_urls(world)
+    if stage == 'ads':
+        import query_ads
+        return lambda: list(query_ads.query_ads_many(github_urls, fields=['author', 'citation_count', 'identifier']))
+    if stage == 'arxiv':
+        return lambda: list(arxiv2github.arxiv2github_many(fixture_server.arxiv_ids(world)))
+    if stage == 'urls':
+        import pandas as pd
+        path = os.path.join(workdir, 'arxiv2github.csv')
+        rows = [{'arxiv_id': arxiv_id, 'urls': arxiv2github.search_in_string(' '.join(paper['pages']), 'github.com/')}
+                for arxiv_id, paper in world['papers'].items()]
+        pd.DataFrame(rows, columns=['arxiv_id', 'urls']).to_csv(path, index=False)
+        return lambda: githubwebstats._clean_github_urls(path)
+    if stage == 'web':
+        return lambda: githubwebstats.github2stats(github_urls)
+    if stage == 'web-tree':
+        return lambda: githubwebstats.github2stats(github_urls, mode='tree')
+    if stage == 'web-async':
+        return lambda: asyncio.run(githubwebstats.github2stats_async(github_urls))
+    if stage == 'api':
+        import github_api_stats
+        repositories = [tuple(url.split('/')[1:3]) for url in github_urls]
+        return lambda: github_api_stats.get_repo_stats_many(repositories)
+    raise ValueError('Unknown stage {!r}'.format(stage))
+
+
+def _cpu_time():
+    """CPU seconds used by this process and its finished children (e.g. pdf parsing workers)."""
+    usages = [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    return sum(usage.ru_utime + usage.ru_stime for usage in usages)
+
+
+def run_stage(stage, scale, seed, url):
+    """Runs one stage against the server at `url` and returns its measurements.
+
+    Meant to be called in a fresh process (see `main`), with the
+    environment pointing `httpcache` and the caches at the server and at
+    an empty directory.
+    """
+    world = fixture_server.make_world(scale, seed=seed)
+    func = _prepare(stage, world, os.environ['NASA_OSS_STATS_CACHE_DIR'])
+    before = _server_stats(url)
+    wall, cpu = time.perf_counter(), _cpu_time()
+    func()
+    wall, cpu = time.perf_counter() - wall, _cpu_time() - cpu
+    after = _server_stats(url)
+    usage = max(resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
+    return {'stage': stage, 'scale': scale,
+            'requests': sum(after['requests'].values()) - sum(before['requests'].values()),
+            'bytes': after['bytes_sent'] - before['bytes_sent'],
+            'wall': wall, 'cpu': cpu,
+            # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+            'peak_rss': usage if sys.platform == 'darwin' else usage * 1024}
+
+
+def _run_in_subprocess(stage, scale, seed, url):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ, NASA_OSS_STATS_BASE_URL=url, NASA_OSS_STATS_CACHE_DIR=cache_dir,
+                   GITHUB_TOKEN='fixture', ADS_DEV_KEY='fixture', TQDM_DISABLE='1')
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--run-stage', stage,
+                               '--scales', str(scale), '--seed', str(seed), '--url', url],
+                              env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError('Stage {} failed at scale {}:\n{}'.format(stage, scale, proc.stderr))
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _load_results(path, commit):
+    """Returns the latest result of every (scale, stage) recorded for `commit`."""
+    results = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                result = json.loads(line)
+                if result['commit'] == commit:
+                    results[result['scale'], result['stage']] = result
+    return results
+
+
+def _print_row(result, baseline=None):
+    row = '{scale:>6} {stage:>10} {requests:>9} {mb:>9.2f} {wall:>9.2f} {cpu:>9.2f} {rss:>9.1f}'.format(
+          mb=result['bytes'] / 1e6, rss=result['peak_rss'] / 1e6, **result)
+    if baseline is not None:
+        row += ' {:>9.2f}x'.format(baseline['wall'] / result['wall'])
+    print(row, flush=True)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=SCALES[:2],
+                        help='numbers of repositories and papers (default: 10 100)')
+    parser.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES)
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds per response (default: 0.02)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=RESULTS, help='JSON Lines file the results are appended to')
+    parser.add_argument('--compare', metavar='COMMIT', help='print the speedup against an earlier commit')
+    parser.add_argument('--run-stage', help=argparse.SUPPRESS)
+    parser.add_argument('--url', help=argparse.SUPPRESS)
+    args = parser.parse_args(args)
+
+    if args.run_stage:
+        print(json.dumps(run_stage(args.run_stage, args.scales[0], args.seed, args.url)))
+        return
+
+    commit = _git_commit()
+    baseline = None
+    if args.compare:
+        rev = subprocess.run(['git', 'rev-parse', '--short', args.compare], capture_output=True, text=True)
+        baseline = _load_results(args.output, rev.stdout.strip() or args.compare)
+    print('{:>6} {:>10} {:>9} {:>9} {:>9} {:>9} {:>9}'.format(
+          'scale', 'stage', 'requests', 'MB', 'wall [s]', 'cpu [s]', 'RSS [MB]')
+          + (' {:>10}'.format('speedup') if baseline is not None else ''))
+    context = multiprocessing.get_context('spawn')
+    for scale in args.scales:
+        queue = context.Queue()
+        server = context.Process(target=_serve, args=(scale, args.seed, args.latency, queue), daemon=True)
+        server.start()
+        try:
+            url = queue.get(timeout=600)
+            for stage in args.stages:
+                result = _run_in_subprocess(stage, scale, args.seed, url)
+                result.update(commit=commit, latency=args.latency, seed=args.seed, time=time.time())
+                with open(args.output, 'a') as f:
+                    f.write(json.dumps(result) + '\n')
+                _print_row(result, None if baseline is None else baseline.get((scale, stage)))
+        finally:
+            server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Micro-benchmark of the url extraction in `arxiv2github`.
+
+Compares the regex-based `search_in_string` and `extract_repositories`
+against the original `str.find`-based implementation on synthetic paper
+texts of increasing length, and prints the speedup of both.
+`extract_repositories` is the function the crawl uses; it looks for more
+hosts than `search_in_string`, and gains less on papers with few urls.
+
+Example use
+-----------
+$ python benchmark_search.py
+"""
+import random
+import timeit
+
+import numpy as np
+
+import arxiv2github
+
+WORDS = ['the', 'light', 'curve', 'of', 'Kepler', 'photometry', 'data', 'we', 'model',
+         'transit', 'noise', 'stellar', 'fig.', '(see', 'table', 'et', 'al.,', 'pipeline']
+
+
+def search_in_string_legacy(string, search_term):
+    ''' The original implementation of `arxiv2github.search_in_string`, for reference.
+    '''
+    start = 0
+    hit = np.nan
+    matches = []
+    while hit != -1:
+        hit = string.find(search_term, start, len(string))
+        endpoints = np.asarray([string.find(endpoint, hit + len(search_term), hit  + len(search_term) + 100) for endpoint in [' ', '.']])
+        endpoints = endpoints[endpoints != -1]
+        if len(endpoints) < 1:
+            hit_end = len(string)
+        else:
+            hit_end = np.min(endpoints)
+        matches.append(string[hit:hit_end])
+        start = hit + len(search_term)
+    matches = np.unique(np.asarray(matches))
+    matches = matches[matches != '']
+    return matches
+
+
+def synthetic_paper(n_pages, urls_per_page=3, words_per_page=800, seed=42):
+    ''' Returns the text of a fake paper mentioning a few repositories on every page.
+    '''
+    rng = random.Random(seed)
+    pages = []
+    for page in range(n_pages):
+        words = [rng.choice(WORDS) for _ in range(words_per_page)]
+        for _ in range(urls_per_page):
+            url = 'https://github.com/user{}/package{}.'.format(rng.randrange(50), rng.randrange(50))
+            words.insert(rng.randrange(len(words)), url)
+        pages.append(' '.join(words))
+    return ' \x0c '.join(pages)
+
+
+def main(page_counts=(10, 60, 300), urls_per_page=(3, 50), repeat=5):
+    print('{:>6} {:>6} {:>10} {:>12} {:>12} {:>12} {:>8} {:>8}'.format(
+          'pages', 'urls', 'chars', 'legacy [ms]', 'search [ms]', 'extract [ms]', 'search', 'extract'))
+    for n_pages, n_urls in [(p, u) for u in urls_per_page for p in page_counts]:
+        text = synthetic_paper(n_pages, urls_per_page=n_urls)
+        assert set(search_in_string_legacy(text, 'github.com/')) >= set(arxiv2github.search_in_string(text, 'github.com/'))
+        timings = [1e3 * min(timeit.repeat(lambda: func(text), number=1, repeat=repeat))
+                   for func in [lambda t: search_in_string_legacy(t, 'github.com/'),
+                                lambda t: arxiv2github.search_in_string(t, 'github.com/'),
+                                arxiv2github.extract_repositories]]
+        print('{:>6} {:>6} {:>10} {:>12.2f} {:>12.2f} {:>12.2f} {:>7.1f}x {:>7.1f}x'.format(
+              n_pages, n_pages * n_urls, len(text), *timings, timings[0] / timings[1], timings[0] / timings[2]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Collect crawl results column by column and checkpoint them to disk.
+
+Growing a DataFrame one cell at a time with `df.loc[idx, col] = ...`
+copies the frame over and over, and rewriting the output csv after every
+row makes long crawls spend most of their time in pandas.
+`ResultCollector` keeps one plain list per column, appends new rows to
+the checkpoint csv every few rows, and builds the DataFrame only once.
+
+Example use
+-----------
+>>> results = ResultCollector(['arxiv_id', 'urls'], checkpoint='arxiv2github.csv')
+>>> for arxiv_id in arxiv_ids:
+...     results.append(arxiv_id=arxiv_id, urls=arxiv2github.arxiv2github(arxiv_id))
+>>> df = results.to_frame()
+"""
+import pandas as pd
+
+import tracing
+
+
+class ResultCollector:
+    """Column-oriented store of result rows.
+
+    Parameters
+    ----------
+    columns : list of str
+        Names of the columns, in output order.
+    checkpoint : str, optional
+        Csv file to which rows are appended as they are collected.  The file
+        is started afresh (header only) when the collector is created.
+    every : int
+        Number of rows collected between two appends to `checkpoint`.
+    fill : object
+        Value of the columns missing from a row.
+    """
+    def __init__(self, columns, checkpoint=None, every=50, fill=None):
+        self.columns = list(columns)
+        self.data = {column: [] for column in self.columns}
+        self.checkpoint = checkpoint
+        self.every = every
+        self.fill = fill
+        self._n_flushed = 0
+        if checkpoint is not None:
+            pd.DataFrame(columns=self.columns).to_csv(checkpoint, index=False)
+
+    def __len__(self):
+        return len(self.data[self.columns[0]])
+
+    def append(self, row=None, **values):
+        """Adds a row, given as a dict and/or keyword arguments."""
+        if row is not None:
+            values = {**row, **values}
+        unknown = set(values) - set(self.columns)
+        if unknown:
+            raise ValueError("Unknown columns: {}".format(sorted(unknown)))
+        for column in self.columns:
+            self.data[column].append(values.get(column, self.fill))
+        if self.checkpoint is not None and len(self) - self._n_flushed >= self.every:
+            self.flush()
+
+    def flush(self):
+        """Appends the rows collected since the last flush to `checkpoint`."""
+        if self.checkpoint is None or len(self) == self._n_flushed:
+            return
+        new = {column: values[self._n_flushed:] for column, values in self.data.items()}
+        pd.DataFrame(new, columns=self.columns).to_csv(self.checkpoint, mode='a', header=False, index=False)
+        self._n_flushed = len(self)
+
+    def to_frame(self):
+        """Flushes the checkpoint and returns all rows as a DataFrame."""
+        self.flush()
+        with tracing.span('dataframe'):
+            return pd.DataFrame(self.data, columns=self.columns)
@@ -0,0 +1,198 @@
+"""Index of the contributors of all crawled repositories.
+
+`github_api_stats` counts the unique authors of the issues and pull requests
+of every repository.  The index keeps those authors instead of throwing them
+away: every login is interned to a small integer id, and the authors of a
+repository are a sorted array of ids per contribution type.  Counts, unions
+and overlaps across repositories are then NumPy set operations on integer
+arrays, e.g. finding the contributors shared by NASA packages takes
+milliseconds and no request.
+
+The crawl saves the index to "contributors.npz" (one file per shard, see
+`shards.py`); `snapshot.write_all` stores it with the other tables.
+
+Example use
+-----------
+>>> index = ContributorIndex.load('contributors.npz')
+>>> index.count('astropy/astropy')
+>>> index.logins_of(index.overlap(['astropy/astropy', 'sunpy/sunpy']))
+>>> ids, n_repos = index.shared(min_repos=3)
+"""
+import os
+import threading
+
+import numpy as np
+
+from snapshot import repo_key
+
+CONTRIBUTIONS = ['issues', 'pullRequests']
+INDEX_FILE = 'contributors.npz'
+
+_EMPTY = np.zeros(0, dtype=np.int32)
+
+
+def _key(repo):
+    """Returns the key of a repository given as "owner/repo" or a pair; see `snapshot.repo_key`."""
+    return repo_key(tuple(repo.split('/')) if isinstance(repo, str) else repo)
+
+
+def _join(strings):
+    # Logins and repository names never contain a newline
+    return np.frombuffer('\n'.join(strings).encode('utf-8'), dtype=np.uint8)
+
+
+def _split(array):
+    text = array.tobytes().decode('utf-8')
+    return text.split('\n') if text else []
+
+
+class ContributorIndex:
+    """Authors of the issues and pull requests of many repositories, as interned ids.
+
+    Repositories are given as "owner/repo" or (owner, repo), in any case.
+    Ids are positions in `logins`; the id arrays returned are sorted and
+    unique.  Adding is thread-safe, so the index can be filled by the
+    crawler's worker threads.
+    """
+    def __init__(self):
+        self.logins = []
+        self._ids = {}
+        # Maps every repository key to the ids of its authors per contribution type
+        self.authors = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Number of distinct contributors."""
+        return len(self.logins)
+
+    def __contains__(self, repo):
+        return _key(repo) in self.authors
+
+    @property
+    def repos(self):
+        return list(self.authors)
+
+    def intern(self, logins):
+        """Returns the sorted unique ids of `logins`, giving the new ones the next ids."""
+        with self._lock:
+            ids = []
+            for login in logins:
+                id = self._ids.get(login)
+                if id is None:
+                    id = self._ids[login] = len(self.logins)
+                    self.logins.append(login)
+                ids.append(id)
+        return np.unique(np.asarray(ids, dtype=np.int32))
+
+    def add(self, repo, contribution, logins):
+        """Records the authors of a repository's issues or pull requests; returns their ids."""
+        ids = self.intern(logins)
+        with self._lock:
+            self.authors.setdefault(_key(repo), {})[contribution] = ids
+        return ids
+
+    def update(self, other):
+        """Adds all repositories of another index, e.g. of another shard."""
+        for repo, authors in other.authors.items():
+            for contribution, ids in authors.items():
+                self.add(repo, contribution, other.logins_of(ids))
+
+    def ids(self, repo, contribution=None):
+        """Returns the ids of the authors of a repository's `contribution`, or of both types."""
+        authors = self.authors.get(_key(repo), {})
+        if contribution is not None:
+            return authors.get(contribution, _EMPTY)
+        return np.union1d(*[authors.get(contribution, _EMPTY) for contribution in CONTRIBUTIONS])
+
+    def count(self, repo, contribution=None):
+        """Returns the number of unique authors of a repository's `contribution`, or of both."""
+        return len(self.ids(repo, contribution))
+
+    def _all_ids(self, repos, contribution):
+        repos = self.authors if repos is None else repos
+        return [self.ids(repo, contribution) for repo in repos]
+
+    def union(self, repos=None, contribution=None):
+        """Returns the ids of everyone who contributed to any of `repos` (default all)."""
+        return np.unique(np.concatenate([_EMPTY] + self._all_ids(repos, contribution)))
+
+    def overlap(self, repos, contribution=None):
+        """Returns the ids of the contributors to every one of `repos`."""
+        arrays = self._all_ids(repos, contribution)
+        if not arrays:
+            return _EMPTY
+        result = arrays[0]
+        for ids in arrays[1:]:
+            result = np.intersect1d(result, ids, assume_unique=True)
+        return result
+
+    def shared(self, min_repos=2, repos=None, contribution=None):
+        """Returns the ids of the contributors to at least `min_repos` of `repos` (default all),
+        and the number of those repositories each contributed to."""
+        n_repos = np.bincount(np.concatenate([_EMPTY] + self._all_ids(repos, contribution)),
+                              minlength=len(self.logins))
+        ids = np.flatnonzero(n_repos >= min_repos)
+        return ids, n_repos[ids]
+
+    def repos_of(self, login, contribution=None):
+        """Returns the repositories a login contributed to."""
+        id = self._ids.get(login)
+        if id is None:
+            return []
+        repos = []
+        for repo in self.authors:
+            ids = self.ids(repo, contribution)
+            position = np.searchsorted(ids, id)
+            if position < len(ids) and ids[position] == id:
+                repos.append(repo)
+        return repos
+
+    def logins_of(self, ids):
+        """Returns the logins of ids."""
+        return [self.logins[id] for id in ids]
+
+    def to_frame(self):
+        """Returns one row per repository: its key and the author ids per contribution type."""
+        import pandas as pd
+        return pd.DataFrame({'repo': list(self.authors),
+                             **{contribution: [authors.get(contribution, _EMPTY)
+                                               for authors in self.authors.values()]
+                                for contribution in CONTRIBUTIONS}})
+
+    @classmethod
+    def from_frame(cls, frame, logins):
+        """Rebuilds an index from `to_frame` and the list of logins, e.g. read from a snapshot."""
+        index = cls()
+        index.logins = list(logins)
+        index._ids = {login: id for id, login in enumerate(index.logins)}
+        for row in frame.itertuples(index=False):
+            row = row._asdict()
+            index.authors[row['repo']] = {contribution: np.asarray(row[contribution], dtype=np.int32)
+                                          for contribution in CONTRIBUTIONS if row[contribution] is not None}
+        return index
+
+    def save(self, path=INDEX_FILE):
+        """Saves the index as a compressed NumPy archive, replacing `path` atomically."""
+        arrays = {'logins': _join(self.logins), 'repos': _join(self.authors)}
+        for contribution in CONTRIBUTIONS:
+            ids = [authors.get(contribution, _EMPTY) for authors in self.authors.values()]
+            arrays[contribution + '_offsets'] = np.cumsum([0] + [len(array) for array in ids], dtype=np.int64)
+            arrays[contribution] = np.concatenate([_EMPTY] + ids)
+        with open(path + '.tmp', 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path=INDEX_FILE):
+        """Loads an index saved with `save`."""
+        index = cls()
+        with np.load(path) as arrays:
+            index.logins = _split(arrays['logins'])
+            index._ids = {login: id for id, login in enumerate(index.logins)}
+            repos = _split(arrays['repos'])
+            index.authors = {repo: {} for repo in repos}
+            for contribution in CONTRIBUTIONS:
+                offsets, ids = arrays[contribution + '_offsets'], arrays[contribution]
+                for repo, start, stop in zip(repos, offsets[:-1], offsets[1:]):
+                    index.authors[repo][contribution] = ids[start:stop]
+        return index
@@ -0,0 +1,637 @@
+"""Local stand-in for GitHub, raw.githubusercontent, ADS and arXiv.
+
+Serves a fake "world" of repositories and papers so that the crawlers can
+be run, timed and compared without network access, tokens or rate limits:
+
+* github.com/<owner>/<repo>[/tree/master/<dir>]: repository pages.
+* raw.github.com and raw.githubusercontent.com: file contents.
+* <owner>.github.io/<repo>: documentation pages.
+* api.github.com/graphql: the GraphQL queries of `github_api_stats` and
+  `githubwebstats` (repositories, paginated issues and pull requests, file
+  trees, `rateLimit`), with `X-RateLimit-*` headers and 403 responses once
+  a token has used up its points.
+* api.adsabs.harvard.edu/v1/search/query: ADS full text searches with
+  cursors and highlighting.
+* arxiv.org/pdf/<id>.pdf: small pdfs of the papers' text.
+
+Requests are delayed by `latency` (+ up to `jitter`) seconds, and a fraction
+`error_rate` of them fails with a 502.  Every host is served under a path
+prefix, which is what `httpcache` sends requests to once its base url is set.
+The request counters can be read from `<url>/_fixture/stats`.
+
+Example use
+-----------
+$ python fixture_server.py --repos 100 --papers 50 --latency 0.05 --port 8000
+$ export NASA_OSS_STATS_BASE_URL=http://127.0.0.1:8000
+$ export NASA_OSS_STATS_CACHE_DIR=$(mktemp -d) GITHUB_TOKEN=fake ADS_DEV_KEY=fake
+
+or from Python:
+
+>>> with FixtureServer(make_world(n_repos=100)) as server:
+...     httpcache.set_base_url(server.url)
+...     githubwebstats.github2stats(github_urls(server.world))
+"""
+import argparse
+import collections
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Words used for the text of readmes and papers
+WORDS = ['the', 'light', 'curve', 'of', 'Kepler', 'photometry', 'data', 'we', 'model',
+         'transit', 'noise', 'stellar', 'fig.', '(see', 'table', 'et', 'al.,', 'pipeline',
+         'spectra', 'galaxy', 'python', 'package', 'fit', 'catalog']
+
+# Files found in fake repositories, with the probability that a repository has them
+FILES = {'README.md': .6, 'README.rst': .2, 'readme.txt': .05, 'setup.py': .5,
+         'requirements.txt': .4, 'INSTALL': .1, 'makefile': .15, '.travis.yml': .3,
+         'appveyor.yml': .05, 'azure-pipelines.yml': .05, '.circleci/config.yml': .05,
+         'docs/conf.py': .35, 'doc/index.rst': .1, 'examples/demo.py': .25,
+         'tutorials/intro.ipynb': .1, 'docs/examples/demo.py': .05, 'src/main.py': .7}
+
+LANGUAGES = ['Python', 'Python', 'Python', 'Jupyter Notebook', 'C', 'C++', 'Fortran', 'IDL', 'R']
+LICENSES = ['MIT', 'BSD-3-Clause', 'GPL-3.0', 'Apache-2.0', 'NOASSERTION', None]
+
+
+def make_world(n_repos=100, n_papers=None, n_missing=0.1, seed=0):
+    """Returns a reproducible fake world of repositories and papers.
+
+    Parameters
+    ----------
+    n_repos : int
+        Number of repositories.
+    n_papers : int, optional
+        Number of papers; by default one per repository.
+    n_missing : float
+        Fraction of the repository urls cited by papers which do not exist.
+    seed : int
+        Seed of the random generator.
+
+    Returns
+    -------
+    world : dict
+        `{'repos': {'owner/name': {...}}, 'papers': {'1901.00001': {...}}}`,
+        which can be saved as JSON and served by `FixtureServer`.
+    """
+    rng = random.Random(seed)
+    n_papers = n_repos if n_papers is None else n_papers
+    n_people = max(10, 3 * n_repos)
+    # A few prolific contributors and a long tail of occasional ones
+    people = ['person{}'.format(min(int(rng.paretovariate(1.) - 1), n_people - 1)) for _ in range(n_people)]
+    repos = {}
+    for idx in range(n_repos):
+        key = 'user{}/package{}'.format(idx % max(1, n_repos // 3), idx)
+        files = sorted(path for path, probability in FILES.items() if rng.random() < probability)
+        readme = ' '.join(rng.choice(WORDS) for _ in range(rng.randrange(20, 400)))
+        for phrase in ['pip install {}'.format(key.split('/')[1]), 'readthedocs', 'examples', 'conda ']:
+            if rng.random() < .3:
+                readme += ' ' + phrase
+        authors = [rng.choice(people) for _ in range(int(rng.expovariate(1 / 60)))]
+        repos[key] = {'files': files,
+                      'readme': readme,
+                      'pages': rng.random() < .2,
+                      'createdAt': '20{:02d}-0{}-1{}T00:00:00Z'.format(rng.randrange(10, 20), rng.randrange(1, 10), rng.randrange(10)),
+                      'pushedAt': '2019-0{}-{:02d}T12:00:00Z'.format(rng.randrange(1, 10), rng.randrange(1, 29)),
+                      'language': rng.choice(LANGUAGES),
+                      'license': rng.choice(LICENSES),
+                      'forks': int(rng.expovariate(1 / 10)),
+                      'stars': int(rng.expovariate(1 / 30)),
+                      'issues': [login for login in authors if rng.random() < .6],
+                      'pullRequests': [login for login in authors if rng.random() < .4]}
+    keys = list(repos)
+    papers = {}
+    for idx in range(n_papers):
+        arxiv_id = '19{:02d}.{:05d}'.format(1 + idx % 12, idx)
+        cited = rng.sample(keys, min(len(keys), rng.randrange(1, 4))) if keys else []
+        cited = [key if rng.random() >= n_missing else key + '-missing' for key in cited]
+        pages = []
+        for _ in range(rng.randrange(2, 8)):
+            words = [rng.choice(WORDS) for _ in range(300)]
+            pages.append(words)
+        for key in cited:
+            page = rng.choice(pages)
+            page.insert(rng.randrange(len(page)), 'https://github.com/{}.'.format(key))
+        papers[arxiv_id] = {'bibcode': '2019arXiv{}{}'.format(arxiv_id.replace('.', ''), 'X'),
+                            'title': ['A study of {} {}'.format(rng.choice(WORDS), idx)],
+                            'author': ['Author, {}.'.format(chr(65 + rng.randrange(26))) for _ in range(rng.randrange(1, 6))],
+                            'year': '2019',
+                            'citation_count': int(rng.expovariate(1 / 20)),
+                            'keyword': rng.sample(WORDS, 3),
+                            'ack': 'This work was supported by NASA.' if rng.random() < .7 else 'Thanks.',
+                            'pages': [' '.join(words) for words in pages]}
+    return {'repos': repos, 'papers': papers}
+
+
+def github_urls(world):
+    """Returns the 'github.com/owner/repo' urls cited by the papers, as `_clean_github_urls` would."""
+    pattern = re.compile(r'github\.com/([^ /]+)/([^ /.]+)')
+    return sorted({'github.com/{}/{}'.format(*match).lower()
+                   for paper in world['papers'].values() for page in paper['pages']
+                   for match in pattern.findall(page)})
+
+
+def arxiv_ids(world):
+    """Returns the arxiv ids of the papers, as found in ADS results."""
+    return ['arXiv:' + arxiv_id for arxiv_id in sorted(world['papers'])]
+
+
+def _make_pdf(pages):
+    """Returns a minimal pdf (Helvetica, no compression) with one page per string."""
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', None,
+               b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for text in pages:
+        lines, line = [], ''
+        for word in text.split(' '):
+            if len(line) + len(word) > 90:
+                lines.append(line)
+                line = ''
+            line += word + ' '
+        lines.append(line)
+        escaped = [line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') for line in lines]
+        stream = ('BT /F1 9 Tf 11 TL 40 760 Td ' + ' '.join('({}) \''.format(line) for line in escaped)
+                  + ' ET').encode('latin-1', 'replace')
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+                       b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % len(objects))
+        kids.append(len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(b'%d 0 R' % kid for kid in kids), len(kids))
+    pdf = b'%PDF-1.4\n'
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b'%d 0 obj\n' % number + obj + b'\nendobj\n'
+    xref = len(pdf)
+    pdf += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    pdf += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    pdf += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return pdf
+
+
+# A `field:term` clause of an ADS query, and the phrases of a (possibly parenthesised) term
+_ADS_CLAUSE = re.compile(r'(\w+):(\([^)]*\)|"[^"]*"|\'[^\']*\'|\S+)')
+_ADS_TERM = re.compile(r'"([^"]*)"|\'([^\']*)\'|([^\s()"\']+)')
+
+_GRAPHQL_TOKEN = re.compile(r'\s+|,|#[^\n]*|(\.\.\.|[{}():]|"(?:[^"\\]|\\.)*"|-?\d+|[_A-Za-z][_0-9A-Za-z]*)')
+
+
+def _parse_graphql(query):
+    """Parses the selection set of a GraphQL query into nested lists of fields.
+
+    Every field is a dict with `name`, `alias`, `args` and `selections`;
+    inline fragments (`... on Tree`) have a `fragment` type instead of a
+    name.  This covers the queries sent by this repository, not all of
+    GraphQL (no variables, directives or named fragments).
+    """
+    tokens = [match.group(1) for match in _GRAPHQL_TOKEN.finditer(query) if match.group(1)]
+    position = 0
+
+    def take(expected=None):
+        nonlocal position
+        token = tokens[position]
+        if expected is not None and token != expected:
+            raise ValueError('Expected {!r}, found {!r}'.format(expected, token))
+        position += 1
+        return token
+
+    def value(token):
+        if token.startswith('"'):
+            return json.loads(token)
+        if re.fullmatch(r'-?\d+', token):
+            return int(token)
+        return {'true': True, 'false': False, 'null': None}.get(token, token)
+
+    def selections():
+        take('{')
+        fields = []
+        while tokens[position] != '}':
+            if tokens[position] == '...':
+                take()
+                take('on')
+                fields.append({'fragment': take(), 'selections': selections()})
+                continue
+            name = alias = take()
+            if tokens[position] == ':':
+                take()
+                name = take()
+            args = {}
+            if tokens[position] == '(':
+                take()
+                while tokens[position] != ')':
+                    arg = take()
+                    take(':')
+                    args[arg] = value(take())
+                take(')')
+            fields.append({'name': name, 'alias': alias, 'args': args,
+                           'selections': selections() if tokens[position] == '{' else None})
+        take('}')
+        return fields
+
+    while tokens[position] != '{':
+        take()
+    return selections()
+
+
+class FixtureServer:
+    """Threaded HTTP server playing all remote services for a fake world.
+
+    Parameters
+    ----------
+    world : dict or str
+        World from `make_world`, or a JSON file holding one.
+    host, port : str, int
+        Address to listen on; port 0 picks a free port.
+    latency : float
+        Seconds added to every response.
+    jitter : float
+        Maximum random seconds added on top of `latency`.
+    error_rate : float
+        Fraction of requests answered with a 502.
+    rate_limit : int
+        GraphQL points per token per hour.
+    seed : int
+        Seed of the random delays and errors.
+
+    Attributes
+    ----------
+    url : str
+        Base url of the server, to pass to `httpcache.set_base_url`.
+    requests : collections.Counter
+        Number of requests received per host.
+    bytes_sent : int
+        Total size of the response bodies.
+    """
+    def __init__(self, world=None, host='127.0.0.1', port=0, latency=0., jitter=0., error_rate=0.,
+                 rate_limit=5000, seed=0):
+        if world is None:
+            world = make_world()
+        elif isinstance(world, str):
+            with open(world) as f:
+                world = json.load(f)
+        self.world = world
+        self.repos = {key.lower(): repo for key, repo in world['repos'].items()}
+        self.papers = world['papers']
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.requests = collections.Counter()
+        self.bytes_sent = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._points = collections.defaultdict(lambda: rate_limit)
+        self._reset = int(time.time()) + 3600
+        self._pdfs = {}
+        self._ads_ids = {arxiv_id: idx for idx, arxiv_id in enumerate(sorted(self.papers))}
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self.url = 'http://{}:{}'.format(*self._httpd.server_address[:2])
+        self._thread = None
+
+    def github_urls(self):
+        return github_urls(self.world)
+
+    def arxiv_ids(self):
+        return arxiv_ids(self.world)
+
+    def start(self):
+        """Serves requests on a background thread; returns `url`."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def _delay_and_fail(self):
+        """Sleeps for the simulated latency; returns True if the request should fail."""
+        with self._lock:
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            fail = self._rng.random() < self.error_rate
+        time.sleep(delay)
+        return fail
+
+    def handle(self, method, host, path, query, headers, body):
+        """Returns `(status, headers, body)` for a request to `host`."""
+        if host == '_fixture' and path == '/stats':
+            # Not a simulated host: lets another process read the counters
+            with self._lock:
+                stats = {'requests': dict(self.requests), 'bytes_sent': self.bytes_sent}
+            return 200, {'Content-Type': 'application/json'}, json.dumps(stats).encode()
+        with self._lock:
+            self.requests[host] += 1
+        if self._delay_and_fail():
+            return 502, {}, b'Bad gateway'
+        if host == 'api.github.com' and path == '/graphql':
+            return self._graphql(headers, body)
+        if host == 'api.adsabs.harvard.edu' and path == '/v1/search/query':
+            return self._ads(urllib.parse.parse_qs(query))
+        if host == 'arxiv.org' and path.startswith('/pdf/'):
+            return self._arxiv(path[len('/pdf/'):])
+        parts = path.strip('/').split('/')
+        if host == 'github.com' and len(parts) >= 2:
+            return self._github(parts)
+        if host in ('raw.github.com', 'raw.githubusercontent.com') and len(parts) >= 4:
+            return self._raw(parts)
+        if host.endswith('.github.io') and len(parts) >= 1:
+            repo = self.repos.get('{}/{}'.format(host[:-len('.github.io')], parts[0]).lower())
+            if repo is not None and repo['pages']:
+                return 200, {'Content-Type': 'text/html'}, b'<html>documentation</html>'
+        return 404, {}, b'Not Found'
+
+    @staticmethod
+    def _has_directory(repo, path):
+        return any(name.startswith(path + '/') for name in repo['files'])
+
+    def _github(self, parts):
+        repo = self.repos.get('/'.join(parts[:2]).lower())
+        if repo is None:
+            return 404, {}, b'Not Found'
+        if len(parts) == 2:
+            return 200, {'Content-Type': 'text/html'}, ('<html>' + repo['readme'] + '</html>').encode()
+        if parts[2] == 'tree' and len(parts) >= 4 and parts[3] == 'master':
+            if len(parts) == 4 or self._has_directory(repo, '/'.join(parts[4:])):
+                return 200, {'Content-Type': 'text/html'}, b'<html>tree</html>'
+        return 404, {}, b'Not Found'
+
+    def _raw(self, parts):
+        repo = self.repos.get('/'.join(parts[:2]).lower())
+        path = '/'.join(parts[3:])
+        if repo is None or parts[2] not in ('master', 'HEAD') or path not in repo['files']:
+            return 404, {}, b'404: Not Found'
+        content = repo['readme'] if path.lower().startswith('readme') else '# {}\n'.format(path)
+        return 200, {'Content-Type': 'text/plain; charset=utf-8'}, content.encode()
+
+    def _arxiv(self, name):
+        arxiv_id = name.replace('arXiv:', '')
+        if arxiv_id.endswith('.pdf'):
+            arxiv_id = arxiv_id[:-len('.pdf')]
+        if arxiv_id not in self.papers:
+            return 404, {}, b'Not Found'
+        with self._lock:
+            if arxiv_id not in self._pdfs:
+                self._pdfs[arxiv_id] = _make_pdf(self.papers[arxiv_id]['pages'])
+        return 200, {'Content-Type': 'application/pdf'}, self._pdfs[arxiv_id]
+
+    # GraphQL
+
+    def _graphql(self, headers, body):
+        token = headers.get('Authorization', '')
+        try:
+            fields = _parse_graphql(json.loads(body)['query'])
+        except (ValueError, KeyError, IndexError) as err:
+            return 400, {}, json.dumps({'message': 'Problems parsing JSON or query: {}'.format(err)}).encode()
+        with self._lock:
+            if time.time() > self._reset:
+                self._points.clear()
+                self._reset = int(time.time()) + 3600
+            remaining = self._points[token]
+        limit_headers = {'X-RateLimit-Limit': str(self.rate_limit), 'X-RateLimit-Reset': str(self._reset)}
+        if remaining <= 0:
+            limit_headers['X-RateLimit-Remaining'] = '0'
+            return 403, limit_headers, json.dumps({'message': 'API rate limit exceeded'}).encode()
+        context = {'nodes': 0, 'errors': []}
+        data = {}
+        # rateLimit reports the cost of the whole query, so it is resolved last
+        for field in sorted(fields, key=lambda field: field['name'] == 'rateLimit'):
+            data[field['alias']] = self._resolve_root(field, context, remaining)
+        data = {field['alias']: data[field['alias']] for field in fields}
+        with self._lock:
+            self._points[token] -= self._cost(context)
+            limit_headers['X-RateLimit-Remaining'] = str(max(0, self._points[token]))
+        result = {'data': data}
+        if context['errors']:
+            result['errors'] = context['errors']
+        return 200, limit_headers, json.dumps(result).encode()
+
+    @staticmethod
+    def _cost(context):
+        """Approximates GitHub's cost: one point per 100 nodes requested, at least one."""
+        return max(1, math.ceil(context['nodes'] / 100))
+
+    def _resolve_root(self, field, context, remaining):
+        if field['name'] == 'rateLimit':
+            value = {'limit': self.rate_limit, 'cost': self._cost(context),
+                     'remaining': remaining - self._cost(context),
+                     'resetAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self._reset))}
+            return _select(value, field['selections'])
+        if field['name'] == 'repository':
+            context['nodes'] += 1
+            key = '{}/{}'.format(field['args'].get('owner'), field['args'].get('name'))
+            repo = self.repos.get(key.lower())
+            if repo is None:
+                context['errors'].append({'type': 'NOT_FOUND', 'path': [field['alias']],
+                                          'message': "Could not resolve to a Repository with the name '{}'.".format(key)})
+                return None
+            return _select(self._repository(repo, context), field['selections'])
+        context['errors'].append({'message': "Field '{}' doesn't exist on type 'Query'".format(field['name'])})
+        return None
+
+    def _repository(self, repo, context):
+        """Returns the GraphQL view of a repository; connections are functions of their arguments."""
+        def count(total):
+            def connection(first=0, **args):
+                context['nodes'] += first
+                return {'totalCount': total}
+            return connection
+
+        def authors(logins, kind):
+            def connection(first=100, after=None, **args):
+                context['nodes'] += first
+                start = 0 if after is None else int(after.split(':')[1]) + 1
+                page = list(enumerate(logins))[start:start + first]
+                return {'totalCount': len(logins),
+                        'pageInfo': {'endCursor': 'cursor:{}'.format(page[-1][0]) if page else None,
+                                     'hasNextPage': start + first < len(logins)},
+                        'edges': [{'node': {'id': '{}{}'.format(kind, idx), 'author': {'login': login}}}
+                                  for idx, login in page]}
+            return connection
+
+        def tree(expression='HEAD:'):
+            names = collections.defaultdict(set)
+            for path in repo['files']:
+                parts = path.split('/')
+                for depth in range(len(parts)):
+                    names['/'.join(parts[:depth])].add((parts[depth], 'blob' if depth == len(parts) - 1 else 'tree'))
+
+            def entries(directory):
+                return {'__typename': 'Tree',
+                        'entries': [{'name': name, 'type': kind,
+                                     'object': entries((directory + '/' + name).strip('/')) if kind == 'tree'
+                                     else {'__typename': 'Blob'}}
+                                    for name, kind in sorted(names[directory])]}
+            return entries('') if repo['files'] else None
+
+        license = repo['license']
+        return {'createdAt': repo['createdAt'], 'pushedAt': repo['pushedAt'],
+                'shortDescriptionHTML': '',
+                'primaryLanguage': {'name': repo['language']} if repo['language'] else None,
+                'licenseInfo': None if license is None else {'spdxId': license,
+                                                             'pseudoLicense': license == 'NOASSERTION'},
+                'forks': count(repo['forks']), 'stargazers': count(repo['stars']),
+                'issues': authors(repo['issues'], 'I'), 'pullRequests': authors(repo['pullRequests'], 'PR'),
+                'object': tree}
+
+    # ADS
+
+    def _ads(self, params):
+        params = {key: values[0] for key, values in params.items()}
+        fields = params.get('fl', 'id').split(',')
+        rows = int(params.get('rows', 10))
+        ids, clauses = None, []
+        for field, term in _ADS_CLAUSE.findall(params.get('q', '')):
+            phrases = [next(group for group in match if group)
+                       for match in _ADS_TERM.findall(term) if match[2] != 'OR']
+            if field == 'id':
+                ids = {int(phrase) for phrase in phrases}
+            else:
+                clauses.append((field, [phrase.lower() for phrase in phrases]))
+        docs = []
+        for arxiv_id in sorted(self.papers):
+            paper = self.papers[arxiv_id]
+            idx = self._ads_ids[arxiv_id]
+            if ids is not None and idx not in ids:
+                continue
+            text = {'full': ' '.join(paper['pages']) + ' ' + paper['ack'], 'ack': paper['ack'],
+                    'title': ' '.join(paper['title'])}
+            if all(any(phrase in text.get(field, '').lower() for phrase in phrases) for field, phrases in clauses):
+                docs.append((idx, arxiv_id, paper, text['full']))
+        start = 0 if params.get('cursorMark', '*') == '*' else int(params['cursorMark']) + 1
+        page = [doc for doc in docs if doc[0] >= start][:rows]
+        result = {'responseHeader': {'status': 0, 'params': params},
+                  'response': {'numFound': len(docs), 'start': 0,
+                               'docs': [self._ads_doc(idx, arxiv_id, paper, fields) for idx, arxiv_id, paper, _ in page]},
+                  'nextCursorMark': str(page[-1][0]) if page else params.get('cursorMark', '*')}
+        if params.get('hl') == 'true':
+            phrases = [phrase for field, terms in clauses if field == 'full' for phrase in terms]
+            result['highlighting'] = {str(idx): {'body': _snippets(full, phrases)} for idx, _, _, full in page}
+        return 200, {'Content-Type': 'application/json'}, json.dumps(result).encode()
+
+    @staticmethod
+    def _ads_doc(idx, arxiv_id, paper, fields):
+        doc = {'id': idx, 'identifier': [paper['bibcode'], 'arXiv:' + arxiv_id],
+               'first_author': paper['author'][0], 'pubdate': paper['year'] + '-00-00'}
+        doc.update((key, value) for key, value in paper.items() if key != 'pages')
+        return {field: doc[field] for field in fields if field in doc}
+
+
+def _select(value, selections):
+    """Picks the selected fields out of a resolved GraphQL value."""
+    if selections is None or value is None:
+        return value
+    if isinstance(value, list):
+        return [_select(item, selections) for item in value]
+    out = {}
+    for field in selections:
+        if 'fragment' in field:
+            if value.get('__typename') == field['fragment']:
+                out.update(_select(value, field['selections']))
+            continue
+        item = value.get(field['name'])
+        if callable(item):
+            item = item(**field['args'])
+        out[field['alias']] = _select(item, field['selections'])
+    return out
+
+
+def _snippets(text, phrases, width=40):
+    """Returns ADS-style highlighted snippets of `text` around each phrase."""
+    snippets = []
+    lower = text.lower()
+    for phrase in phrases:
+        idx = lower.find(phrase)
+        if idx >= 0:
+            snippets.append('{}<em>{}</em>{}'.format(text[max(0, idx - width):idx], text[idx:idx + len(phrase)],
+                                                     text[idx + len(phrase):idx + len(phrase) + width]))
+    return snippets
+
+
+def _make_handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _serve(self, send_body=True):
+            url = urllib.parse.urlsplit(self.path)
+            host, _, path = url.path.lstrip('/').partition('/')
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else b''
+            status, headers, content = server.handle(self.command, host, '/' + path, url.query,
+                                                     self.headers, body)
+            etag = '"{}"'.format(hashlib.sha1(content).hexdigest())
+            if status == 200 and self.command != 'POST':
+                headers['ETag'] = etag
+                if self.headers.get('If-None-Match') == etag:
+                    status, content = 304, b''
+            self.send_response(status)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            if send_body:
+                self.wfile.write(content)
+                with server._lock:
+                    server.bytes_sent += len(content)
+
+        def do_GET(self):
+            self._serve()
+
+        def do_POST(self):
+            self._serve()
+
+        def do_HEAD(self):
+            self._serve(send_body=False)
+
+        def log_message(self, *args):
+            pass
+    return Handler
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--world', help='JSON file of the world to serve (see --dump-world)')
+    parser.add_argument('--repos', type=int, default=100, help='number of fake repositories')
+    parser.add_argument('--papers', type=int, default=None, help='number of fake papers')
+    parser.add_argument('--latency', type=float, default=0., help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0., help='maximum random extra latency')
+    parser.add_argument('--error-rate', type=float, default=0., help='fraction of 502 responses')
+    parser.add_argument('--rate-limit', type=int, default=5000, help='GraphQL points per token per hour')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--dump-world', metavar='FILE', help='write the generated world to FILE and exit')
+    args = parser.parse_args(args)
+    world = args.world or make_world(args.repos, args.papers, seed=args.seed)
+    if args.dump_world:
+        with open(args.dump_world, 'w') as f:
+            json.dump(world, f)
+        return
+    server = FixtureServer(world, host=args.host, port=args.port, latency=args.latency, jitter=args.jitter,
+                           error_rate=args.error_rate, rate_limit=args.rate_limit, seed=args.seed)
+    print('Serving {} repositories and {} papers; export NASA_OSS_STATS_BASE_URL={}'.format(
+          len(server.repos), len(server.papers), server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -19,35 +19,270 @@ Example use
 Requirements
 ------------
 This module requires you obtain and store a personal GitHub API token
-in "~/.github/token".
+in "~/.github/token".  Additional tokens stored in "~/.github/token<n>"
+(e.g. "~/.github/token2") are rotated across to increase throughput.
+A token in the `GITHUB_TOKEN` environment variable is used as well.
+The tokens are only read when the first query is sent (see
+`GitHubClient`), so importing this module has no side effects; numpy and
+tqdm are likewise imported on first use.
 """
 import os
-import requests
+import glob
 import json
-import numpy as np
-from tqdm import tqdm
+import random
+import re
+import threading
+import time
 
+import httpcache
+import tracing
 
-TOKEN = open(os.path.expanduser("~/.github/token")).read().strip()
-HEADERS = {"Authorization": f"Bearer {TOKEN}"}
 
+def _read_tokens():
+    """Returns the token in $GITHUB_TOKEN and those stored in "~/.github/token" and
+    "~/.github/token<n>" (e.g. "token2"), one per file."""
+    paths = sorted(glob.glob(os.path.expanduser("~/.github/token*")))
+    tokens = []
+    # Not e.g. "token.bak" or an editor's "token~"
+    for path in paths:
+        if re.fullmatch(r"token[0-9]*", os.path.basename(path)):
+            with open(path) as f:
+                tokens.append(f.read().strip())
+    if os.environ.get("GITHUB_TOKEN"):
+        tokens.insert(0, os.environ["GITHUB_TOKEN"])
+    if len(tokens) == 0:
+        raise FileNotFoundError('No GitHub token found in $GITHUB_TOKEN or "~/.github/token"')
+    return tokens
 
-def query_github(query):
+
+class _TokenState:
+    """Token bucket and last known rate limit of a single API token."""
+    def __init__(self, token, rate, burst):
+        self.token = token
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.rate = rate
+        self.burst = burst
+        self.level = burst
+        self.updated = time.monotonic()
+        self.remaining = None
+        self.reset = None
+
+    def refill(self, now):
+        self.level = min(self.burst, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait(self):
+        """Seconds until this token may send a query costing one point."""
+        wait = max(0., (1 - self.level) / self.rate)
+        if self.remaining is not None and self.remaining <= 0 and self.reset is not None:
+            wait = max(wait, self.reset - time.time())
+        return wait
+
+
+def _rate_limited(response):
+    """Whether a 200 response is a GraphQL `RATE_LIMITED` error."""
+    if response.status_code != 200 or b'RATE_LIMITED' not in response.content:
+        return False
+    try:
+        errors = response.json().get('errors') or []
+    except (ValueError, AttributeError):
+        return False
+    return any(isinstance(error, dict) and error.get('type') == 'RATE_LIMITED' for error in errors)
+
+
+class RateLimitScheduler:
+    """Paces GraphQL queries so that a long crawl stays within GitHub's rate limits.
+
+    Every token has a token bucket whose refill rate is set from the
+    `X-RateLimit-Remaining` and `X-RateLimit-Reset` headers of the latest
+    response, so the remaining budget is spread evenly until the next reset;
+    the reported `rateLimit { cost }` of a query is charged to the bucket.
+    Queries go to the token which can send soonest; a response found in the
+    cache gives its point back.  403, 429 and 5xx responses are retried
+    with exponential backoff and full jitter, honouring `Retry-After`
+    (GitHub's secondary rate limits) when present, and so are 200 responses
+    with a `RATE_LIMITED` error, after the rate limit resets.
+
+    Parameters
+    ----------
+    tokens : list of str
+        Personal API tokens to rotate across.
+    limit : int
+        Points per hour per token, used until the first response is seen.
+    burst : int
+        Number of queries a token may send back-to-back.
+    max_retries : int
+        Number of retries before a query is given up on.
+    backoff : float
+        Base of the exponential backoff, in seconds.
+    max_backoff : float
+        Maximum delay between two retries, in seconds.
+    """
+    url = 'https://api.github.com/graphql'
+    retry_statuses = (429, 500, 502, 503, 504)
+
+    def __init__(self, tokens, limit=5000, burst=10, max_retries=8, backoff=1., max_backoff=600.):
+        self.tokens = [_TokenState(token, limit / 3600, burst) for token in tokens]
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Takes one point from the token which can send soonest; returns it and the wait."""
+        with self._lock:
+            now = time.monotonic()
+            for state in self.tokens:
+                state.refill(now)
+            state = min(self.tokens, key=lambda state: (state.wait(), -state.level))
+            wait = state.wait()
+            state.level -= 1
+            return state, wait
+
+    def _update(self, state, response):
+        """Updates the rate limit of a token from a fresh response."""
+        with self._lock:
+            headers = response.headers
+            if 'X-RateLimit-Remaining' in headers and 'X-RateLimit-Reset' in headers:
+                state.remaining = int(headers['X-RateLimit-Remaining'])
+                state.reset = int(headers['X-RateLimit-Reset'])
+                state.rate = max(state.remaining, 1) / max(state.reset - time.time(), 1.)
+            if response.status_code != 200:
+                return
+            if _rate_limited(response):
+                # Other threads wait for the reset too, rather than running into the limit again
+                state.remaining = 0
+                return
+            try:
+                cost = response.json()['data']['rateLimit']['cost']
+            except (ValueError, KeyError, TypeError):
+                return
+            state.level -= cost - 1
+
+    def _should_retry(self, response):
+        """Whether a response is a rate limit or transient server error."""
+        if response.status_code == 403:
+            return ('Retry-After' in response.headers
+                    or response.headers.get('X-RateLimit-Remaining') == '0'
+                    or 'rate limit' in response.text.lower())
+        if response.status_code == 200:
+            return _rate_limited(response)
+        return response.status_code in self.retry_statuses
+
+    def _delay(self, attempt, response):
+        """Seconds to wait before retrying a failed query."""
+        if 'Retry-After' in response.headers:
+            return float(response.headers['Retry-After'])
+        if ((response.headers.get('X-RateLimit-Remaining') == '0' or _rate_limited(response))
+                and 'X-RateLimit-Reset' in response.headers):
+            return max(0., int(response.headers['X-RateLimit-Reset']) - time.time()) + 1
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def query(self, query, cache=None):
+        """Sends a query once the rate limit allows it, retrying on transient errors.
+
+        Returns
+        -------
+        response : requests.Response
+            The last response received.
+        """
+        for attempt in range(self.max_retries + 1):
+            state, wait = self._reserve()
+            if wait > 0:
+                time.sleep(wait)
+            with tracing.context(retry=attempt):
+                response = httpcache.post(self.url, json={'query': query}, headers=state.headers, cache=cache)
+            if response.from_cache:
+                with self._lock:
+                    state.level += 1
+                return response
+            self._update(state, response)
+            if not self._should_retry(response) or attempt == self.max_retries:
+                return response
+            time.sleep(self._delay(attempt, response))
+        return response
+
+
+AUTHORS_STATE_DIR = os.path.join(httpcache.CACHE_DIR, "authors")
+
+
+class GitHubClient:
+    """Credentials and rate limit scheduler of the GitHub API, set up on first use.
+
+    Parameters
+    ----------
+    tokens : list of str, optional
+        Personal API tokens; by default those of `_read_tokens`, read when
+        the first query is sent.
+    **options
+        Passed on to `RateLimitScheduler`.
+    """
+    def __init__(self, tokens=None, **options):
+        self._tokens = tokens
+        self.options = options
+        self._scheduler = None
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self):
+        if self._tokens is None:
+            self._tokens = _read_tokens()
+        return self._tokens
+
+    @property
+    def scheduler(self):
+        with self._lock:
+            if self._scheduler is None:
+                self._scheduler = RateLimitScheduler(self.tokens, **self.options)
+        return self._scheduler
+
+    def query(self, query, cache=None):
+        """Answers a query from the cache, or else sends it through the scheduler.
+
+        A query the cache can answer is not paced, and needs neither tokens
+        nor the scheduler, so e.g. `httpcache.offline()` works without
+        credentials.  See `RateLimitScheduler.query`.
+        """
+        response = httpcache.post(RateLimitScheduler.url, json={'query': query}, cache=cache, cached_only=True)
+        if response is not None:
+            return response
+        return self.scheduler.query(query, cache=cache)
+
+
+_default_client = None
+_client_lock = threading.Lock()
+
+
+def default_client():
+    """Returns the client shared by all queries, creating it on first use."""
+    global _default_client
+    with _client_lock:
+        if _default_client is None:
+            _default_client = GitHubClient()
+    return _default_client
+
+
+def query_github(query, cache=None, client=None):
     """Query the GitHub API documented at https://developer.github.com/v4.
+
+    Queries are paced and retried by the scheduler of `client`.
     
     Parameters
     ----------
     query : str
         GraphQL query.
+    cache : httpcache.ResponseCache, None or False
+        Where to cache the response; None uses the shared on-disk cache,
+        False always queries the API.
+    client : GitHubClient, optional
+        Client sending the query; by default `default_client()`.
     
     Returns
     -------
     result : dict
         Dictionary representing the API's JSON response.
     """
-    request = requests.post('https://api.github.com/graphql',
-                            json={'query': query},
-                            headers=HEADERS)
+    request = (client or default_client()).query(query, cache=cache)
     if request.status_code == 200:
         return request.json()
     else:
@@ -67,23 +302,10 @@ def get_rate_limit():
         }
     }
     """
-    return query_github(query)
+    return query_github(query, cache=False)
 
 
-def get_easy_stats(repository_owner="keplergo", repository_name="lightkurve"):
-    """Retrieves GitHub stats given a GitHub username and repository.
-    
-    This function retrieves only the stats that can be obtained using a single
-    GraphQL query.
-
-    Returns
-    -------
-    stats : dict
-        Dictionary containing summary stats.
-    """
-    query = """
-        query RepoStats {
-            repository(owner:"%s", name:"%s") {
+EASY_STATS_FIELDS = """
                 createdAt
                 pushedAt
                 shortDescriptionHTML
@@ -106,14 +328,11 @@ def get_easy_stats(repository_owner="keplergo", repository_name="lightkurve"):
                 issues(first:0) {
                     totalCount
                 }
-            }
-        }
-    """ % (repository_owner, repository_name)
-    result = query_github(query)
-    try:
-        d = result['data']['repository']
-    except KeyError:
-        return {}
+"""
+
+
+def _parse_easy_stats(repository_owner, repository_name, d):
+    """Turns the `repository` object of an easy stats query into a stats dict."""
     out = {}
     out['repository_owner'] = repository_owner
     out['repository_name'] = repository_name
@@ -138,6 +357,157 @@ def get_easy_stats(repository_owner="keplergo", repository_name="lightkurve"):
     return out
 
 
+def get_easy_stats(repository_owner="keplergo", repository_name="lightkurve"):
+    """Retrieves GitHub stats given a GitHub username and repository.
+    
+    This function retrieves only the stats that can be obtained using a single
+    GraphQL query.
+
+    Returns
+    -------
+    stats : dict
+        Dictionary containing summary stats.
+    """
+    query = """
+        query RepoStats {
+            repository(owner:"%s", name:"%s") {
+                %s
+            }
+        }
+    """ % (repository_owner, repository_name, EASY_STATS_FIELDS)
+    result = query_github(query)
+    try:
+        d = result['data']['repository']
+    except KeyError:
+        return {}
+    return _parse_easy_stats(repository_owner, repository_name, d)
+
+
+def build_easy_stats_many_query(repositories, fields=EASY_STATS_FIELDS):
+    """Build a single GraphQL query which returns the easy stats of many repos.
+
+    Each repository is requested under the alias `r0`, `r1`, ...; the cost of
+    the query is returned under `rateLimit`.
+
+    Parameters
+    ----------
+    repositories : list of (str, str)
+        (owner, name) pairs.
+    fields : str
+        Fields requested for every repository.
+
+    Returns
+    -------
+    query : str
+        GraphQL query.
+    """
+    query = """
+        query RepoStatsMany {
+            rateLimit {
+                cost
+                remaining
+            }
+        """
+    for idx, (repository_owner, repository_name) in enumerate(repositories):
+        query += """
+            r%d: repository(owner:"%s", name:"%s") {
+                %s
+            }
+        """ % (idx, repository_owner, repository_name, fields)
+    query += """
+        }
+    """
+    return query
+
+
+def get_easy_stats_many(repositories, batch_size=None, max_batch_size=100, max_cost=10):
+    """Retrieves the stats of `get_easy_stats` for many repositories at once.
+
+    Repositories are requested in batches, each batch being a single GraphQL
+    query in which every repository has its own alias.  A repository which
+    does not exist (or which raises an error of its own) is reported the same
+    way as by `get_easy_stats`.  If a whole batch fails, it is split in two
+    and retried.
+
+    Parameters
+    ----------
+    repositories : list of (str, str)
+        (owner, name) pairs.
+    batch_size : int, optional
+        Number of repositories per query.  By default the batch size is
+        adapted after every query, using the `cost` reported by the API, so
+        that a query costs at most `max_cost` rate limit points.
+    max_batch_size : int
+        Upper limit on the adaptive batch size.
+    max_cost : int
+        Target rate limit cost of a single query.
+
+    Returns
+    -------
+    stats : list of dict
+        One dictionary per repository, in the input order.
+    """
+    from tqdm import tqdm
+    repositories = list(repositories)
+    stats = []
+    size = batch_size or min(25, max_batch_size)
+    with tqdm(total=len(repositories)) as progress:
+        while len(stats) < len(repositories):
+            batch = repositories[len(stats):len(stats) + size]
+            batch_stats, cost = _get_easy_stats_batch(batch)
+            stats.extend(batch_stats)
+            progress.update(len(batch))
+            if batch_size is None and cost:
+                size = min(max(max_cost * len(batch) // cost, 1), max_batch_size)
+    return stats
+
+
+def get_pushed_at_many(repositories, batch_size=100):
+    """Returns the time of the latest push to many repositories.
+
+    This only requests `pushedAt`, in batches of `batch_size` repositories
+    per query, and always bypasses the response cache.
+
+    Returns
+    -------
+    pushed_at : list of str
+        ISO timestamps in the input order; None for missing repositories.
+    """
+    from tqdm import tqdm
+    repositories = list(repositories)
+    pushed_at = []
+    for start in tqdm(range(0, len(repositories), batch_size)):
+        batch = repositories[start:start + batch_size]
+        data = query_github(build_easy_stats_many_query(batch, fields="pushedAt"), cache=False)['data']
+        for idx in range(len(batch)):
+            repository = data.get('r%d' % idx)
+            pushed_at.append(None if repository is None else repository['pushedAt'])
+    return pushed_at
+
+
+def _get_easy_stats_batch(batch):
+    """Returns the stats and the rate limit cost of a batch of repositories."""
+    try:
+        result = query_github(build_easy_stats_many_query(batch))
+    except Exception:
+        # Large batches can time out on GitHub's side; retry them in halves below
+        if len(batch) == 1:
+            raise
+        result = {}
+    data = result.get('data')
+    if data is None:
+        if len(batch) == 1:
+            return [{}], None
+        half = len(batch) // 2
+        first, first_cost = _get_easy_stats_batch(batch[:half])
+        second, second_cost = _get_easy_stats_batch(batch[half:])
+        return first + second, (first_cost or 0) + (second_cost or 0)
+    stats = [_parse_easy_stats(repository_owner, repository_name, data.get('r%d' % idx))
+             for idx, (repository_owner, repository_name) in enumerate(batch)]
+    cost = data['rateLimit']['cost'] if data.get('rateLimit') else None
+    return stats, cost
+
+
 def build_authors_query(repository_owner="keplergo", repository_name="lightkurve",
                         contribution="pullRequests", first=100, after=None):
     """Build a GitHub GraphQL query which returns authors of a repo's issues or PRs.
@@ -175,9 +545,42 @@ def build_authors_query(repository_owner="keplergo", repository_name="lightkurve
     return query    
 
 
+def _authors_state_path(repository_owner, repository_name, contribution):
+    """Returns the file holding the saved pagination state of `get_authors`."""
+    name = f"{repository_owner}__{repository_name}__{contribution}.json".lower()
+    return os.path.join(AUTHORS_STATE_DIR, name)
+
+
+def _load_authors_state(repository_owner, repository_name, contribution):
+    """Returns the saved `(endCursor, authors)` of a repo, or `(None, [])`."""
+    path = _authors_state_path(repository_owner, repository_name, contribution)
+    if not os.path.exists(path):
+        return None, []
+    with open(path) as f:
+        state = json.load(f)
+    return state['endCursor'], state['authors']
+
+
+def _save_authors_state(repository_owner, repository_name, contribution, endCursor, authors):
+    """Atomically saves the pagination state of a repo, with each author once."""
+    path = _authors_state_path(repository_owner, repository_name, contribution)
+    os.makedirs(AUTHORS_STATE_DIR, exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'endCursor': endCursor, 'authors': sorted(set(authors))}, f)
+    os.replace(path + '.tmp', path)
+
+
 def get_authors(repository_owner="keplergo", repository_name="lightkurve",
-                contribution="pullRequests"):
+                contribution="pullRequests", incremental=False):
     """Returns a list of all authors of a repo's issues or pull requests.
+
+    Parameters
+    ----------
+    incremental : bool
+        If True, resume from the last page retrieved by a previous
+        incremental call, so that only the issues or pull requests created
+        since then are fetched.  The cursor and the set of authors are
+        saved in `AUTHORS_STATE_DIR`.
     
     Returns
     -------
@@ -185,15 +588,22 @@ def get_authors(repository_owner="keplergo", repository_name="lightkurve",
         List of all GitHub usernames who opened a Pull Request on the repo.
     """
     authors = []
+    endCursor, cache = None, None
+    if incremental:
+        endCursor, authors = _load_authors_state(repository_owner, repository_name, contribution)
+        if endCursor is not None:
+            # New items appear on the last page, which may be in the response cache
+            cache = False
     # GitHub's GraphQL API only appears to allow retreiving 100 edges at a time;
     # so we are forced to paginate.
-    endCursor, hasNextPage = None, True
+    hasNextPage = True
     while hasNextPage:
         qry = build_authors_query(repository_owner=repository_owner,
                                   repository_name=repository_name,
                                   contribution=contribution,
                                   after=endCursor)
-        js = query_github(qry)
+        with tracing.context(repo=f"github.com/{repository_owner}/{repository_name}".lower()):
+            js = query_github(qry, cache=cache)
         try:
             if js['data']['repository'] is None:
                 print(f"Warning: not found: {repository_owner}/{repository_name}")
@@ -204,14 +614,54 @@ def get_authors(repository_owner="keplergo", repository_name="lightkurve",
                          for edge in js['data']['repository'][contribution]['edges']
                          if edge['node']['author'] is not None]
         authors.extend(extra_authors)
-        endCursor = js['data']['repository'][contribution]['pageInfo']['endCursor']
+        # The cursor is null when a page is empty, i.e. nothing new since the last run
+        endCursor = js['data']['repository'][contribution]['pageInfo']['endCursor'] or endCursor
         hasNextPage = js['data']['repository'][contribution]['pageInfo']['hasNextPage']
     # Sanity check: did we get all authors?
     #assert(len(authors) == js['data']['repository'][contribution]['totalCount'])
+    if incremental:
+        _save_authors_state(repository_owner, repository_name, contribution, endCursor, authors)
     return authors
 
 
-def get_repo_stats(repository_owner="keplergo", repository_name="lightkurve"):
+def get_author_stats(repository_owner="keplergo", repository_name="lightkurve",
+                     incremental=False, contributors=None):
+    """Returns the number of unique authors of a repo's issues and pull requests.
+
+    The issues and pull requests are paginated concurrently.
+
+    Parameters
+    ----------
+    contributors : contributors.ContributorIndex, optional
+        Index in which the authors are recorded, for questions across
+        repositories.
+    
+    Returns
+    -------
+    stats : dict
+        Unique author counts for issues, pull requests and both combined.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(get_authors, repository_owner, repository_name,
+                                   contribution=contribution, incremental=incremental)
+                   for contribution in ["issues", "pullRequests"]]
+        authors_issues, authors_prs = [future.result() for future in futures]
+    if contributors is None:
+        from contributors import ContributorIndex
+        contributors = ContributorIndex()
+    repo = (repository_owner, repository_name)
+    contributors.add(repo, "issues", authors_issues)
+    contributors.add(repo, "pullRequests", authors_prs)
+    stats = {}
+    stats['n_issues_unique_authors'] = contributors.count(repo, "issues")
+    stats['n_prs_unique_authors'] = contributors.count(repo, "pullRequests")
+    stats['n_unique_authors'] = contributors.count(repo)
+    return stats
+
+
+def get_repo_stats(repository_owner="keplergo", repository_name="lightkurve",
+                   incremental=False, contributors=None):
     """Returns all repository stats we care about.
     
     Returns
@@ -220,24 +670,79 @@ def get_repo_stats(repository_owner="keplergo", repository_name="lightkurve"):
         Stats for the requested repo.
     """
     stats = get_easy_stats(repository_owner, repository_name)
-    authors_issues = get_authors(repository_owner, repository_name, contribution="issues")
-    authors_prs = get_authors(repository_owner, repository_name, contribution="pullRequests")
-    stats['n_issues_unique_authors'] = len(np.unique(authors_issues))
-    stats['n_prs_unique_authors'] = len(np.unique(authors_prs))
-    stats['n_unique_authors'] = len(np.unique(authors_issues + authors_prs))
+    stats.update(get_author_stats(repository_owner, repository_name, incremental=incremental,
+                                  contributors=contributors))
     return stats
 
 
+def _found(stats):
+    """Whether repository stats are complete, rather than the empty stats of a failed query."""
+    return stats is not None and "repository_owner" in stats and "repository_name" in stats
+
+
+def get_repo_stats_many(repositories, batch_size=None, workers=4, incremental=False,
+                        ledger=None, contributors=None):
+    """Returns `get_repo_stats` for many (owner, name) pairs.
+
+    The easy stats are retrieved in batches using `get_easy_stats_many`;
+    the authors of up to `workers` repositories are paginated concurrently.
+    If a `ledger.Ledger` is given, the stats of every repository are
+    recorded in it under "owner/name" as soon as they are complete, and
+    repositories it already holds are not queried again.  Repositories
+    whose query failed (empty stats) are then neither recorded nor
+    returned, so that the next run tries them again.  The authors are
+    recorded in `contributors`, if given; those of repositories held by the
+    ledger but missing from the index are fetched again (usually from the
+    response cache).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from tqdm import tqdm
+    repositories = list(repositories)
+    # Ledgers written before failures were left out may hold them
+    done = set() if ledger is None else {key for key in ledger.keys() if _found(ledger[key])}
+    todo = [repo for repo in repositories if "/".join(repo) not in done]
+    stats = get_easy_stats_many(todo, batch_size=batch_size)
+    if contributors is not None and ledger is not None:
+        pending = set(todo)
+        missing = [repo for repo in repositories if repo not in pending and repo not in contributors]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(lambda repo: get_author_stats(*repo, incremental=incremental,
+                                                            contributors=contributors), missing))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        author_stats = executor.map(lambda repo: get_author_stats(*repo, incremental=incremental,
+                                                                  contributors=contributors),
+                                    todo)
+        for repo, repo_stats, extra in zip(todo, stats, tqdm(author_stats, total=len(todo))):
+            repo_stats.update(extra)
+            if ledger is not None and _found(repo_stats):
+                ledger.record("/".join(repo), repo_stats)
+    if ledger is None:
+        return stats
+    rows = [ledger["/".join(repo)] for repo in repositories if "/".join(repo) in ledger]
+    return [row for row in rows if _found(row)]
+
+
 if __name__ == "__main__":
+    import argparse
     import pandas as pd
+    import contributors
     import githubwebstats
+    import shards
+    from ledger import Ledger
+    parser = argparse.ArgumentParser(description="Retrieve the stats of all repositories in arxiv2github.csv.")
+    parser.add_argument("--shard", help="only crawl shard i of N (i/N); see shards.py")
+    args = parser.parse_args()
     github_urls = list(githubwebstats._clean_github_urls())
     github_urls.append("github.com/KeplerGO/lightkurve")
-    stats = []
-    for url in tqdm(github_urls):
-        components = url.split("/")
-        stats.append(get_repo_stats(repository_owner=components[1],
-                                    repository_name=components[2]))
+    github_urls = shards.select(github_urls, args.shard)
+    repositories = [tuple(url.split("/")[1:3]) for url in github_urls]
+    # Rerunning after an interruption only queries the repositories not in the ledger
+    index_path = shards.shard_path(contributors.INDEX_FILE, args.shard)
+    index = contributors.ContributorIndex.load(index_path) if os.path.exists(index_path) \
+        else contributors.ContributorIndex()
+    with Ledger(shards.shard_path("github-api-stats.jsonl", args.shard)) as ledger:
+        stats = get_repo_stats_many(repositories, ledger=ledger, contributors=index)
+    index.save(index_path)
     newdf = pd.DataFrame(stats)
-    newdf.to_csv("github-api-stats.csv")
+    newdf.to_csv(shards.shard_path("github-api-stats.csv", args.shard))
     print(get_rate_limit())
@@ -1,9 +1,85 @@
+import asyncio
+import collections
+import concurrent.futures
+import os
+import re
+import urllib.parse
+
 import pandas as pd
 import numpy as np
-import requests
 from tqdm import tqdm
 from copy import deepcopy
 
+import httpcache
+from rules import Ruleset
+import tracing
+from collector import ResultCollector
+
+COLUMNS = ['github_url', 'exists', 'readme', 'readme_length', 'installation', "CI", "docs",
+           'fancy_docs', 'examples', 'requirements', 'setup']
+
+README_NAMES = ['README', 'readme']
+README_EXTENSIONS = ['.md', '.rst', '', '.txt']
+INSTALL_FILES = ['INSTALL', 'makefile']
+INSTALL_KEYWORDS = ['pip ', 'install ', 'installation ', ' installation instructions ', 'pypi', 'conda ']
+CI_FILES = ['.travis.yml', 'azure-pipelines.yml', 'appveyor.yml', '.circleci/config.yml']
+DOCS_DIRS = ['doc', 'docs', 'documentation', 'document', 'documents', 'Documentation', "Docs"]
+EXAMPLES_DIRS = ['examples', 'tutorials', 'example', 'tutorial']
+EXAMPLES_KEYWORDS = ['tutorials', 'examples']
+
+# Repository paths looked for by each check, in the order they are tried
+CHECK_PATHS = {'readme': [name + extension for name in README_NAMES for extension in README_EXTENSIONS],
+               'setup': ['setup.py'],
+               'installation': INSTALL_FILES,
+               'CI': CI_FILES,
+               'docs': DOCS_DIRS,
+               'examples': EXAMPLES_DIRS,
+               'requirements': ['requirements.txt']}
+DIR_CHECKS = ['docs', 'examples']
+
+# How every column is decided from the paths found in a repository, its readme and the pages which
+# exist (see `rules.Ruleset`); `exists`, `readme` and `readme_length` are not rules, and `setup`
+# has never been set, setup.py counting towards `requirements` instead
+RULES = {'installation': {'paths': INSTALL_FILES, 'readme': INSTALL_KEYWORDS, 'readme_decides': True},
+         'CI': {'paths': CI_FILES},
+         'docs': {'paths': [dir + '/' for dir in DOCS_DIRS]},
+         'fancy_docs': {'pages': ['https://{owner}.github.io/{repo}'], 'readme': ['readthedocs']},
+         'examples': {'paths': [dir + '/' for dir in EXAMPLES_DIRS]
+                      + ['{}/{}/'.format(docs, dir) for docs in DOCS_DIRS for dir in EXAMPLES_DIRS],
+                      'readme': EXAMPLES_KEYWORDS},
+         'requirements': {'paths': ['setup.py', 'requirements.txt']}}
+_RULESET = Ruleset(RULES)
+# Checks which need the content of the file found; the others only need to know it exists
+CONTENT_CHECKS = ['readme']
+# Longest readme read, in bytes; `readme_length` is at most this
+README_MAX_BYTES = 1024**2
+
+TREE_QUERY = """
+    query RepoTree {
+        repository(owner:"%s", name:"%s") {
+            object(expression:"HEAD:") {
+                ... on Tree {
+                    entries {
+                        name
+                        type
+                        object {
+                            ... on Tree {
+                                entries {
+                                    name
+                                    type
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    }
+"""
+# Times a tree listing answered with errors (e.g. a timeout) is sent before giving up
+TREE_ATTEMPTS = 3
+
+
 def _clean(string):
     bad_strs = ['\n', '. ', ')', '(', ',']
     newstring = deepcopy(string)
@@ -11,125 +87,377 @@ def _clean(string):
         newstring = newstring.replace(b, '')
     return newstring
 
+# A raw hit split on '/' as in 'github.com/owner/repo...', capturing owner and repo; hits on other
+# hosts (e.g. 'gitlab.com/owner/repo', see `arxiv2github.REPOSITORY_HOSTS`) are skipped
+_HIT_PATTERN = re.compile(r"(?:^| )github\.com/([^ /]*)/([^ /]*)")
+# The characters removed by `_clean` (a hit never contains the space of '. ')
+_CLEAN_TABLE = str.maketrans('', '', "\n)(,")
+
+# Memoized results of `_clean_github_urls`, keyed by file path and modification time
+_clean_github_urls_cache = {}
+
+
+def _clean_hits(text):
+    ''' Returns the set of lowercase 'github.com/owner/repo' urls in a string of space separated raw hits,
+        ignoring the hits on other hosts.
+    '''
+    return {'github.com/' + (owner + '/' + repo).translate(_CLEAN_TABLE).lower()
+            for owner, repo in _HIT_PATTERN.findall(text)
+            if len(repo.translate(_CLEAN_TABLE)) > 0}
+
+
 def _clean_github_urls(filename='arxiv2github.csv'):
-    df = pd.read_csv(filename)
-    github_urls = []
-    for idx, d in df.iterrows():
-        urls = (d['urls'].replace("'", "")[1:-1].split(" "))
-        if urls[0] == '':
+    ''' Returns the unique, lowercase 'github.com/owner/repo' urls found in `arxiv2github.csv`.
+
+        The `urls` column holds the repr of a numpy array of raw hits per paper. All hits are
+        cut down to 'owner/repo' and stripped of the characters removed by `_clean` in a single
+        regex pass over the whole column. The result is memoized until the file is modified.
+    '''
+    key = (os.path.abspath(filename), os.stat(filename).st_mtime_ns)
+    if key not in _clean_github_urls_cache:
+        with tracing.span('url_cleaning'):
+            urls = pd.read_csv(filename, usecols=['urls'])['urls']
+            text = ' '.join(url[1:-1] for url in urls).replace("'", "")
+            packages = _clean_hits(text)
+            _clean_github_urls_cache[key] = np.unique(np.asarray(list(packages), dtype=str))
+    return _clean_github_urls_cache[key].copy()
+
+
+def _probe_plan(github_url):
+    ''' Returns the candidate urls for every check on a repository, in the order they are tried.
+
+        A check succeeds on the first of its urls that returns a 200.
+    '''
+    owner, repo = github_url.split('/')[1:3]
+    # The hosts the http:// and raw.github.com urls used to redirect to, saving a round trip each
+    raw = 'https://raw.githubusercontent.com/{}/{}/master/'.format(owner, repo)
+    tree = 'https://{}/tree/master/'.format(github_url)
+    prefixes = {'docs': tree, 'examples': tree}
+    return {check: [prefixes.get(check, raw) + path for path in paths] for check, paths in CHECK_PATHS.items()}
+
+
+def _probed_paths(github_url, hits):
+    ''' Returns the repository paths found by the probes of `_probe_plan`, directories ending in '/'.
+
+        `hits` maps each check in `_probe_plan` (plus 'docs_examples') to the
+        `(url, content)` of its first successful url, or None if no url succeeded.
+    '''
+    paths = {}
+    for check, urls in _probe_plan(github_url).items():
+        if hits[check] is not None:
+            paths[check] = CHECK_PATHS[check][urls.index(hits[check][0])] + ('/' if check in DIR_CHECKS else '')
+    if hits.get('docs_examples') is not None:
+        dir = EXAMPLES_DIRS[_docs_examples_plan(hits['docs'][0]).index(hits['docs_examples'][0])]
+        paths['docs_examples'] = paths['docs'] + dir + '/'
+    return list(paths.values())
+
+
+def _pages(github_url, ruleset=None):
+    ''' Returns the urls of the pages looked for by `ruleset` (default `RULES`).
+    '''
+    owner, repo = github_url.split('/')[1:3]
+    return (ruleset or _RULESET).pages(owner=owner, repo=repo)
+
+
+def _docs_examples_plan(docs_url):
+    ''' Returns the candidate example directories inside a docs directory.
+    '''
+    return ['{}/{}'.format(docs_url, dir) for dir in EXAMPLES_DIRS]
+
+
+def _evaluate(github_url, paths, readme=None, pages=(), ruleset=None):
+    ''' Turns what was found of one repository into a row of `COLUMNS`, applying `ruleset`
+        (default `RULES`).
+
+        `paths` are the paths found in the repository, directories ending in '/', or None if
+        the repository does not exist. `readme` is the content of its readme, if any, and
+        `pages` are the urls of `_pages` which exist.
+    '''
+    row = dict.fromkeys(COLUMNS, False)
+    row['github_url'] = github_url
+    row['exists'] = paths is not None
+    if not row['exists']:
+        return row
+
+    if readme is not None:
+        # A readme cut at README_MAX_BYTES may end in the middle of a character
+        readme = str(readme, 'utf-8', errors='replace')
+        row['readme'] = True
+        row['readme_length'] = len(readme)
+
+    owner, repo = github_url.split('/')[1:3]
+    row.update((ruleset or _RULESET).evaluate(paths, readme, pages, owner=owner, repo=repo))
+    return row
+
+
+def _first_ok(urls, timeout=500, content=False):
+    ''' Returns `(url, content)` for the first url that returns a 200, or None.
+
+        Without `content` only HEAD requests are sent and the content is None; otherwise
+        at most `README_MAX_BYTES` of it are read. Responses, including 404s, are cached
+        on disk by `httpcache`.
+    '''
+    for url in urls:
+        if content:
+            response = httpcache.get(url, timeout=timeout, max_bytes=README_MAX_BYTES)
+        else:
+            response = httpcache.head(url, timeout=timeout)
+        if response.status_code == 200:
+            return url, response.content if content else None
+    return None
+
+
+def _list_tree(github_url):
+    ''' Lists the files and directories in the top two levels of a repository's default branch
+        using a single GraphQL query. Directories end in a '/'.
+
+        Returns None if the repository does not exist. A query answered with errors instead
+        (e.g. a timeout listing a large tree) is sent up to `TREE_ATTEMPTS` times, then raises,
+        so that the repository is not recorded as missing and is checked again on the next run.
+    '''
+    import github_api_stats
+    owner, repo = github_url.split('/')[1:3]
+    for _ in range(TREE_ATTEMPTS):
+        result = github_api_stats.query_github(TREE_QUERY % (owner, repo))
+        data = result.get('data')
+        if data is not None and (data.get('repository') is None or not result.get('errors')):
+            break
+    else:
+        raise Exception("Listing {} failed {} times: {}".format(github_url, TREE_ATTEMPTS, result.get('errors')))
+    repository = data.get('repository')
+    if repository is None:
+        return None
+    paths = set()
+    if repository['object'] is None:
+        # Empty repository
+        return paths
+    for entry in repository['object']['entries']:
+        if entry['type'] != 'tree':
+            paths.add(entry['name'])
             continue
-        usernames = (np.unique([url.split('/')[1] for url in urls]))
-        packages = ((np.unique([_clean('/'.join(url.split('/')[1:3])) for url in urls])))
-        packages = np.unique(packages[packages != ''])
-        packages = packages[['/' in package for package in packages]]
-
-        ok = [len(package.split('/')[1].replace(' ', '')) > 0 for package in packages]
-        packages = packages[ok]
-
-        _ = [github_urls.append('github.com/{}'.format(package.lower())) for package in packages]
-
-    github_urls = np.unique(github_urls)
-    return github_urls
-
-
-def github2stats(github_urls=_clean_github_urls()):
-    results = pd.DataFrame(columns=['github_url', 'exists', 'readme',
-                                    'readme_length', 'installation', "CI", "docs", 'fancy_docs',
-                                    'examples', 'requirements', 'setup'])
-
-    for idx in tqdm(range(len(github_urls))):
-        github_url = github_urls[idx]
-        results.loc[idx, 'github_url'] = github_url
-
-        # Exists
-        results.loc[idx, 'exists'] = requests.get('https://{}'.format(github_url), timeout=500).status_code == 200
-
-        if results.loc[idx, 'exists']:
-
-            # Has readme
-            readme = None
-            for name in ['README', 'readme']:
-                for extension in ['.md', '.rst', '', '.txt']:
-                    url = 'http://raw.{}/master/{}{}'.format(github_url, name, extension)
-                    response = requests.get(url, timeout=500)
-                    if response.status_code == 200:
-                        readme =  str(response.content, 'utf-8')
-                        break
-            if readme is not None:
-                results.loc[idx, 'readme'] = True
-                results.loc[idx, 'readme_length'] = len(readme)
-
-
-            # Has installation
-            response = requests.get('https://raw.githubusercontent.com/{}/master/setup.py'.format('/'.join(github_url.split('/')[1:])), timeout=500)
-            if response.status_code == 200:
-                results.loc[idx, 'requirements'] =  True
-            for file in ['INSTALL', 'makefile']:
-                url = 'http://raw.{}/master/{}'.format(github_url, file)
-                response = requests.get(url, timeout=500)
-                if response.status_code == 200:
-                    results.loc[idx, 'installation'] =  True
-                    break
-            if readme is not None:
-                results.loc[idx, 'installation'] = np.asarray([term in readme.lower() for term in
-                                                               ['pip ', 'install ', 'installation ',
-                                                                ' installation instructions ', 'pypi',
-                                                                'conda ']]).any()
-
-
-            # Has CI
-            for file in ['.travis.yml', 'azure-pipelines.yml', 'appveyor.yml', '.circleci/config.yml']:
-                url = 'http://raw.{}/master/{}'.format(github_url, file)
-                response = requests.get(url, timeout=500)
-                if response.status_code == 200:
-                    results.loc[idx, 'CI'] =  True
-                    break
-
-
-            # Has Docs
-            docs = None
-            for dir in ['doc', 'docs', 'documentation', 'document', 'documents', 'Documentation', "Docs"]:
-                response = requests.get('http://{}/tree/master/{}'.format(github_url, dir), timeout=500)
-                if response.status_code == 200:
-                    results.loc[idx, 'docs'] =  True
-                    docs = 'http://{}/tree/master/{}'.format(github_url, dir)
-                    break
-
-
-            # Has fancy docs
-            url = 'http://{}.github.io/{}'.format(github_url.split('/')[1], github_url.split('/')[2])
-            response = requests.get(url, timeout=500)
-            if response.status_code == 200:
-                results.loc[idx, 'fancy_docs'] = True
-            if (results.loc[idx, 'fancy_docs'] != True) & (readme is not None):
-                if 'readthedocs' in readme.lower():
-                    results.loc[idx, 'fancy_docs'] = True
-
-
-            # Has examples
-            for dir in ['examples', 'tutorials', 'example', 'tutorial']:
-                response = requests.get('http://{}/tree/master/{}'.format(github_url, dir), timeout=500)
-                if response.status_code == 200:
-                    results.loc[idx, 'examples'] =  True
-                    break
-            if (results.loc[idx, 'examples'] != True) & (docs is not None):
-                # Has examples
-                for dir in ['examples', 'tutorials', 'example', 'tutorial']:
-                    response = requests.get('{}/{}'.format(docs, dir), timeout=500)
-                    if response.status_code == 200:
-                        results.loc[idx, 'examples'] =  True
-                        break
-            if (results.loc[idx, 'examples'] != True) & (readme is not None):
-                for keyword in ['tutorials', 'examples']:
-                    if keyword in readme.lower():
-                        results.loc[idx, 'examples'] = True
-
-
-            # Has Requirements
-            response = requests.get('https://raw.{}/master/requirements.txt'.format(github_url), timeout=500)
-            if response.status_code == 200:
-                results.loc[idx, 'requirements'] =  True
-
-
-
-    return results.fillna(False)
+        paths.add(entry['name'] + '/')
+        for subentry in entry['object']['entries']:
+            paths.add(entry['name'] + '/' + subentry['name'] + ('/' if subentry['type'] == 'tree' else ''))
+    return paths
+
+
+def _tree_readme(paths):
+    ''' Returns the readme a repository listing shows, the first in `CHECK_PATHS` order, or None.
+    '''
+    return next((path for path in CHECK_PATHS['readme'] if path in paths), None)
+
+
+def _raw_head_url(github_url, path):
+    ''' Returns the raw url of a file on the default branch of a repository.
+    '''
+    return 'https://raw.githubusercontent.com/{}/HEAD/{}'.format('/'.join(github_url.split('/')[1:3]), path)
+
+
+def _probe_repo_stats(github_url, timeout=500, ruleset=None):
+    ''' Checks one repository by requesting every candidate url in turn, applying `ruleset`
+        (default `RULES`).
+    '''
+    if _first_ok(['https://{}'.format(github_url)], timeout) is None:
+        return _evaluate(github_url, None)
+    hits = {check: _first_ok(urls, timeout, check in CONTENT_CHECKS)
+            for check, urls in _probe_plan(github_url).items()}
+    if (hits['examples'] is None) & (hits['docs'] is not None):
+        hits['docs_examples'] = _first_ok(_docs_examples_plan(hits['docs'][0]), timeout)
+    pages = [url for url in _pages(github_url, ruleset) if _first_ok([url], timeout) is not None]
+    readme = None if hits['readme'] is None else hits['readme'][1]
+    return _evaluate(github_url, _probed_paths(github_url, hits), readme, pages, ruleset)
+
+
+def _tree_repo_stats(github_url, timeout=500, ruleset=None):
+    ''' Checks one repository from a single listing of its default branch, plus a request
+        for the readme content and one for the github.io page; see `_probe_repo_stats`.
+    '''
+    paths = _list_tree(github_url)
+    if paths is None:
+        return _evaluate(github_url, None)
+    readme = _tree_readme(paths)
+    if readme is not None:
+        readme = _first_ok([_raw_head_url(github_url, readme)], timeout, content=True)
+    pages = [url for url in _pages(github_url, ruleset) if _first_ok([url], timeout) is not None]
+    return _evaluate(github_url, paths, None if readme is None else readme[1], pages, ruleset)
+
+
+def github2stats(github_urls=None, mode='probe', checkpoint=None, ledger=None):
+    ''' Checks a list of 'github.com/owner/repo' urls for signs of a well-kept open source project.
+
+        With `mode='probe'` every candidate file and directory on the `master` branch is requested
+        in turn (up to ~30 requests per repository). With `mode='tree'` the default branch is
+        listed once through the GitHub GraphQL API (requires a token, see `github_api_stats`)
+        and the checks are computed from that listing, which takes 2-3 requests per repository.
+
+        `github_urls` defaults to all urls found in `arxiv2github.csv`. Rows are appended to the
+        csv file `checkpoint` as they are collected, if given. If a `ledger.Ledger` is given,
+        every row is recorded in it and urls it already holds are not checked again, so that an
+        interrupted run can be resumed.
+    '''
+    if github_urls is None:
+        github_urls = _clean_github_urls()
+    if mode not in ('probe', 'tree'):
+        raise ValueError("mode must be 'probe' or 'tree', not {!r}".format(mode))
+    repo_stats = _tree_repo_stats if mode == 'tree' else _probe_repo_stats
+    results = ResultCollector(COLUMNS, checkpoint=checkpoint)
+    for github_url in tqdm(github_urls):
+        if ledger is not None and github_url in ledger:
+            results.append(ledger[github_url])
+            continue
+        with tracing.context(repo=github_url):
+            row = repo_stats(github_url)
+        if ledger is not None:
+            ledger.record(github_url, row)
+        results.append(row)
+    return results.to_frame()
+
+
+class _Limiter:
+    ''' Runs blocking probes on a thread pool, capping how many are in flight
+        in total and per host.
+    '''
+    def __init__(self, max_concurrency, max_per_host):
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency)
+        self.total = asyncio.Semaphore(max_concurrency)
+        self.per_host = collections.defaultdict(lambda: asyncio.Semaphore(max_per_host))
+
+    async def run(self, url, func, *args):
+        host = urllib.parse.urlsplit(url).hostname
+        async with self.total, self.per_host[host]:
+            # Threads do not inherit the tracing context of the task
+            return await asyncio.get_running_loop().run_in_executor(self.executor, tracing.run_in_context(func),
+                                                                    *args)
+
+
+async def _afirst_ok(limiter, urls, timeout=500, content=False):
+    ''' Asynchronous `_first_ok`: tries `urls` in order and stops at the first 200.
+    '''
+    for url in urls:
+        hit = await limiter.run(url, _first_ok, [url], timeout, content)
+        if hit is not None:
+            return hit
+    return None
+
+
+async def _aprobe_repo_stats(limiter, github_url, timeout=500):
+    ''' Asynchronous `_probe_repo_stats`, running all checks of the repository concurrently.
+    '''
+    if await _afirst_ok(limiter, ['https://{}'.format(github_url)], timeout) is None:
+        return _evaluate(github_url, None)
+    plan, pages = _probe_plan(github_url), _pages(github_url)
+    found = await asyncio.gather(*[_afirst_ok(limiter, urls, timeout, check in CONTENT_CHECKS)
+                                   for check, urls in plan.items()],
+                                 *[_afirst_ok(limiter, [url], timeout) for url in pages])
+    hits = dict(zip(plan.keys(), found))
+    if (hits['examples'] is None) & (hits['docs'] is not None):
+        hits['docs_examples'] = await _afirst_ok(limiter, _docs_examples_plan(hits['docs'][0]), timeout)
+    pages = [url for url, hit in zip(pages, found[len(plan):]) if hit is not None]
+    readme = None if hits['readme'] is None else hits['readme'][1]
+    return _evaluate(github_url, _probed_paths(github_url, hits), readme, pages)
+
+
+async def _atree_repo_stats(limiter, github_url, timeout=500):
+    ''' Asynchronous `_tree_repo_stats`.
+    '''
+    paths = await limiter.run('https://api.github.com/graphql', _list_tree, github_url)
+    if paths is None:
+        return _evaluate(github_url, None)
+    readme = _tree_readme(paths)
+    readme_urls = [] if readme is None else [_raw_head_url(github_url, readme)]
+    pages = _pages(github_url)
+    readme, *found = await asyncio.gather(_afirst_ok(limiter, readme_urls, timeout, content=True),
+                                          *[_afirst_ok(limiter, [url], timeout) for url in pages])
+    pages = [url for url, hit in zip(pages, found) if hit is not None]
+    return _evaluate(github_url, paths, None if readme is None else readme[1], pages)
+
+
+async def github2stats_async(github_urls, mode='probe', max_concurrency=32, max_per_host=8, timeout=500,
+                             ledger=None):
+    ''' Concurrent version of `github2stats`.
+
+        Probes many repositories (and the checks within each repository) at the same time,
+        with at most `max_concurrency` requests in flight overall and `max_per_host` per host.
+        Within a check the candidate urls are still tried in order, so the number of requests
+        and the results are the same as `github2stats`. Rows are returned in input order.
+
+        Run with `asyncio.run(github2stats_async(urls))`, or `await` it from a notebook.
+        Rows are recorded in `ledger` as each repository finishes, as in `github2stats`.
+    '''
+    if mode not in ('probe', 'tree'):
+        raise ValueError("mode must be 'probe' or 'tree', not {!r}".format(mode))
+    repo_stats = _atree_repo_stats if mode == 'tree' else _aprobe_repo_stats
+    limiter = _Limiter(max_concurrency, max_per_host)
+    progress = tqdm(total=len(github_urls))
+
+    async def _one(github_url):
+        if ledger is not None and github_url in ledger:
+            row = ledger[github_url]
+        else:
+            with tracing.context(repo=github_url):
+                row = await repo_stats(limiter, github_url, timeout)
+            if ledger is not None:
+                ledger.record(github_url, row)
+        progress.update()
+        return row
+
+    try:
+        rows = await asyncio.gather(*[_one(github_url) for github_url in github_urls])
+    finally:
+        progress.close()
+        limiter.executor.shutdown(wait=False)
+    with tracing.span('dataframe'):
+        return pd.DataFrame(rows, columns=COLUMNS)
+
+
+def recompute(github_urls=None, mode='tree', rules=None):
+    ''' Recomputes the checks from cached responses only, e.g. after a change to `RULES`.
+
+        No request is sent: repositories with a response missing from the cache are left out and
+        reported. In tree mode every rule can be recomputed, as the listings hold all paths of the
+        top two levels; in probe mode only the paths of `CHECK_PATHS` are known. `rules` replaces
+        `RULES` for this call.
+    '''
+    if github_urls is None:
+        github_urls = _clean_github_urls()
+    if mode not in ('probe', 'tree'):
+        raise ValueError("mode must be 'probe' or 'tree', not {!r}".format(mode))
+    repo_stats = _tree_repo_stats if mode == 'tree' else _probe_repo_stats
+    ruleset = None if rules is None else Ruleset(rules)
+    results = ResultCollector(COLUMNS)
+    missing = []
+    with httpcache.offline():
+        for github_url in tqdm(github_urls):
+            try:
+                results.append(repo_stats(github_url, ruleset=ruleset))
+            except httpcache.NotCached:
+                missing.append(github_url)
+    if missing:
+        print('{} of {} repositories are not fully cached and were left out, e.g. {}'.format(
+              len(missing), len(github_urls), missing[0]))
+    return results.to_frame()
+
+
+def main(args=None):
+    import argparse
+    import shards
+    from ledger import Ledger
+    parser = argparse.ArgumentParser(description='Check all repositories in arxiv2github.csv; '
+                                                 'writes repo_opensource_metrics.csv.')
+    parser.add_argument('--mode', choices=['probe', 'tree'], default='probe')
+    parser.add_argument('--shard', help='only check shard i of N (i/N); see shards.py')
+    parser.add_argument('--offline', action='store_true',
+                        help='recompute the checks from cached responses only, without any request')
+    args = parser.parse_args(args)
+    github_urls = shards.select(_clean_github_urls(), args.shard)
+    if args.offline:
+        results = recompute(github_urls, mode=args.mode)
+        results.to_csv(shards.shard_path('repo_opensource_metrics.csv', args.shard), index=False)
+        return
+    with Ledger(shards.shard_path('repo_opensource_metrics.jsonl', args.shard)) as ledger:
+        results = github2stats(github_urls, mode=args.mode, ledger=ledger)
+    results.to_csv(shards.shard_path('repo_opensource_metrics.csv', args.shard), index=False)
+
+
+if __name__ == "__main__":
+    main()
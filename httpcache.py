@@ -0,0 +1,416 @@
+"""Persistent on-disk cache for the HTTP requests made by the crawlers.
+
+Responses are stored in a SQLite file keyed by method, url and request body,
+so that rerunning a crawl after a crash or a small code change only repeats
+the requests whose cached responses have expired.
+
+Example use
+-----------
+>>> import httpcache
+>>> response = httpcache.get("https://github.com/KeplerGO/lightkurve")
+>>> response.status_code, response.from_cache
+(200, True)
+
+Notes
+-----
+* Successful responses are kept for `ttl` seconds, 404/410 responses
+  ("negative" results, e.g. a missing README) for `negative_ttl` seconds.
+  Other responses (rate limits, server errors) are never cached, nor are
+  GraphQL errors: GitHub answers secondary rate limits and timeouts with a
+  200 whose JSON body has `errors` but no `data`.
+* Once a cached response has expired it is revalidated with
+  `If-None-Match`/`If-Modified-Since` if the server sent an `ETag` or
+  `Last-Modified` header; a 304 reply refreshes the cached copy.
+  GitHub does not count 304 replies against the REST API rate limit.
+* The file is capped at `max_bytes` by evicting the least recently used
+  responses first.
+* Requests share one `requests.Session` (see `default_session`), so
+  connections to a host are kept alive and reused instead of paying for a
+  new TCP/TLS handshake every time.
+* `head` checks whether a url exists without downloading its body, and
+  `max_bytes` caps how much of a body `get` reads.
+* `cached_only=True` returns None instead of sending a request, e.g. to
+  answer from the cache before setting up credentials.
+* Within `offline()` no request is sent at all: responses come from the
+  cache, however old, and `NotCached` is raised for the others.
+* Setting the `NASA_OSS_STATS_BASE_URL` environment variable (or calling
+  `set_base_url`) sends every request to a stand-in server instead, e.g.
+  "https://github.com/a/b" to "http://127.0.0.1:8000/github.com/a/b"; see
+  `fixture_server.py`.  `NASA_OSS_STATS_CACHE_DIR` moves all caches.
+"""
+import json
+import os
+import threading
+import time
+import urllib.parse
+from contextlib import contextmanager
+
+import tracing
+
+CACHE_DIR = os.environ.get('NASA_OSS_STATS_CACHE_DIR', os.path.expanduser("~/.cache/nasa-open-source-stats"))
+CACHE_PATH = os.path.join(CACHE_DIR, "http.sqlite")
+TTL = 7 * 24 * 3600
+NEGATIVE_TTL = 24 * 3600
+MAX_BYTES = 2 * 1024**3
+
+NEGATIVE_STATUSES = (404, 410)
+
+# Connections kept alive per host by the shared session
+POOL_SIZE = 32
+
+# Server which receives all requests in place of the real hosts, if any
+BASE_URL = os.environ.get('NASA_OSS_STATS_BASE_URL') or None
+
+_default_cache = None
+_default_session = None
+_offline = False
+_session_lock = threading.Lock()
+
+
+class NotCached(LookupError):
+    """Raised for a request whose response is not cached, within `offline()`."""
+
+
+class ResponseCache:
+    """Size-bounded, least-recently-used store of HTTP responses in SQLite.
+
+    Parameters
+    ----------
+    path : str
+        Location of the SQLite file; parent directories are created.
+    ttl : float
+        Seconds for which a successful response is served without a request.
+    negative_ttl : float
+        Seconds for which a 404/410 response is served without a request.
+    max_bytes : int
+        Approximate upper limit on the total size of the stored bodies.
+    """
+    def __init__(self, path=CACHE_PATH, ttl=TTL, negative_ttl=NEGATIVE_TTL, max_bytes=MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # The crawlers call us from worker threads; a lock serialises access to the connection
+        self._lock = threading.Lock()
+        import sqlite3
+        self._db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    url TEXT,
+                    status INTEGER,
+                    headers TEXT,
+                    content BLOB,
+                    size INTEGER,
+                    stored_at REAL,
+                    accessed_at REAL
+                )""")
+            self._db.execute("CREATE INDEX IF NOT EXISTS lru ON responses (accessed_at)")
+            self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def key(method, url, body=None):
+        """Returns the cache key of a request."""
+        import hashlib
+        if body is None:
+            body = b''
+        elif isinstance(body, str):
+            body = body.encode('utf-8')
+        return hashlib.sha256(method.upper().encode() + b' ' + url.encode() + b'\n' + body).hexdigest()
+
+    def lookup(self, key):
+        """Returns `(response, fresh)` for a stored response, or `(None, False)`."""
+        with self._lock:
+            row = self._db.execute("SELECT url, status, headers, content, stored_at FROM responses "
+                                   "WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None, False
+            with self._db:
+                self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        url, status, headers, content, stored_at = row
+        ttl = self.negative_ttl if status in NEGATIVE_STATUSES else self.ttl
+        return _build_response(url, status, json.loads(headers), content), time.time() - stored_at < ttl
+
+    def store(self, key, response):
+        """Stores a response if it is cacheable (2xx other than a GraphQL error, 404 or 410)."""
+        if not (200 <= response.status_code < 300 or response.status_code in NEGATIVE_STATUSES):
+            return
+        if _is_graphql_error(response):
+            return
+        content = response.content
+        now = time.time()
+        with self._lock, self._db:
+            old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                             (key, response.url, response.status_code, json.dumps(dict(response.headers)),
+                              content, len(content), now, now))
+            self._size += len(content) - (old[0] if old else 0)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def touch(self, key):
+        """Marks a stored response as freshly validated."""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute("UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?",
+                             (now, now, key))
+
+    def _evict(self):
+        """Drops least recently used responses until the cache is 10% below `max_bytes`."""
+        target = 0.9 * self.max_bytes
+        rows = self._db.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+        evicted = []
+        for key, size in rows:
+            if self._size <= target:
+                break
+            evicted.append((key,))
+            self._size -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def clear(self):
+        """Removes all stored responses."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM responses")
+            self._size = 0
+
+
+def _is_graphql_error(response):
+    """Whether a response is a GraphQL error: a JSON object with `errors` and no `data`."""
+    content = response.content
+    if not content.lstrip().startswith(b'{') or b'"errors"' not in content:
+        return False
+    try:
+        body = json.loads(content)
+    except ValueError:
+        return False
+    return isinstance(body, dict) and bool(body.get('errors')) and body.get('data') is None
+
+
+def _build_response(url, status, headers, content):
+    """Turns a stored response back into a `requests.Response`."""
+    import requests
+    from requests.structures import CaseInsensitiveDict
+    response = requests.Response()
+    response.url = url
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers)
+    response._content = content
+    response.from_cache = True
+    return response
+
+
+def default_cache():
+    """Returns the cache shared by all modules, opening it on first use."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResponseCache()
+    return _default_cache
+
+
+def default_session():
+    """Returns the session shared by all modules and threads, creating it on first use.
+
+    Its connection pools keep up to `POOL_SIZE` connections per host alive.
+    """
+    global _default_session
+    # requests is only imported once a request is sent, so that importing the crawlers stays cheap
+    import requests
+    with _session_lock:
+        if _default_session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _default_session = session
+    return _default_session
+
+
+@contextmanager
+def revalidate():
+    """Within this block, responses in the default cache are never used without a request.
+
+    Expired responses are revalidated with the server where possible (see
+    `request`), which is how a refresh picks up changes without downloading
+    unchanged files again.  This affects all threads using the default cache.
+    """
+    cache = default_cache()
+    ttl, negative_ttl = cache.ttl, cache.negative_ttl
+    cache.ttl, cache.negative_ttl = 0, 0
+    try:
+        yield
+    finally:
+        cache.ttl, cache.negative_ttl = ttl, negative_ttl
+
+
+@contextmanager
+def offline():
+    """Within this block, requests are answered from the cache only, however old the response.
+
+    Requests without a cached response raise `NotCached` instead of being
+    sent, e.g. to recompute results from an earlier crawl without network
+    access.  This affects all threads.
+    """
+    global _offline
+    previous, _offline = _offline, True
+    try:
+        yield
+    finally:
+        _offline = previous
+
+
+def set_base_url(base_url):
+    """Sends all further requests to `base_url` instead of the real hosts.
+
+    The host of every url becomes the first component of its path, e.g.
+    "http://raw.github.com/a/b/master/setup.py" is requested as
+    "<base_url>/raw.github.com/a/b/master/setup.py".  None restores the
+    real hosts.
+    """
+    global BASE_URL
+    BASE_URL = None if base_url is None else base_url.rstrip('/')
+
+
+def rewrite(url):
+    """Returns the url which is actually requested for `url`; see `set_base_url`."""
+    if BASE_URL is None:
+        return url
+    parts = urllib.parse.urlsplit(url)
+    return BASE_URL.rstrip('/') + '/' + parts.netloc + urllib.parse.urlunsplit(('', '', parts.path, parts.query, ''))
+
+
+def request(method, url, cache=None, session=None, max_bytes=None, cached_only=False, **kwargs):
+    """Sends a request through the cache; a drop-in for `requests.request`.
+
+    The url is rewritten to point at the stand-in server if `BASE_URL` is set,
+    and the request is recorded in the trace if `tracing` is enabled.
+
+    Parameters
+    ----------
+    cache : ResponseCache, None or False
+        Cache to use. None uses `default_cache()`, False disables caching.
+    session : requests.Session, optional
+        Session used to send the request; by default `default_session()`.
+    max_bytes : int, optional
+        Read at most this many bytes of the body; the rest is never
+        downloaded.
+    cached_only : bool
+        Return None instead of sending the request if the cache cannot
+        answer it.
+    **kwargs
+        Passed on to `requests.request`.
+
+    Returns
+    -------
+    response : requests.Response
+        With an extra `from_cache` attribute.
+    """
+    if not tracing.enabled():
+        return _request(method, url, cache, session, max_bytes, cached_only, **kwargs)[0]
+    query = kwargs['json'].get('query') if isinstance(kwargs.get('json'), dict) else None
+    with tracing.span('http', event='http', endpoint=tracing.endpoint(url, query), method=method) as span:
+        response, status = _request(method, url, cache, session, max_bytes, cached_only, **kwargs)
+        if response is None:
+            span.cancel()
+            return None
+        if status in ('hit', 'revalidated'):
+            received = 0
+        elif kwargs.get('stream') and max_bytes is None:
+            # Reading the content here would consume the stream
+            received = int(response.headers.get('Content-Length', 0))
+        else:
+            received = len(response.content)
+        span.set(status=response.status_code, cache=status, bytes=received)
+    return response
+
+
+def _read_capped(response, max_bytes):
+    """Reads at most `max_bytes` of a streamed body and releases the connection."""
+    content = b''
+    # Without a body to read (e.g. the GET of `head`), not even one chunk is downloaded
+    if max_bytes > 0:
+        for chunk in response.iter_content(chunk_size=min(1 << 16, max_bytes)):
+            content += chunk
+            if len(content) >= max_bytes:
+                break
+    response._content, response._content_consumed = content[:max_bytes], True
+    response.close()
+
+
+def _request(method, url, cache, session, max_bytes, cached_only, **kwargs):
+    """Does the work of `request`; also returns whether the cache was 'off', a 'hit',
+    a 'miss' or 'revalidated'."""
+    url = rewrite(url)
+    send = (session or default_session()).request
+    if max_bytes is not None:
+        kwargs['stream'] = True
+    if _offline and cache is False:
+        raise NotCached('{} {} is never cached'.format(method, url))
+    if cached_only and cache is False:
+        return None, 'off'
+    if cache is False:
+        response = send(method, url, **kwargs)
+        if max_bytes is not None:
+            _read_capped(response, max_bytes)
+        response.from_cache = False
+        return response, 'off'
+    if cache is None:
+        cache = default_cache()
+
+    body = kwargs.get('data')
+    if kwargs.get('json') is not None:
+        body = json.dumps(kwargs['json'], sort_keys=True)
+    # Query parameters are part of the url the server sees, so they are part of the key
+    import requests
+    key_url = requests.Request(method, url, params=kwargs.get('params')).prepare().url
+    if max_bytes is not None:
+        key_url += ' max_bytes={}'.format(max_bytes)
+    key = cache.key(method, key_url, body)
+    cached, fresh = cache.lookup(key)
+    if fresh or _offline and cached is not None:
+        return cached, 'hit'
+    if _offline:
+        raise NotCached('{} {} is not cached'.format(method, url))
+    if cached_only:
+        return None, 'miss'
+
+    if cached is not None:
+        headers = dict(kwargs.pop('headers', None) or {})
+        if 'ETag' in cached.headers:
+            headers['If-None-Match'] = cached.headers['ETag']
+        if 'Last-Modified' in cached.headers:
+            headers['If-Modified-Since'] = cached.headers['Last-Modified']
+        kwargs['headers'] = headers
+    response = send(method, url, **kwargs)
+    if max_bytes is not None:
+        _read_capped(response, max_bytes)
+    if response.status_code == 304 and cached is not None:
+        cache.touch(key)
+        return cached, 'revalidated'
+    cache.store(key, response)
+    response.from_cache = False
+    return response, 'miss'
+
+
+def get(url, **kwargs):
+    """Cached `requests.get`; see `request`."""
+    return request('GET', url, **kwargs)
+
+
+def head(url, **kwargs):
+    """Cached HEAD request, following redirects like `get`; see `request`.
+
+    Servers which do not allow HEAD get a GET instead, of which only the
+    headers are read.
+    """
+    kwargs.setdefault('allow_redirects', True)
+    response = request('HEAD', url, **kwargs)
+    if response.status_code in (405, 501):
+        response = request('GET', url, max_bytes=0, **kwargs)
+    return response
+
+
+def post(url, **kwargs):
+    """Cached `requests.post`; see `request`."""
+    return request('POST', url, **kwargs)
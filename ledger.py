@@ -0,0 +1,123 @@
+"""Append-only work ledger which lets long crawls resume where they stopped.
+
+Every completed unit of work (a repository, a paper, ...) is appended to a
+JSON Lines file as `{"key": ..., "result": ...}` as soon as it is done.
+When a crawl is restarted, the keys already in the ledger are skipped, so
+a crash, an expired token or a Ctrl-C only costs the unit in progress.
+Once a crawl is complete the ledger is turned into the usual csv file.
+
+Example use
+-----------
+>>> ledger = Ledger('github-api-stats.jsonl')
+>>> for owner, name in ledger.todo(repositories, key=lambda repo: '/'.join(repo)):
+...     ledger.record(f'{owner}/{name}', get_repo_stats(owner, name))
+>>> ledger.to_frame().to_csv('github-api-stats.csv')
+"""
+import json
+import os
+import threading
+
+import pandas as pd
+
+import tracing
+
+
+def _to_json(obj):
+    """Converts the numpy values found in results to plain Python objects."""
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class Ledger:
+    """Persistent record of the completed units of a crawl.
+
+    Parameters
+    ----------
+    path : str
+        JSON Lines file; created if it does not exist, appended to otherwise.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._results = {}
+        self._lock = threading.Lock()
+        cut_short = False
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    cut_short = not line.endswith('\n')
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # The last line may have been cut short by a crash
+                        continue
+                    self._results[entry['key']] = entry['result']
+        self._file = open(path, 'a')
+        if cut_short:
+            self._file.write('\n')
+
+    def __contains__(self, key):
+        return key in self._results
+
+    def __getitem__(self, key):
+        return self._results[key]
+
+    def __len__(self):
+        return len(self._results)
+
+    def keys(self):
+        return self._results.keys()
+
+    def todo(self, items, key=None):
+        """Returns the items whose key is not in the ledger yet, in their original order."""
+        if key is None:
+            return [item for item in items if item not in self._results]
+        return [item for item in items if key(item) not in self._results]
+
+    def record(self, key, result):
+        """Marks `key` as done with its `result`, which must be JSON serializable.
+
+        A result of None records that the unit is done but produced no row.
+        """
+        line = json.dumps({'key': key, 'result': result}, default=_to_json)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+            self._results[key] = json.loads(line)['result']
+
+    def to_frame(self, keys=None, columns=None):
+        """Returns the results as a DataFrame, one row per key.
+
+        Parameters
+        ----------
+        keys : list, optional
+            Keys to include, in output order; by default all keys, in the
+            order they were completed.  Keys which are not done are skipped.
+        columns : list of str, optional
+            Columns of the output.
+        """
+        if keys is None:
+            keys = self._results.keys()
+        with tracing.span('dataframe'):
+            rows = [self._results[key] for key in keys
+                    if key in self._results and self._results[key] is not None]
+            return pd.DataFrame(rows, columns=columns)
+
+    def compact(self):
+        """Rewrites the ledger with a single line per key."""
+        with self._lock:
+            self._file.close()
+            with open(self.path + '.tmp', 'w') as f:
+                for key, result in self._results.items():
+                    f.write(json.dumps({'key': key, 'result': result}) + '\n')
+            os.replace(self.path + '.tmp', self.path)
+            self._file = open(self.path, 'a')
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
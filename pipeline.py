@@ -0,0 +1,502 @@
+"""Run the whole crawl as a single pipeline of streaming stages.
+
+The notebooks run the crawl one step at a time, each step rereading the csv
+file written by the previous one.  Here the steps are stages of a DAG
+
+    ads -> arxiv -> urls -> web
+                         -> api
+                         -> success
+
+which run concurrently on their own threads and pass records downstream
+through bounded queues as soon as they are produced, so that e.g. the
+GitHub probes of the first urls overlap with the parsing of later papers.
+
+Every stage writes the same csv file as the corresponding notebook and
+records its work in a `ledger.Ledger`, so items done by an earlier
+(possibly interrupted) run are not fetched again.  A stage is skipped
+altogether when its parameters and the output of its upstream stage are
+unchanged since it last completed, as recorded in `pipeline-state.json`;
+stages which are skipped or not selected feed their downstream stages from
+their output file instead.
+
+Example use
+-----------
+$ python pipeline.py run --stages ads,arxiv,urls,web,api,success
+$ python pipeline.py run --stages web --web-mode tree
+$ python pipeline.py status
+"""
+import abc
+import argparse
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import pandas as pd
+
+import tracing
+from ledger import Ledger
+
+STATE_FILE = 'pipeline-state.json'
+QUERY = "(full:'github.com/') and (ack:'NASA')"
+
+# Ends the stream of records on a queue
+_DONE = object()
+
+
+class Inbox:
+    """The records sent to a stage by its upstream stage, as they arrive."""
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize)
+
+    def __iter__(self):
+        while True:
+            record = self.queue.get()
+            if record is _DONE:
+                return
+            yield record
+
+    def batches(self, size, wait=1.):
+        """Yields lists of up to `size` records; a shorter list once no record arrived for `wait` seconds."""
+        batch = []
+        while True:
+            try:
+                record = self.queue.get(timeout=wait if batch else None)
+            except queue.Empty:
+                yield batch
+                batch = []
+                continue
+            if record is _DONE:
+                break
+            batch.append(record)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+class Stage(abc.ABC):
+    """A step of the pipeline.
+
+    Subclasses implement `run`, which consumes the records of the upstream
+    stage and passes its own records to `emit`.  Stages which feed other
+    stages also implement `replay`, which reads those records back from the
+    stage's output file, to feed them when the stage itself is skipped.
+    """
+    name = None
+    upstream = None
+    output = None
+
+    def __init__(self, workdir='.', **options):
+        self.workdir = workdir
+        self.options = options
+
+    def path(self, filename):
+        return os.path.join(self.workdir, filename)
+
+    def params(self):
+        """Settings which change the output of the stage."""
+        return {}
+
+    @abc.abstractmethod
+    def run(self, inbox, emit):
+        """Consumes the records of `inbox`, passes records to `emit` and writes the output file."""
+
+
+class AdsStage(Stage):
+    """Finds the arXiv papers matching an ADS query; emits arxiv ids."""
+    name = 'ads'
+    output = 'ads_papers.csv'
+
+    def params(self):
+        return {'query': self.options.get('query') or QUERY}
+
+    def run(self, inbox, emit):
+        import query_ads
+        rows, seen = [], set()
+        for paper in query_ads.iter_ads(self.params()['query'], fields=['bibcode', 'identifier']):
+            if paper['arxiv_id'] is None or paper['arxiv_id'] in seen:
+                continue
+            seen.add(paper['arxiv_id'])
+            rows.append({'arxiv_id': paper['arxiv_id'], 'bibcode': paper['bibcode']})
+            emit(paper['arxiv_id'])
+        pd.DataFrame(rows, columns=['arxiv_id', 'bibcode']).to_csv(self.path(self.output), index=False)
+
+    def replay(self):
+        return pd.read_csv(self.path(self.output))['arxiv_id']
+
+
+class ArxivStage(Stage):
+    """Finds the repository urls in the papers; emits `{'arxiv_id', 'urls'}` rows of arxiv2github.csv."""
+    name = 'arxiv'
+    upstream = 'ads'
+    output = 'arxiv2github.csv'
+
+    def run(self, inbox, emit):
+        import arxiv2github
+        arxiv_ids = []
+        with Ledger(self.path('arxiv2github.jsonl')) as ledger:
+            def todo():
+                for arxiv_id in inbox:
+                    arxiv_ids.append(arxiv_id)
+                    if arxiv_id in ledger:
+                        emit(ledger[arxiv_id])
+                    else:
+                        yield arxiv_id
+
+            for arxiv_id, urls in arxiv2github.arxiv2github_many(todo(), workers=self.options.get('workers')):
+                if urls is not None:
+                    ledger.record(arxiv_id, {'arxiv_id': arxiv_id, 'urls': urls})
+                    emit(ledger[arxiv_id])
+            ledger.to_frame(arxiv_ids, columns=['arxiv_id', 'urls']).to_csv(self.path(self.output), index=False)
+
+    def replay(self):
+        return pd.read_csv(self.path(self.output)).to_dict('records')
+
+
+class UrlsStage(Stage):
+    """Cleans the urls found in the papers; emits each 'github.com/owner/repo' url once."""
+    name = 'urls'
+    upstream = 'arxiv'
+    output = 'github_urls.csv'
+
+    def run(self, inbox, emit):
+        import githubwebstats
+        seen = set()
+        for row in inbox:
+            urls = row['urls']
+            # Replayed rows hold the repr of the list, as read by `_clean_github_urls`
+            text = ' '.join(urls) if isinstance(urls, list) else urls[1:-1].replace("'", "")
+            for github_url in sorted(githubwebstats._clean_hits(text) - seen):
+                seen.add(github_url)
+                emit(github_url)
+        pd.DataFrame({'github_url': sorted(seen)}).to_csv(self.path(self.output), index=False)
+
+    def replay(self):
+        return pd.read_csv(self.path(self.output))['github_url']
+
+
+def _probe_concurrently(func, items, workers):
+    """Yields `(item, func(item))` for every item, running up to `workers` calls at once."""
+    with ThreadPoolExecutor(workers) as executor:
+        pending = {}
+        for item in items:
+            pending[executor.submit(tracing.run_in_context(func), item)] = item
+            while len(pending) >= 2 * workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+        for future in list(pending):
+            yield pending.pop(future), future.result()
+
+
+class WebStage(Stage):
+    """Checks the repositories for signs of a well-kept project (repo_opensource_metrics.csv)."""
+    name = 'web'
+    upstream = 'urls'
+    output = 'repo_opensource_metrics.csv'
+
+    def params(self):
+        return {'mode': self.options.get('web_mode') or 'probe'}
+
+    def run(self, inbox, emit):
+        import githubwebstats
+        repo_stats = githubwebstats._tree_repo_stats if self.params()['mode'] == 'tree' \
+            else githubwebstats._probe_repo_stats
+        github_urls = []
+
+        def todo():
+            for github_url in inbox:
+                github_urls.append(github_url)
+                if github_url not in ledger:
+                    yield github_url
+
+        def one(github_url):
+            with tracing.context(repo=github_url):
+                return repo_stats(github_url)
+
+        # Rows checked in another mode are not reused
+        mode = self.params()['mode']
+        suffix = '' if mode == 'probe' else '-' + mode
+        with Ledger(self.path('repo_opensource_metrics{}.jsonl'.format(suffix))) as ledger:
+            for github_url, row in _probe_concurrently(one, todo(), self.options.get('workers') or 8):
+                ledger.record(github_url, row)
+            ledger.to_frame(sorted(github_urls), columns=githubwebstats.COLUMNS).to_csv(self.path(self.output),
+                                                                                      index=False)
+
+
+class ApiStage(Stage):
+    """Retrieves the GitHub API stats of the repositories (github-api-stats.csv), recording
+    their authors in contributors.npz."""
+    name = 'api'
+    upstream = 'urls'
+    output = 'github-api-stats.csv'
+
+    def run(self, inbox, emit):
+        import contributors
+        import github_api_stats
+        stats = []
+        index_path = self.path(contributors.INDEX_FILE)
+        index = contributors.ContributorIndex.load(index_path) if os.path.exists(index_path) \
+            else contributors.ContributorIndex()
+        with Ledger(self.path('github-api-stats.jsonl')) as ledger:
+            for batch in inbox.batches(self.options.get('batch_size') or 100):
+                batch = [tuple(github_url.split('/')[1:3]) for github_url in batch]
+                # Repositories whose query failed are left out, and tried again by the next run
+                stats.extend(github_api_stats.get_repo_stats_many(batch, ledger=ledger, contributors=index))
+                index.save(index_path)
+        stats.sort(key=lambda row: (row['repository_owner'], row['repository_name']))
+        pd.DataFrame(stats).to_csv(self.path(self.output))
+
+
+class SuccessStage(Stage):
+    """Measures how much the repositories are used in the literature (repo_success_metrics.csv)."""
+    name = 'success'
+    upstream = 'urls'
+    output = 'repo_success_metrics.csv'
+
+    def run(self, inbox, emit):
+        import httpcache
+        import query_ads
+        github_urls = []
+        with Ledger(self.path('repo_success_metrics.jsonl')) as ledger:
+            for batch in inbox.batches(self.options.get('batch_size') or 100):
+                github_urls.extend(batch)
+                todo = []
+                for github_url in ledger.todo(batch):
+                    if len(github_url.split('/')[-1]) < 4 or \
+                            httpcache.head('https://{}'.format(github_url)).status_code != 200:
+                        ledger.record(github_url, None)
+                    else:
+                        todo.append(github_url)
+                for github_url, papers in query_ads.query_ads_many(todo, fields=query_ads.SUCCESS_FIELDS):
+                    ledger.record(github_url, query_ads.success_metrics(github_url, papers))
+            ledger.to_frame(sorted(github_urls), columns=query_ads.SUCCESS_COLUMNS).to_csv(self.path(self.output),
+                                                                                         index=False)
+
+
+STAGES = {stage.name: stage for stage in [AdsStage, ArxivStage, UrlsStage, WebStage, ApiStage, SuccessStage]}
+
+
+def _file_hash(path):
+    """Returns the sha256 of a file, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _load_state(workdir):
+    path = os.path.join(workdir, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_state(workdir, state):
+    path = os.path.join(workdir, STATE_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+def _fingerprint(stage, stages):
+    """Returns what a stage's output depends on: its parameters and its upstream's output."""
+    upstream = None
+    if stage.upstream is not None:
+        upstream = _file_hash(stages[stage.upstream].path(stages[stage.upstream].output))
+    return {'params': stage.params(), 'upstream': upstream}
+
+
+def up_to_date(stage, stages, state, recorded_params=False):
+    """Whether the output of `stage` was made from its current inputs.
+
+    With `recorded_params`, the parameters the stage last ran with count as
+    current, so only its upstream output and its own output are compared.
+    """
+    entry = state.get(stage.name)
+    if entry is None:
+        return False
+    fingerprint = _fingerprint(stage, stages)
+    if recorded_params:
+        fingerprint['params'] = entry['fingerprint']['params']
+    return entry['fingerprint'] == fingerprint and entry['output'] == _file_hash(stage.path(stage.output))
+
+
+def plan(selected, stages, state, force=()):
+    """Decides which stages run and which are replayed from their output.
+
+    Returns
+    -------
+    modes : dict
+        'run', 'skip' (up to date, replayed if a downstream stage runs) or
+        'replay' (not selected, but needed by a selected stage) per stage.
+    """
+    needed, modes = set(), {}
+    for name in selected:
+        while name is not None and name not in needed:
+            needed.add(name)
+            name = stages[name].upstream
+    for name, stage in stages.items():
+        if name not in needed:
+            continue
+        upstream = modes.get(stage.upstream)
+        if name not in selected:
+            modes[name] = 'replay'
+        elif name in force or upstream == 'run' or not up_to_date(stage, stages, state):
+            modes[name] = 'run'
+        else:
+            modes[name] = 'skip'
+        if modes[name] != 'run' and _file_hash(stage.path(stage.output)) is None:
+            raise FileNotFoundError('Stage {} has no output {} yet; run it first'.format(name, stage.output))
+    return modes
+
+
+def run(selected=None, workdir='.', force=(), queue_size=1000, **options):
+    """Runs the selected stages (default: all) as a streaming pipeline.
+
+    Parameters
+    ----------
+    selected : list of str
+        Names of the stages to run, see `STAGES`.
+    workdir : str
+        Directory of the output and ledger files.
+    force : list of str
+        Stages which run even if they are up to date.
+    queue_size : int
+        Maximum number of records waiting between two stages.
+    **options
+        `query`, `web_mode`, `workers` and `batch_size` settings of the stages.
+
+    Returns
+    -------
+    modes : dict
+        What was done with every stage; see `plan`.
+    """
+    stages = {name: cls(workdir, **options) for name, cls in STAGES.items()}
+    selected = list(STAGES) if selected is None else list(selected)
+    unknown = set(selected) - set(STAGES)
+    if unknown:
+        raise ValueError('Unknown stages: {}'.format(sorted(unknown)))
+    state = _load_state(workdir)
+    modes = plan(selected, stages, state, force)
+    running = [name for name, mode in modes.items() if mode == 'run']
+    inboxes = {name: Inbox(queue_size) for name in running}
+    consumers = {name: [inboxes[other] for other in running if stages[other].upstream == name] for name in modes}
+    errors = {}
+
+    def emit_to(name):
+        def emit(record):
+            for inbox in consumers[name]:
+                inbox.queue.put(record)
+        return emit
+
+    def work(name):
+        start = time.perf_counter()
+        emit = emit_to(name)
+        try:
+            with tracing.context(stage=name):
+                if modes[name] == 'run':
+                    stages[name].run(inboxes[name], emit)
+                else:
+                    for record in stages[name].replay():
+                        emit(record)
+        except BaseException as e:
+            errors[name] = e
+            # Keep draining, so that the upstream stage is not blocked on a full queue
+            if name in inboxes:
+                for _ in inboxes[name]:
+                    pass
+        finally:
+            for inbox in consumers[name]:
+                inbox.queue.put(_DONE)
+        if name not in errors and modes[name] == 'run':
+            print('{}: done in {:.1f}s'.format(name, time.perf_counter() - start), flush=True)
+
+    for name, mode in modes.items():
+        if mode != 'run':
+            print('{}: {}'.format(name, 'up to date' if mode == 'skip' else 'read from ' + stages[name].output))
+    # Skipped stages are only replayed if a downstream stage runs
+    active = [name for name, mode in modes.items() if mode == 'run' or consumers[name]]
+    threads = [threading.Thread(target=work, args=(name,), name='stage-' + name) for name in active]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    def failed(name):
+        return name in errors or (stages[name].upstream is not None and failed(stages[name].upstream))
+
+    for name in running:
+        # A stage fed by a failed stage only saw part of its input
+        if not failed(name):
+            state[name] = {'fingerprint': _fingerprint(stages[name], stages),
+                           'output': _file_hash(stages[name].path(stages[name].output))}
+    _save_state(workdir, state)
+    if errors:
+        name, error = next(iter(errors.items()))
+        raise RuntimeError('Stage {} failed'.format(name)) from error
+    return modes
+
+
+def status(workdir='.', **options):
+    """Prints whether the output of every stage is missing, stale or up to date.
+
+    Given the `query` and `web_mode` options of `run`, a stage is up to date
+    if `run` with these options would skip it; without them, the parameters
+    every stage last ran with are taken as current.
+    """
+    stages = {name: cls(workdir, **options) for name, cls in STAGES.items()}
+    recorded_params = all(value is None for value in options.values())
+    state = _load_state(workdir)
+    for name, stage in stages.items():
+        if _file_hash(stage.path(stage.output)) is None:
+            status = 'missing'
+        elif up_to_date(stage, stages, state, recorded_params):
+            status = 'up to date'
+        else:
+            status = 'stale'
+        params = state[name]['fingerprint']['params'] if name in state else {}
+        print('{:>8}  {:<28} {:<10} {}'.format(name, stage.output, status, ', '.join(
+              '{}={}'.format(key, value) for key, value in params.items())).rstrip())
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='run stages of the pipeline')
+    run_parser.add_argument('--stages', default=','.join(STAGES),
+                            help='comma separated stages to run (default: {})'.format(','.join(STAGES)))
+    run_parser.add_argument('--force', default='', help='comma separated stages to run even if up to date')
+    run_parser.add_argument('--workers', type=int, default=None, help='concurrent repositories or pdfs')
+    run_parser.add_argument('--batch-size', type=int, default=None, help='repositories per API/ADS batch')
+    run_parser.add_argument('--queue-size', type=int, default=1000)
+    run_parser.add_argument('--snapshot', action='store_true',
+                            help='store the csv files as a dated snapshot afterwards (see snapshot.py)')
+    for command in [run_parser, commands.add_parser('status', help='show which outputs are up to date')]:
+        command.add_argument('--workdir', default='.', help='directory of the csv and ledger files')
+        command.add_argument('--query', default=None, help='ADS query of the ads stage')
+        command.add_argument('--web-mode', choices=['probe', 'tree'], default=None)
+    args = parser.parse_args(args)
+    if args.command == 'status':
+        status(args.workdir, query=args.query, web_mode=args.web_mode)
+        return
+    run([name for name in args.stages.split(',') if name], workdir=args.workdir,
+        force=[name for name in args.force.split(',') if name], queue_size=args.queue_size,
+        query=args.query, web_mode=args.web_mode, workers=args.workers, batch_size=args.batch_size)
+    if args.snapshot:
+        import snapshot
+        for path in snapshot.write_all(root=os.path.join(args.workdir, snapshot.SNAPSHOT_DIR), workdir=args.workdir):
+            print(path)
+
+
+if __name__ == "__main__":
+    main()
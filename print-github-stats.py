@@ -1,8 +1,8 @@
-import pandas as pd
 import numpy as np
 
-df = pd.read_csv("github-api-stats.csv", parse_dates=True)
-df['createdAt'] = pd.to_datetime(df['createdAt'])
+import snapshot
+
+df = snapshot.read('api', columns=['repository_owner', 'repository_name', 'createdAt', 'n_prs_unique_authors'])
 df['year'] = df['createdAt'].dt.year
 df['repo'] = df['repository_owner'].str.cat(df['repository_name'], sep="/")
 df['pr_authors'] = df['n_prs_unique_authors']
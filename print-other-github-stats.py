@@ -1,15 +1,14 @@
-import pandas as pd
+import snapshot
 
-df = pd.read_csv("repo_opensource_metrics.csv")
+df = snapshot.read('opensource')
 
 non_astro_packages = [package.strip() for package in open('non-astro-packages.txt').readlines()]
-repo_name = [part[2] for part in df['github_url'].str.split('/')]
+repo_name = df['github_url'].str.split('/').str[2]
 
 ignore = ~df['exists']
-ignore |= [repo in non_astro_packages for repo in repo_name]
+ignore |= repo_name.isin(non_astro_packages)
 df = df[~ignore]
 
 for field in ['readme', 'installation', 'CI', 'docs', 'examples']:
     pct = 100 * df[field].sum() / len(df)
     print(f'Repositories with {field}: {pct:.0f}%')
-
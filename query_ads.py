@@ -1,31 +1,211 @@
-"""Find a set of arXiv identifiers given a NASA ADS literature query!"""
+"""Find a set of arXiv identifiers given a NASA ADS literature query!
+
+For this to work, you need to get an ADS developer key from
+https://ui.adsabs.harvard.edu/user/settings/token and store it in
+`~/.ads/dev_key` (or in the `ADS_DEV_KEY` environment variable).
+
+Results are paged through with ADS cursors and every page is cached on
+disk by `httpcache`, so repeating a query costs no ADS requests.
+"""
+import os
+import re
+
+import numpy as np
 import pandas as pd
 
+import httpcache
+
+ADS_URL = 'https://api.adsabs.harvard.edu/v1/search/query'
+
 # Which fields do we want from the ADS API?
 FIELDS = ['ack', 'aff', 'arxiv_class', 'author', 'bibcode', 'bibgroup', 'bibstem',
           'citation_count', 'data', 'database', 'first_author', 'grant',
           'identifier', 'keyword', 'property', 'pubdate', 'read_count',
           'title', 'vizier', 'year']
 
-def query_ads(query="full:'github.com' Kepler"):
-    """Returns a list of dictionary objects, one per paper.
+# Number of papers per page of results (the ADS maximum)
+ROWS = 2000
+
+_TAG_PATTERN = re.compile(r'<[^>]+>')
+
+# Fields needed by `success_metrics`, and the columns of repo_success_metrics.csv
+SUCCESS_FIELDS = ['ack', 'author', 'first_author', 'keyword', 'citation_count', 'identifier']
+SUCCESS_COLUMNS = ['github_url', 'repo_name', 'mentions', 'n_unq_authors', 'n_unq_first_authors',
+                   'arxiv_ids', 'citation_count', 'nasa_ack_mentions', 'unq_keywords']
+
+
+def _headers():
+    """Returns the authorization headers of the ADS API."""
+    token = os.environ.get('ADS_DEV_KEY')
+    if token is None:
+        token = open(os.path.expanduser('~/.ads/dev_key')).read().strip()
+    return {'Authorization': 'Bearer {}'.format(token)}
+
+
+def _search(params):
+    """Yields the pages of an ADS search, following the cursor until the last page."""
+    headers = _headers()
+    params = dict(params, sort='id asc', cursorMark='*')
+    while True:
+        response = httpcache.get(ADS_URL, params=params, headers=headers)
+        if response.status_code != 200:
+            raise Exception("ADS query failed with code {}: {}".format(response.status_code, params['q']))
+        page = response.json()
+        yield page
+        # A short page is the last one; otherwise ADS repeats the cursor once we are done
+        if len(page['response']['docs']) < int(params['rows']):
+            return
+        if page.get('nextCursorMark', params['cursorMark']) == params['cursorMark']:
+            return
+        params['cursorMark'] = page['nextCursorMark']
+
+
+def _paper(doc, fields):
+    """Fills in the fields missing from an ADS document and adds its `arxiv_id`."""
+    for field in fields:
+        doc.setdefault(field, None)
+    doc['arxiv_id'] = None
+    for identifier in doc.get('identifier') or []:
+        if 'arXiv:' in identifier:
+            doc['arxiv_id'] = identifier
+    return doc
+
+
+def iter_ads(query="full:'github.com' Kepler", fields=FIELDS, rows=ROWS):
+    """Yields one dictionary per paper matching an ADS query.
+
+    Parameters
+    ----------
+    query : str
+        ADS search query.
+    fields : list of str
+        Fields to retrieve; requesting fewer fields makes the query faster.
+        Missing fields are set to None.
+    rows : int
+        Number of papers per page of results.
+    """
+    fields = list(fields)
+    for page in _search({'q': query, 'fl': ','.join(fields + ['id']), 'rows': rows}):
+        for doc in page['response']['docs']:
+            yield _paper(doc, fields)
+
+
+def query_ads(query="full:'github.com' Kepler", fields=FIELDS):
+    """Returns a list of dictionary objects, one per paper."""
+    return list(iter_ads(query, fields))
+
+
+def _quote(term):
+    return '"{}"'.format(term.replace('"', ''))
+
+
+def _term_pattern(term):
+    """Returns a regex finding `term` in lowercase text, unless it continues as a longer name.
+
+    'github.com/a/b' is found in 'see github.com/a/b.' but not in
+    'github.com/a/b-c' or 'github.com/a/b.io'.
+    """
+    return re.compile(re.escape(term.lower()) + r'(?![\w-]|\.[\w-])')
+
+
+def _bisect(ids, terms):
+    """Returns the papers mentioning each of `terms`, of those in `ids`, which all mention one of them.
+
+    The terms are split in halves, and each half searched for among the
+    papers, recursively: a paper mentioning one of n terms costs about
+    2 log2(n) searches instead of n.
+    """
+    if len(terms) == 1:
+        return {terms[0]: ids}
+    found = {}
+    for group in [terms[:len(terms) // 2], terms[len(terms) // 2:]]:
+        q = 'id:({}) AND full:({})'.format(' OR '.join(ids), ' OR '.join(_quote(term) for term in group))
+        group_ids = [str(doc['id']) for doc in iter_ads(q, fields=['id'])]
+        if len(group_ids) > 0:
+            found.update(_bisect(group_ids, group))
+    return found
+
+
+def query_ads_many(terms, query=None, fields=FIELDS, batch_size=25):
+    """Finds the papers mentioning each of many terms (e.g. github urls) in their full text.
+
+    Rather than sending one search per term, `batch_size` terms are combined
+    into a single `full:("a" OR "b" ...)` search.  Every paper found is
+    attributed to the terms which appear in the highlighted snippets ADS
+    returns with it (as whole names: 'github.com/a/b' is not credited with a
+    mention of 'github.com/a/b-c').  Papers whose snippets show none of the
+    terms are attributed by bisecting the batch (see `_bisect`), restricted
+    to those papers.
+
+    Parameters
+    ----------
+    terms : list of str
+        Full text search terms, matched as phrases.
+    query : str, optional
+        Extra ADS query which all papers must also match.
+    fields : list of str
+        Fields to retrieve for every paper.
+    batch_size : int
+        Number of terms per search.
+
+    Yields
+    ------
+    term, papers : str, list of dict
+        Every term with the papers mentioning it, one batch at a time.
+    """
+    fields = list(fields)
+    terms = list(terms)
+    for start in range(0, len(terms), batch_size):
+        batch = terms[start:start + batch_size]
+        q = 'full:({})'.format(' OR '.join(_quote(term) for term in batch))
+        if query is not None:
+            q = '({}) AND {}'.format(query, q)
+        params = {'q': q, 'fl': ','.join(fields + ['id']), 'rows': ROWS,
+                  'hl': 'true', 'hl.fl': 'body,ack,abstract,title',
+                  'hl.snippets': 20, 'hl.fragsize': 100}
+        papers = {term: [] for term in batch}
+        patterns = {term: _term_pattern(term) for term in batch}
+        unattributed = {}
+        for page in _search(params):
+            highlighting = page.get('highlighting', {})
+            for doc in page['response']['docs']:
+                snippets = ' '.join(snippet for snippets in highlighting.get(str(doc['id']), {}).values()
+                                    for snippet in snippets)
+                snippets = _TAG_PATTERN.sub('', snippets).lower()
+                matched = [term for term in batch if patterns[term].search(snippets)]
+                # A term within a longer name (e.g. of 'github.com/a/b-c') is not a mention
+                if len(matched) == 0 and not any(term.lower() in snippets for term in batch):
+                    unattributed[str(doc['id'])] = doc
+                for term in matched:
+                    papers[term].append(_paper(dict(doc), fields))
+        if len(unattributed) > 0:
+            for term, ids in _bisect(list(unattributed), batch).items():
+                papers[term].extend(_paper(dict(unattributed[paper_id]), fields) for paper_id in ids)
+        for term in batch:
+            yield term, papers[term]
+
+
+def success_metrics(github_url, papers):
+    """Returns the row of repo_success_metrics.csv of a repository, given the papers mentioning it.
 
-    For this to work, you need to do two things:
-    1. `pip install ads`
-    2. Get a ADS developer key from https://ui.adsabs.harvard.edu/user/settings/token
-    and store it in `~/.ads/dev_key `.
+    `papers` must have the `SUCCESS_FIELDS`, e.g. as returned by `query_ads_many`.
     """
-    import ads
-    result = []
-    qry = ads.SearchQuery(q=query, fl=FIELDS, rows=9999999999)
-    for paper in qry:
-        mydict = paper._raw
-        mydict['arxiv_id'] = None
-        for identifier in paper.identifier:
-            if 'arXiv:' in identifier:
-                mydict['arxiv_id'] = identifier
-        result.append(mydict)
-    return result
+    row = {}
+    row['github_url'] = github_url
+    row['repo_name'] = github_url.split('/')[-1]
+    row['mentions'] = len(papers)
+    row['n_unq_authors'] = len(np.unique([author for paper in papers if paper['author'] is not None
+                                          for author in paper['author']]))
+    row['n_unq_first_authors'] = len(np.unique([paper['first_author'] for paper in papers
+                                                if paper['first_author'] is not None]))
+    row['unq_keywords'] = np.unique([keyword for paper in papers if paper['keyword'] is not None
+                                     for keyword in paper['keyword']])
+    row['citation_count'] = np.sum([paper['citation_count'] for paper in papers
+                                    if paper['citation_count'] is not None])
+    row['nasa_ack_mentions'] = np.asarray([np.any(['NASA' in paper['ack'], 'NNX' in paper['ack']])
+                                           for paper in papers if paper['ack'] is not None]).sum()
+    row['arxiv_ids'] = [paper['arxiv_id'] for paper in papers if paper['arxiv_id'] is not None]
+    return row
 
 
 if __name__ == "__main__":
@@ -0,0 +1,105 @@
+"""Incrementally refresh github-api-stats.csv and repo_opensource_metrics.csv.
+
+Most repositories have not changed since the last crawl.  A refresh first
+asks GitHub for the `pushedAt` time of every repository, which takes a few
+batched GraphQL queries, and then only re-crawls the repositories pushed to
+since the stored snapshot (or missing from it).  Their new rows replace the
+old ones in both tables, and their authors those in contributors.npz.
+
+Example use
+-----------
+$ python refresh.py
+"""
+import os
+
+import pandas as pd
+
+import contributors
+import github_api_stats
+import githubwebstats
+import httpcache
+from snapshot import repo_key
+
+
+def changed_repositories(repositories, api_stats):
+    """Returns the repositories pushed to since the `api_stats` snapshot.
+
+    Parameters
+    ----------
+    repositories : list of (str, str)
+        (owner, name) pairs.
+    api_stats : pandas.DataFrame
+        Snapshot in the format of github-api-stats.csv.
+
+    Returns
+    -------
+    changed : list of (str, str)
+        Repositories whose `pushedAt` differs from the snapshot (including
+        repositories which appeared or disappeared), or which are not in it.
+    """
+    keys = [repo_key(repo) for repo in zip(api_stats['repository_owner'], api_stats['repository_name'])]
+    stored = dict(zip(keys, api_stats['pushedAt'].astype(object).where(api_stats['pushedAt'].notna(), None)))
+    pushed_at = github_api_stats.get_pushed_at_many(repositories)
+    return [repo for repo, pushed in zip(repositories, pushed_at)
+            if repo_key(repo) not in stored or stored[repo_key(repo)] != pushed]
+
+
+def _merge(old, new, key):
+    """Replaces the rows of `old` which are in `new`, adds the others and sorts by `key`."""
+    old = old[~old[key].isin(new[key])]
+    return pd.concat([old, new], ignore_index=True).sort_values(key, kind='stable').reset_index(drop=True)
+
+
+def refresh(github_urls=None, api_filename="github-api-stats.csv",
+            web_filename="repo_opensource_metrics.csv", index_filename=contributors.INDEX_FILE):
+    """Re-crawls the changed repositories and merges them into both tables.
+
+    Parameters
+    ----------
+    github_urls : list of str, optional
+        'github.com/owner/repo' urls; by default all urls in arxiv2github.csv.
+    index_filename : str
+        `contributors.ContributorIndex` updated with the authors of the
+        changed repositories; created if it does not exist.
+
+    Returns
+    -------
+    changed : list of (str, str)
+        The repositories which were re-crawled.
+    """
+    if github_urls is None:
+        github_urls = githubwebstats._clean_github_urls()
+    repositories = [tuple(url.split("/")[1:3]) for url in github_urls]
+    api_stats = pd.read_csv(api_filename, index_col=0)
+    web_stats = pd.read_csv(web_filename)
+
+    changed = changed_repositories(repositories, api_stats)
+    print(f"{len(changed)} of {len(repositories)} repositories changed since the last crawl")
+    if len(changed) == 0:
+        return changed
+
+    index = contributors.ContributorIndex.load(index_filename) if os.path.exists(index_filename) \
+        else contributors.ContributorIndex()
+    # Cached responses of changed repositories are stale: revalidate them all
+    with httpcache.revalidate():
+        stats = github_api_stats.get_repo_stats_many(changed, incremental=True, contributors=index)
+        new_web_stats = githubwebstats.github2stats(["github.com/{}/{}".format(*repo) for repo in changed])
+
+    # Repositories whose query failed come back as empty dicts: keep their old rows
+    found = [(repo, row) for repo, row in zip(changed, stats) if github_api_stats._found(row)]
+    if len(found) < len(changed):
+        print(f"{len(changed) - len(found)} repositories could not be queried, their stats are kept")
+    new_api_stats = pd.DataFrame([row for _, row in found])
+    new_api_stats['repository_owner'] = [repo[0] for repo, _ in found]
+    new_api_stats['repository_name'] = [repo[1] for repo, _ in found]
+    for df in [api_stats, new_api_stats]:
+        df['key'] = [repo_key(repo) for repo in zip(df['repository_owner'], df['repository_name'])]
+    api_stats = _merge(api_stats, new_api_stats, 'key').drop(columns='key')
+    api_stats.to_csv(api_filename)
+    index.save(index_filename)
+    _merge(web_stats, new_web_stats, 'github_url').to_csv(web_filename, index=False)
+    return changed
+
+
+if __name__ == "__main__":
+    refresh()
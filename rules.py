@@ -0,0 +1,164 @@
+"""Declarative feature rules, compiled into single-pass matchers.
+
+A rule set maps every feature (e.g. 'examples') to the evidence which
+establishes it: repository paths, readme keywords or pages which exist.
+`Ruleset` keeps the path patterns without wildcards in a set and compiles
+the others into one regular expression, each pattern shared by the
+features which use it, and all readme keywords into another expression, so
+deciding every feature of a repository takes one scan of its listing and
+one of its readme.
+As the rules only need a listing and a readme, changed rules can be applied
+to cached crawl results without any request; see
+`githubwebstats.recompute`.
+
+Example use
+-----------
+>>> ruleset = Ruleset({'docs': {'paths': ['docs/'], 'readme': ['readthedocs']}})
+>>> ruleset.evaluate({'docs/', 'setup.py'}, readme='See the docs.')
+{'docs': True}
+"""
+import re
+
+
+def _glob_regex(pattern):
+    """Translates a path glob ('*' and '?' stop at '/') into a regular expression."""
+    return re.escape(pattern).replace(r'\*', '[^/\n]*').replace(r'\?', '[^/\n]')
+
+
+def _trie_regex(words):
+    """Returns a regular expression matching any of `words`, shaped as a trie.
+
+    A trie shares the common prefixes of the words, so the expression tries
+    each character of the text against few alternatives; where a word is a
+    prefix of another, the longer one is matched.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def regex(node):
+        alternatives = [re.escape(char) + regex(child) for char, child in sorted(node.items()) if char]
+        if not alternatives:
+            return ''
+        body = alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+        return '(?:' + body + ')?' if '' in node else body
+    return regex(trie)
+
+
+class Ruleset:
+    """Decides the features of a repository from its files, readme and pages.
+
+    Parameters
+    ----------
+    rules : dict
+        Maps every feature to its rule, a dict with any of the keys
+
+        paths : list of str
+            Glob patterns of repository paths, e.g. 'docs/' or
+            '.github/workflows/*.yml'; directories end in '/'.
+        readme : list of str
+            Keywords looked for anywhere in the readme, ignoring case.
+        pages : list of str
+            Urls of pages which must exist, with '{owner}' and '{repo}'
+            standing for the repository, e.g. 'https://{owner}.github.io/{repo}'.
+        readme_decides : bool
+            If true, a repository with a readme has the feature only if a
+            keyword is in it; its paths and pages are not considered.
+
+        A feature is found if any of its paths, keywords or pages is.
+    """
+    def __init__(self, rules):
+        self.rules = rules
+        # Patterns without wildcards are looked up in a set of paths.  One expression finds the
+        # paths matching any other pattern; at every such path, an optional lookahead per pattern
+        # captures it if it matches too, so that a path matching the patterns of several features
+        # counts for all of them
+        patterns = {}
+        for feature, rule in rules.items():
+            for pattern in rule.get('paths', []):
+                patterns.setdefault(pattern, set()).add(feature)
+        self._literal_paths = {pattern: features for pattern, features in patterns.items()
+                               if '*' not in pattern and '?' not in pattern}
+        globs = {_glob_regex(pattern): features for pattern, features in patterns.items()
+                 if pattern not in self._literal_paths}
+        self._glob_features = list(globs.values())
+        self._globs = re.compile('^(?=(?:{})$){}'.format('|'.join(globs),
+                                                         ''.join('(?:(?=({})$))?'.format(glob) for glob in globs)),
+                                 re.MULTILINE) if globs else None
+
+        keywords = {}
+        for feature, rule in rules.items():
+            for keyword in rule.get('readme', []):
+                keywords.setdefault(keyword.lower(), set()).add(feature)
+        # The longest keyword wins where several start at the same place, and implies the shorter ones
+        self._keyword_features = {keyword: set().union(*(features for other, features in keywords.items()
+                                                         if keyword.startswith(other)))
+                                  for keyword in keywords}
+        self._readme = re.compile(_trie_regex(keywords)) if keywords else None
+        self._readme_features = set().union(*keywords.values()) if keywords else set()
+
+    def pages(self, **fields):
+        """Returns the urls of all pages the rules look for, e.g. `pages(owner='a', repo='b')`."""
+        return list(dict.fromkeys(page.format(**fields) for rule in self.rules.values()
+                                  for page in rule.get('pages', [])))
+
+    def match_paths(self, paths):
+        """Returns the features with a path in `paths`, an iterable of repository paths."""
+        paths = list(paths)
+        found = set().union(*(self._literal_paths[path] for path in paths if path in self._literal_paths))
+        if self._globs is None:
+            return found
+        for match in self._globs.finditer('\n'.join(paths)):
+            for features, path in zip(self._glob_features, match.groups()):
+                if path is not None:
+                    found |= features
+        return found
+
+    def match_readme(self, readme):
+        """Returns the features with a keyword in `readme`."""
+        found = set()
+        if self._readme is None or readme is None:
+            return found
+        text = readme.lower()
+        match = self._readme.search(text)
+        while match is not None:
+            found |= self._keyword_features[match.group()]
+            if found == self._readme_features:
+                break
+            # Keywords may overlap, so look again from the next character rather than the match end
+            match = self._readme.search(text, match.start() + 1)
+        return found
+
+    def evaluate(self, paths, readme=None, pages=(), **fields):
+        """Decides every feature of a repository.
+
+        Parameters
+        ----------
+        paths : iterable of str
+            Paths in the repository, directories ending in '/'.
+        readme : str, optional
+            Readme content; None if the repository has no readme.
+        pages : iterable of str
+            Urls of the pages (among `self.pages(**fields)`) which exist.
+        **fields
+            Values of the placeholders of the page urls, e.g. owner and repo.
+
+        Returns
+        -------
+        features : dict
+            Maps every feature to True or False.
+        """
+        in_paths = self.match_paths(paths)
+        in_readme = self.match_readme(readme)
+        pages = set(pages)
+        features = {}
+        for feature, rule in self.rules.items():
+            if readme is not None and rule.get('readme_decides'):
+                features[feature] = feature in in_readme
+                continue
+            features[feature] = (feature in in_paths or feature in in_readme
+                                 or any(page.format(**fields) in pages for page in rule.get('pages', [])))
+        return features
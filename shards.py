@@ -0,0 +1,194 @@
+"""Split a crawl across machines and merge the results back together.
+
+Each machine runs the same crawl with `--shard i/N` (i = 1..N) and its own
+GitHub token; it only handles the repositories or papers whose normalized
+key falls in shard i by a stable hash, and writes its output next to the
+usual file, e.g. "github-api-stats.shard-2-of-4.csv".  Once all shards are
+done, `merge` combines them into the usual csv files, dropping duplicates
+and checking that no shard and no item is missing.
+
+Example use
+-----------
+$ python github_api_stats.py --shard 1/4          # on machine 1
+$ python githubwebstats.py --shard 1/4
+$ python arxiv2github.py --shard 1/4
+...
+$ python shards.py merge --shards 4               # once all shards are copied back
+"""
+import argparse
+import hashlib
+import os
+
+import pandas as pd
+
+# Output files which can be sharded: key column and whether the csv has an index
+OUTPUTS = {'arxiv2github.csv': ('arxiv_id', False),
+           'repo_opensource_metrics.csv': ('github_url', False),
+           'github-api-stats.csv': ('github_url', True)}
+
+
+def parse_shard(shard):
+    """Parses "i/N" into `(i, N)`, with 1 <= i <= N; None stays None."""
+    if shard is None:
+        return None
+    try:
+        index, count = (int(part) for part in shard.split('/'))
+    except ValueError:
+        raise ValueError('A shard is written i/N, e.g. 1/4, not {!r}'.format(shard))
+    if not 1 <= index <= count:
+        raise ValueError('Shard {} does not exist: i must be between 1 and N'.format(shard))
+    return index, count
+
+
+def normalize(key):
+    """Normalizes a repository or paper key, so that all spellings of it land in the same shard.
+
+    'https://GitHub.com/Owner/Repo', ('Owner', 'Repo') and 'github.com/owner/repo'
+    are the same repository; 'arXiv:1901.00001' and '1901.00001' the same paper.
+    """
+    if isinstance(key, tuple):
+        key = 'github.com/' + '/'.join(key)
+    key = key.strip().lower()
+    for prefix in ['https://', 'http://', 'www.', 'arxiv:']:
+        if key.startswith(prefix):
+            key = key[len(prefix):]
+    return key
+
+
+def shard_of(key, count):
+    """Returns the shard (1..count) of a key; stable across machines and Python versions."""
+    digest = hashlib.sha1(normalize(key).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count + 1
+
+
+def select(items, shard, key=None):
+    """Returns the items in `shard` ("i/N" or `(i, N)`); all items if `shard` is None."""
+    if isinstance(shard, str):
+        shard = parse_shard(shard)
+    if shard is None:
+        return list(items)
+    index, count = shard
+    return [item for item in items if shard_of(item if key is None else key(item), count) == index]
+
+
+def shard_path(path, shard):
+    """Returns the file a shard writes instead of `path`, e.g. "x.shard-1-of-4.csv"."""
+    if isinstance(shard, str):
+        shard = parse_shard(shard)
+    if shard is None:
+        return path
+    root, extension = os.path.splitext(path)
+    return '{}.shard-{}-of-{}{}'.format(root, shard[0], shard[1], extension)
+
+
+def _keys(df, filename):
+    column, _ = OUTPUTS[os.path.basename(filename)]
+    if column == 'github_url' and column not in df:
+        return ['github.com/{}/{}'.format(*repo) for repo in zip(df['repository_owner'], df['repository_name'])]
+    return list(df[column])
+
+
+def merge(filename, count, expected=None):
+    """Merges the `count` shards of an output file into `filename`.
+
+    Parameters
+    ----------
+    filename : str
+        One of `OUTPUTS`, possibly in another directory.
+    count : int
+        Number of shards.
+    expected : list, optional
+        Keys which must all be in the merged file.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        The merged table, also written to `filename`.
+
+    Raises
+    ------
+    ValueError
+        If a shard file is missing, holds keys of another shard (i.e. was
+        made with another N), or if expected keys are missing.
+    """
+    _, index = OUTPUTS[os.path.basename(filename)]
+    frames = []
+    for shard in range(1, count + 1):
+        path = shard_path(filename, (shard, count))
+        if not os.path.exists(path):
+            raise ValueError('Shard {}/{} is missing: {} not found'.format(shard, count, path))
+        df = pd.read_csv(path, index_col=0 if index else None)
+        misplaced = [key for key in _keys(df, filename) if shard_of(key, count) != shard]
+        if misplaced:
+            raise ValueError('{} holds {} keys of other shards, e.g. {!r}; was it made with --shard i/{}?'.format(
+                             path, len(misplaced), misplaced[0], count))
+        frames.append(df)
+    df = pd.concat(frames, ignore_index=True)
+    df['_key'] = [normalize(key) for key in _keys(df, filename)]
+    df = df.drop_duplicates('_key', keep='last').sort_values('_key', kind='stable')
+    if expected is not None:
+        missing = sorted(set(normalize(key) for key in expected) - set(df['_key']))
+        if missing:
+            raise ValueError('{} of {} expected keys are missing from the shards of {}, e.g. {!r}'.format(
+                             len(missing), len(expected), filename, missing[0]))
+    df = df.drop(columns='_key').reset_index(drop=True)
+    df.to_csv(filename, index=index)
+    return df
+
+
+def merge_contributors(filename, count):
+    """Merges the `count` shards of a contributor index (see `contributors.py`) into `filename`.
+
+    Raises
+    ------
+    ValueError
+        If a shard file is missing.
+    """
+    from contributors import ContributorIndex
+    index = ContributorIndex()
+    for shard in range(1, count + 1):
+        path = shard_path(filename, (shard, count))
+        if not os.path.exists(path):
+            raise ValueError('Shard {}/{} is missing: {} not found'.format(shard, count, path))
+        index.update(ContributorIndex.load(path))
+    index.save(filename)
+    return index
+
+
+def _expected(filename, workdir):
+    """Returns the keys which should be in an output file, from the file it is made from."""
+    if os.path.basename(filename) == 'arxiv2github.csv':
+        ids = os.path.join(workdir, 'ads_papers.csv')
+        return list(pd.read_csv(ids)['arxiv_id']) if os.path.exists(ids) else None
+    import githubwebstats
+    papers = os.path.join(workdir, 'arxiv2github.csv')
+    return list(githubwebstats._clean_github_urls(papers)) if os.path.exists(papers) else None
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    merge_parser = commands.add_parser('merge', help='merge shard outputs into the usual csv files')
+    merge_parser.add_argument('files', nargs='*', default=list(OUTPUTS) + ['contributors.npz'],
+                              help='outputs to merge (default: {}, contributors.npz)'.format(', '.join(OUTPUTS)))
+    merge_parser.add_argument('--shards', type=int, required=True, help='number of shards N')
+    merge_parser.add_argument('--workdir', default='.')
+    merge_parser.add_argument('--no-check', action='store_true',
+                              help='do not check that every expected paper or repository is present')
+    args = parser.parse_args(args)
+    for filename in args.files:
+        path = os.path.join(args.workdir, filename)
+        if not any(os.path.exists(shard_path(path, (shard, args.shards))) for shard in range(1, args.shards + 1)):
+            print('{}: no shards, skipped'.format(filename))
+            continue
+        if filename == 'contributors.npz':
+            index = merge_contributors(path, args.shards)
+            print('{}: merged {} shards, {} repositories'.format(filename, args.shards, len(index.repos)))
+            continue
+        expected = None if args.no_check else _expected(filename, args.workdir)
+        df = merge(path, args.shards, expected=expected)
+        print('{}: merged {} shards, {} rows'.format(filename, args.shards, len(df)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""Typed, dated snapshots of the crawl results in Parquet.
+
+The crawlers write csv files whose columns mix types (`readme_length` is an
+int or False) or hold Python and NumPy reprs of lists (`arxiv_ids`, `urls`,
+`unq_keywords`), which every analysis had to parse again.  This module keeps
+them as Parquet files with an explicit schema per table instead:
+
+    snapshots/<table>/date=YYYY-MM-DD/<table>.parquet
+
+* Every column has one type; lists are list<string> columns and missing
+  values are nulls, read back as pandas nullable dtypes.
+* Tables about repositories carry a `repo` key, the lowercased
+  "owner/repo", on which `join` merges them.
+* The contributor index of `contributors.py` is kept as two tables:
+  `contributors`, the author ids of every repository, and `logins`, whose
+  row number is the id.
+* `read` loads only the columns asked for, from a memory-mapped file.
+  If there is no snapshot of a table yet it converts the csv file instead,
+  so analyses work on a fresh checkout (and without pyarrow).
+
+Snapshots are taken from the csv files with `write` or
+`$ python snapshot.py write`, or with `$ python pipeline.py run --snapshot`.
+
+Example use
+-----------
+>>> import snapshot
+>>> snapshot.write_all()
+>>> df = snapshot.read('api', columns=['repo', 'n_stars', 'createdAt'])
+>>> df = snapshot.join(['opensource', 'success'])
+"""
+import argparse
+import ast
+import datetime
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+SNAPSHOT_DIR = 'snapshots'
+SCHEMA_VERSION = 1
+
+# Column types of each table, in the column order of the snapshot
+SCHEMAS = {
+    'opensource': {'repo': 'string', 'github_url': 'string', 'exists': 'bool', 'readme': 'bool',
+                   'readme_length': 'int64', 'installation': 'bool', 'CI': 'bool', 'docs': 'bool',
+                   'fancy_docs': 'bool', 'examples': 'bool', 'requirements': 'bool', 'setup': 'bool'},
+    'success': {'repo': 'string', 'github_url': 'string', 'repo_name': 'string', 'mentions': 'int64',
+                'n_unq_authors': 'int64', 'n_unq_first_authors': 'int64', 'arxiv_ids': 'list<string>',
+                'citation_count': 'int64', 'nasa_ack_mentions': 'int64', 'unq_keywords': 'list<string>'},
+    'api': {'repo': 'string', 'repository_owner': 'string', 'repository_name': 'string',
+            'createdAt': 'timestamp', 'pushedAt': 'timestamp', 'language': 'string', 'license': 'string',
+            'pseudoLicense': 'bool', 'n_forks': 'int64', 'n_stars': 'int64', 'n_issues': 'int64',
+            'n_pullRequests': 'int64', 'n_issues_unique_authors': 'int64', 'n_prs_unique_authors': 'int64',
+            'n_unique_authors': 'int64'},
+    'arxiv': {'arxiv_id': 'string', 'urls': 'list<string>'},
+    'contributors': {'repo': 'string', 'issues': 'list<int32>', 'pullRequests': 'list<int32>'},
+    'logins': {'login': 'string'},
+}
+
+# csv file each table is made from, and whether its first column is an index
+SOURCES = {'opensource': ('repo_opensource_metrics.csv', False),
+           'success': ('repo_success_metrics.csv', False),
+           'api': ('github-api-stats.csv', True),
+           'arxiv': ('arxiv2github.csv', False)}
+
+_PARTITION = re.compile(r'date=(\d{4}-\d{2}-\d{2})$')
+# A Python string literal, as found in the repr of a list or NumPy array
+_LITERAL = re.compile(r"""'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*\"""")
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('Snapshots are stored with pyarrow; install it with `pip install pyarrow`')
+    return pyarrow
+
+
+def repo_key(github_url):
+    """Returns the join key of a repository: "owner/repo" in lower case.
+
+    `github_url` is a 'github.com/owner/repo' url or an (owner, repo) pair;
+    None if it is missing (e.g. a NaN read from a csv file).
+    """
+    if isinstance(github_url, str):
+        github_url = github_url.split('/')[1:3]
+    if not all(isinstance(part, str) for part in github_url):
+        return None
+    return '/'.join(github_url).lower()
+
+
+def schema(table):
+    """Returns the `pyarrow.Schema` of a table."""
+    pa = _pyarrow()
+    types = {'string': pa.string(), 'bool': pa.bool_(), 'int64': pa.int64(),
+             'timestamp': pa.timestamp('us', tz='UTC'), 'list<string>': pa.list_(pa.string()),
+             'list<int32>': pa.list_(pa.int32())}
+    return pa.schema([(column, types[kind]) for column, kind in SCHEMAS[table].items()],
+                     metadata={'schema_version': str(SCHEMA_VERSION), 'table': table})
+
+
+def _parse_list(value):
+    """Turns the repr of a list or NumPy array of strings back into a list."""
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [str(item) for item in value]
+    if not isinstance(value, str):
+        return None
+    return [ast.literal_eval(literal) for literal in _LITERAL.findall(value)]
+
+
+def _to_int(series):
+    # readme_length is False when there is no readme
+    series = series.replace({False: 0, 'False': 0, True: 1, 'True': 1})
+    return pd.to_numeric(series).round().astype('Int64')
+
+
+def coerce(table, df):
+    """Converts a table as written by the crawlers (or read from their csv file) to its schema."""
+    df = df.reset_index(drop=True)
+    columns = {}
+    for column, kind in SCHEMAS[table].items():
+        if column == 'repo' and column not in df:
+            if 'github_url' in df:
+                keys = [repo_key(url) for url in df['github_url']]
+            else:
+                keys = [repo_key(repo) for repo in zip(df['repository_owner'], df['repository_name'])]
+            columns[column] = pd.Series(keys, dtype=object)
+            continue
+        values = df[column] if column in df else pd.Series([None] * len(df), dtype=object)
+        if kind == 'string':
+            columns[column] = values.astype(object).where(values.notna(), None)
+        elif kind == 'bool':
+            columns[column] = values.map({True: True, 'True': True, False: False, 'False': False}).astype('boolean')
+        elif kind == 'int64':
+            columns[column] = _to_int(values)
+        elif kind == 'timestamp':
+            columns[column] = pd.to_datetime(values, utc=True)
+        elif kind == 'list<int32>':
+            columns[column] = pd.Series([None if value is None else np.asarray(value, dtype=np.int32)
+                                         for value in values], dtype=object)
+        else:
+            columns[column] = pd.Series([_parse_list(value) for value in values], dtype=object)
+    return pd.DataFrame(columns)
+
+
+def from_csv(table, workdir='.'):
+    """Reads the csv file of a table and converts it to the table's schema."""
+    filename, index = SOURCES[table]
+    return coerce(table, pd.read_csv(os.path.join(workdir, filename), index_col=0 if index else None))
+
+
+def dates(table, root=SNAPSHOT_DIR):
+    """Returns the dates of the snapshots of a table, oldest first."""
+    path = os.path.join(root, table)
+    if not os.path.isdir(path):
+        return []
+    return sorted(match.group(1) for match in map(_PARTITION.match, os.listdir(path)) if match)
+
+
+def _path(table, date, root):
+    return os.path.join(root, table, 'date={}'.format(date), table + '.parquet')
+
+
+def write(table, df, date=None, root=SNAPSHOT_DIR):
+    """Stores a table as the snapshot of `date` (default today), replacing any snapshot of that date.
+
+    Parameters
+    ----------
+    table : str
+        One of `SCHEMAS`.
+    df : pandas.DataFrame
+        The table in the format of its csv file, or already coerced.
+    date : str or datetime.date, optional
+
+    Returns
+    -------
+    path : str
+        The Parquet file written.
+    """
+    pa = _pyarrow()
+    date = str(date or datetime.date.today())
+    path = _path(table, date, root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    arrow_table = pa.Table.from_pandas(coerce(table, df), schema=schema(table), preserve_index=False)
+    # Written aside and renamed, so that a reader never sees half a file
+    pa.parquet.write_table(arrow_table, path + '.tmp')
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def write_contributors(index, date=None, root=SNAPSHOT_DIR):
+    """Stores a `contributors.ContributorIndex`; returns the files written."""
+    return [write('contributors', index.to_frame(), date=date, root=root),
+            write('logins', pd.DataFrame({'login': index.logins}), date=date, root=root)]
+
+
+def write_all(date=None, root=SNAPSHOT_DIR, workdir='.'):
+    """Snapshots every table whose csv file (or contributor index) exists in `workdir`;
+    returns the files written."""
+    import contributors
+    paths = [write(table, from_csv(table, workdir), date=date, root=root)
+             for table, (filename, _) in SOURCES.items() if os.path.exists(os.path.join(workdir, filename))]
+    if os.path.exists(os.path.join(workdir, contributors.INDEX_FILE)):
+        index = contributors.ContributorIndex.load(os.path.join(workdir, contributors.INDEX_FILE))
+        paths.extend(write_contributors(index, date=date, root=root))
+    return paths
+
+
+def read_arrow(table, columns=None, date=None, root=SNAPSHOT_DIR):
+    """Returns a snapshot (by default the latest) as a `pyarrow.Table`, memory-mapped.
+
+    Raises
+    ------
+    FileNotFoundError
+        If there is no snapshot of the table (of that date).
+    ValueError
+        If the snapshot was written with another schema version.
+    """
+    pa = _pyarrow()
+    if date is None:
+        if not dates(table, root):
+            raise FileNotFoundError('No snapshot of {} in {}'.format(table, root))
+        date = dates(table, root)[-1]
+    arrow_table = pa.parquet.read_table(_path(table, date, root), columns=columns, memory_map=True)
+    version = (arrow_table.schema.metadata or {}).get(b'schema_version', b'').decode()
+    if version != str(SCHEMA_VERSION):
+        raise ValueError('The {} snapshot of {} has schema version {!r}, not {}; write it again'.format(
+                         table, date, version, SCHEMA_VERSION))
+    return arrow_table
+
+
+def _to_pandas(arrow_table):
+    pa = _pyarrow()
+    types = {pa.int64(): pd.Int64Dtype(), pa.bool_(): pd.BooleanDtype()}
+    return arrow_table.to_pandas(types_mapper=types.get)
+
+
+def read(table, columns=None, date=None, root=SNAPSHOT_DIR, workdir='.'):
+    """Returns a snapshot (by default the latest) as a DataFrame with nullable dtypes.
+
+    Only `columns` are read, if given.  Without any snapshot of the table,
+    and without a `date`, the csv file in `workdir` is converted instead.
+    """
+    if date is None and table in SOURCES and not dates(table, root):
+        df = from_csv(table, workdir)
+        return df if columns is None else df[columns]
+    return _to_pandas(read_arrow(table, columns=columns, date=date, root=root))
+
+
+def read_contributors(date=None, root=SNAPSHOT_DIR):
+    """Returns the contributor index of a snapshot (by default the latest)."""
+    import contributors
+    if date is None:
+        date = (dates('contributors', root) or [None])[-1]
+    logins = read_arrow('logins', date=date, root=root).column('login').to_pylist()
+    return contributors.ContributorIndex.from_frame(read('contributors', date=date, root=root), logins)
+
+
+def history(table, columns=None, root=SNAPSHOT_DIR):
+    """Returns all snapshots of a table stacked, with a `date` column."""
+    frames = []
+    for date in dates(table, root):
+        df = _to_pandas(read_arrow(table, columns=columns, date=date, root=root))
+        df.insert(0, 'date', pd.Timestamp(date))
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['date'] + (columns or []))
+
+
+def join(tables, columns=None, how='inner', date=None, root=SNAPSHOT_DIR, workdir='.'):
+    """Merges repository tables on their `repo` key.
+
+    Parameters
+    ----------
+    tables : list of str
+        Tables of `SCHEMAS` with a `repo` key.
+    columns : dict, optional
+        Columns to read of each table, e.g. {'api': ['n_stars']}; by default all.
+    how : str
+        Type of merge, as in `pandas.DataFrame.merge`.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        One row per repository; a column found in several tables is taken
+        from the first of them.
+    """
+    result = None
+    for table in tables:
+        if 'repo' not in SCHEMAS[table]:
+            raise ValueError('{} has no repo key to join on'.format(table))
+        wanted = None if columns is None or table not in columns else ['repo'] + list(columns[table])
+        df = read(table, columns=wanted, date=date, root=root, workdir=workdir)
+        if result is None:
+            result = df
+            continue
+        df = df[['repo'] + [column for column in df.columns if column not in result.columns]]
+        result = result.merge(df, on='repo', how=how)
+    return result
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    write_parser = commands.add_parser('write', help='snapshot the csv files')
+    write_parser.add_argument('tables', nargs='*', choices=list(SOURCES) + ['contributors'],
+                              help='tables to snapshot (default: all whose file exists)')
+    write_parser.add_argument('--date', default=None, help='date of the snapshot (default: today)')
+    write_parser.add_argument('--workdir', default='.', help='directory of the csv files')
+    list_parser = commands.add_parser('list', help='list the snapshots')
+    for command in [write_parser, list_parser]:
+        command.add_argument('--root', default=SNAPSHOT_DIR)
+    args = parser.parse_args(args)
+    if args.command == 'list':
+        for table in SCHEMAS:
+            print('{:>10}  {}'.format(table, ' '.join(dates(table, args.root)) or '-'))
+        return
+    if not args.tables:
+        paths = write_all(date=args.date, root=args.root, workdir=args.workdir)
+    else:
+        import contributors
+        paths = []
+        for table in args.tables:
+            if table == 'contributors':
+                index = contributors.ContributorIndex.load(os.path.join(args.workdir, contributors.INDEX_FILE))
+                paths.extend(write_contributors(index, date=args.date, root=args.root))
+            else:
+                paths.append(write(table, from_csv(table, args.workdir), date=args.date, root=args.root))
+    for path in paths:
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
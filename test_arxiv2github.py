@@ -0,0 +1,62 @@
+import os
+import threading
+
+import arxiv2github
+import fixture_server
+import githubwebstats
+from arxiv2github import extract_repositories, repositories_in_pages
+
+
+def test_extract_repositories():
+    text = ('Code at https://GitHub.com/Astropy/astropy.git, see also github.com/a/b-c. and '
+            'www.gitlab.com/x/y (bitbucket.org/p/q) doi:10.5281/zenodo.123 zenodo.org/records/45.')
+    assert extract_repositories(text) == [('bitbucket.org', 'p', 'q'), ('github.com', 'a', 'b-c'),
+                                          ('github.com', 'astropy', 'astropy'), ('gitlab.com', 'x', 'y'),
+                                          ('zenodo.org', 'record', '123'), ('zenodo.org', 'record', '45')]
+    assert extract_repositories(text, hosts=['github.com']) == [
+        ('github.com', 'a', 'b-c'), ('github.com', 'astropy', 'astropy'),
+        ('zenodo.org', 'record', '123'), ('zenodo.org', 'record', '45')]
+
+
+def test_hosts_do_not_continue_longer_names():
+    text = 'notgithub.com/x/y my-gitlab.com/x/y a.bitbucket.org/x/y mywww.github.com/x/y 910.5281/zenodo.1'
+    assert extract_repositories(text) == []
+    assert extract_repositories('(github.com/x/y) "www.github.com/z/w"') == [('github.com', 'x', 'y'),
+                                                                            ('github.com', 'z', 'w')]
+
+
+def test_repositories_in_pages():
+    pages = ['see github.com/a/b', 'and gitlab.com/c/d and github.com/a/b.']
+    assert repositories_in_pages(pages) == ['github.com/a/b', 'gitlab.com/c/d']
+    assert repositories_in_pages([]) == []
+
+
+def test_clean_hits_keeps_github_only():
+    # Old rows hold raw 'github.com/...' hits, new ones the urls of `repositories_in_pages`
+    text = "github.com/A/b/tree/master github.com/c/d), gitlab.com/e/f zenodo.org/record/1"
+    assert githubwebstats._clean_hits(text) == {'github.com/a/b', 'github.com/c/d'}
+
+
+class _Crash:
+    """Kills the worker process which unpickles it, as a crash in pdfminer would."""
+    def __reduce__(self):
+        return os._exit, (1,)
+
+
+def test_a_crashed_worker_is_replaced(tmp_path, monkeypatch):
+    crashed = threading.Event()
+
+    def fetch_pdf(arxiv_id):
+        if arxiv_id == 'crash':
+            return _Crash()
+        # Parsed by a new pool, once the crash has broken the first one
+        assert crashed.wait(60)
+        path = tmp_path / '{}.pdf'.format(arxiv_id)
+        path.write_bytes(fixture_server._make_pdf(['see github.com/a/{}'.format(arxiv_id)]))
+        return str(path)
+    monkeypatch.setattr(arxiv2github, '_fetch_pdf', fetch_pdf)
+    found = {}
+    for arxiv_id, urls in arxiv2github.arxiv2github_many(['crash', 'b', 'c'], workers=1, download_workers=2):
+        found[arxiv_id] = urls
+        crashed.set()
+    assert found == {'crash': None, 'b': ['github.com/a/b'], 'c': ['github.com/a/c']}
@@ -0,0 +1,34 @@
+import numpy as np
+
+from contributors import ContributorIndex
+
+
+def test_add_interns_logins_once():
+    index = ContributorIndex()
+    assert index.add('Astropy/astropy', 'issues', ['b', 'a', 'b']).tolist() == [0, 1]
+    assert index.add(('sunpy', 'SunPy'), 'issues', ['c', 'a']).tolist() == [1, 2]
+    index.add('astropy/Astropy', 'pullRequests', ['c'])
+    assert (len(index), index.logins) == (3, ['b', 'a', 'c'])
+    assert index.repos == ['astropy/astropy', 'sunpy/sunpy'] and ('ASTROPY', 'astropy') in index
+    assert index.count('astropy/astropy') == 3 and index.count('astropy/astropy', 'pullRequests') == 1
+    assert index.logins_of(index.overlap(['astropy/astropy', 'sunpy/sunpy'])) == ['a', 'c']
+    assert index.union().tolist() == [0, 1, 2]
+    ids, n_repos = index.shared(min_repos=2)
+    assert (index.logins_of(ids), n_repos.tolist()) == (['a', 'c'], [2, 2])
+    assert index.repos_of('c') == ['astropy/astropy', 'sunpy/sunpy'] and index.repos_of('z') == []
+
+
+def test_update_merges_shards_without_duplicates(tmp_path):
+    first, second = ContributorIndex(), ContributorIndex()
+    first.add('a/b', 'issues', ['x', 'y'])
+    second.add('c/d', 'issues', ['y', 'z'])
+    # The same repository in both shards keeps the authors of the last one
+    second.add('A/B', 'issues', ['z'])
+    first.update(second)
+    assert first.logins == ['x', 'y', 'z']
+    assert first.logins_of(first.ids('a/b')) == ['z'] and first.logins_of(first.ids('c/d')) == ['y', 'z']
+    first.save(str(tmp_path / 'contributors.npz'))
+    loaded = ContributorIndex.load(str(tmp_path / 'contributors.npz'))
+    assert loaded.logins == first.logins and loaded.repos == first.repos
+    assert all(np.array_equal(loaded.ids(repo), first.ids(repo)) for repo in first.repos)
+    assert loaded.ids('c/d', 'pullRequests').tolist() == []
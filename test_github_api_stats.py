@@ -0,0 +1,106 @@
+import json
+import time
+
+import pytest
+
+import github_api_stats
+import httpcache
+
+
+def _response(status, body, headers=None, from_cache=False):
+    response = httpcache._build_response(github_api_stats.RateLimitScheduler.url, status, headers or {},
+                                         json.dumps(body).encode())
+    response.from_cache = from_cache
+    return response
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """Replaces `httpcache.post` by a queue of responses; returns the queue and the sleeps."""
+    responses, sleeps = [], []
+
+    def post(url, cached_only=False, **kwargs):
+        if cached_only:
+            return responses.pop(0) if responses and responses[0].from_cache else None
+        return responses.pop(0)
+    monkeypatch.setattr(httpcache, 'post', post)
+    monkeypatch.setattr(github_api_stats.time, 'sleep', sleeps.append)
+    return responses, sleeps
+
+
+def test_cache_hits_are_not_paced(sent, monkeypatch):
+    responses, sleeps = sent
+    client = github_api_stats.GitHubClient(['fake'], burst=1)
+    monkeypatch.setattr(client.scheduler, '_reserve', None)
+    responses.extend(_response(200, {'data': {}}, from_cache=True) for _ in range(3))
+    assert all(client.query('{}').from_cache for _ in range(3))
+    assert sleeps == []
+
+
+def test_read_tokens(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    monkeypatch.setenv('GITHUB_TOKEN', 'env')
+    (tmp_path / '.github').mkdir()
+    for name in ['token', 'token2', 'token.bak', 'token2~', 'tokens.txt']:
+        (tmp_path / '.github' / name).write_text(name + '\n')
+    assert github_api_stats._read_tokens() == ['env', 'token', 'token2']
+
+
+def test_rate_limited_is_retried_after_the_reset(sent):
+    responses, sleeps = sent
+    reset = int(time.time()) + 60
+    headers = {'X-RateLimit-Remaining': '100', 'X-RateLimit-Reset': str(reset)}
+    responses.append(_response(200, {'errors': [{'type': 'RATE_LIMITED', 'message': 'slow down'}]}, headers))
+    responses.append(_response(200, {'data': {'rateLimit': {'cost': 1}}}, headers))
+    scheduler = github_api_stats.RateLimitScheduler(['fake'])
+    assert scheduler.query('{}').json()['data'] == {'rateLimit': {'cost': 1}}
+    assert 55 < sleeps[0] <= 61
+    assert responses == []
+
+
+def test_other_errors_are_returned(sent):
+    responses, sleeps = sent
+    responses.append(_response(200, {'data': {'repository': None}, 'errors': [{'type': 'NOT_FOUND'}]}))
+    scheduler = github_api_stats.RateLimitScheduler(['fake'])
+    assert scheduler.query('{}').json()['errors'][0]['type'] == 'NOT_FOUND'
+    assert sleeps == []
+
+
+def test_failed_repositories_are_tried_again(tmp_path, monkeypatch):
+    from ledger import Ledger
+    failing = {('a', 'broken')}
+    queried = []
+
+    def get_easy_stats_many(repositories, batch_size=None):
+        queried.extend(repositories)
+        return [{} if repo in failing else {'repository_owner': repo[0], 'repository_name': repo[1]}
+                for repo in repositories]
+    monkeypatch.setattr(github_api_stats, 'get_easy_stats_many', get_easy_stats_many)
+    monkeypatch.setattr(github_api_stats, 'get_author_stats', lambda *repo, **kwargs: {'n_authors': 1})
+    repositories = [('a', 'broken'), ('a', 'b'), ('c', 'd')]
+    with Ledger(str(tmp_path / 'stats.jsonl')) as ledger:
+        stats = github_api_stats.get_repo_stats_many(repositories, ledger=ledger)
+        assert [row['repository_name'] for row in stats] == ['b', 'd']
+        assert ('a/broken' in ledger, len(ledger)) == (False, 2)
+    failing.clear()
+    queried.clear()
+    with Ledger(str(tmp_path / 'stats.jsonl')) as ledger:
+        stats = github_api_stats.get_repo_stats_many(repositories, ledger=ledger)
+    assert queried == [('a', 'broken')]
+    assert [row['repository_name'] for row in stats] == ['broken', 'b', 'd']
+
+
+def test_incremental_authors_are_saved_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(github_api_stats, 'AUTHORS_STATE_DIR', str(tmp_path))
+    pages = [(['b', 'a', 'b'], 'c1', True), (['a', None], 'c2', False), (['c', 'b'], 'c3', False)]
+
+    def query_github(query, cache=None):
+        logins, cursor, more = pages.pop(0)
+        edges = [{'node': {'author': None if login is None else {'login': login}}} for login in logins]
+        return {'data': {'repository': {'issues': {'edges': edges,
+                                                   'pageInfo': {'endCursor': cursor, 'hasNextPage': more}}}}}
+    monkeypatch.setattr(github_api_stats, 'query_github', query_github)
+    assert sorted(github_api_stats.get_authors('o', 'r', 'issues', incremental=True)) == ['a', 'a', 'b', 'b']
+    assert github_api_stats._load_authors_state('o', 'r', 'issues') == ('c2', ['a', 'b'])
+    assert set(github_api_stats.get_authors('o', 'r', 'issues', incremental=True)) == {'a', 'b', 'c'}
+    assert github_api_stats._load_authors_state('o', 'r', 'issues') == ('c3', ['a', 'b', 'c'])
@@ -0,0 +1,60 @@
+import pytest
+
+import fixture_server
+import github_api_stats
+import githubwebstats
+import httpcache
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """A fixture server with its own response cache and a fake token."""
+    monkeypatch.setattr(httpcache, '_default_cache', httpcache.ResponseCache(str(tmp_path / 'http.sqlite')))
+    monkeypatch.setattr(github_api_stats, '_default_client', github_api_stats.GitHubClient(['fake']))
+    with fixture_server.FixtureServer(fixture_server.make_world(n_repos=10), rate_limit=10**9) as server:
+        httpcache.set_base_url(server.url)
+        try:
+            yield server
+        finally:
+            httpcache.set_base_url(None)
+
+
+def test_recompute_needs_no_credentials(server, tmp_path, monkeypatch):
+    github_urls = server.github_urls()
+    crawled = githubwebstats.github2stats(github_urls, mode='tree')
+    # Without any token, as on a machine which only has the cache
+    monkeypatch.delenv('GITHUB_TOKEN', raising=False)
+    monkeypatch.setenv('HOME', str(tmp_path))
+    monkeypatch.setattr(github_api_stats, '_default_client', github_api_stats.GitHubClient())
+    recomputed = githubwebstats.recompute(github_urls, mode='tree')
+    assert recomputed.equals(crawled)
+    with pytest.raises(FileNotFoundError):
+        github_api_stats.default_client().tokens
+
+
+def test_recompute_with_other_rules(server):
+    github_urls = server.github_urls()
+    crawled = githubwebstats.github2stats(github_urls, mode='tree')
+    rules = dict(githubwebstats.RULES, CI={'paths': ['README.md']})
+    recomputed = githubwebstats.recompute(github_urls, mode='tree', rules=rules)
+    assert recomputed['CI'].tolist() == [url in crawled['github_url'][crawled['readme']].tolist()
+                                         for url in recomputed['github_url']]
+    assert recomputed.drop(columns='CI').equals(crawled.drop(columns='CI'))
+    # The rules of other calls are not affected
+    assert githubwebstats.recompute(github_urls, mode='tree').equals(crawled)
+
+
+@pytest.mark.parametrize('answers, listed', [
+    ([{'data': {'repository': None}, 'errors': [{'type': 'NOT_FOUND'}]}], None),
+    ([{'data': None, 'errors': [{'message': 'timeout'}]}, {'data': {'repository': {'object': None}}}], set()),
+    ([{'errors': [{'message': 'timeout'}]}] * githubwebstats.TREE_ATTEMPTS, Exception),
+])
+def test_list_tree_errors(monkeypatch, answers, listed):
+    answers = list(answers)
+    monkeypatch.setattr(github_api_stats, 'query_github', lambda query: answers.pop(0))
+    if listed is Exception:
+        with pytest.raises(Exception, match='timeout'):
+            githubwebstats._list_tree('github.com/a/b')
+    else:
+        assert githubwebstats._list_tree('github.com/a/b') == listed
+    assert answers == []
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+import httpcache
+
+
+def _response(status, content=b'', headers=None):
+    return httpcache._build_response('https://api.github.com/graphql', status, headers or {}, content)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return httpcache.ResponseCache(str(tmp_path / 'http.sqlite'))
+
+
+@pytest.mark.parametrize('status, body, stored', [
+    (200, {'data': {'repository': None}}, True),
+    (200, {'data': {'repository': None}, 'errors': [{'type': 'NOT_FOUND'}]}, True),
+    (200, {'errors': [{'type': 'RATE_LIMITED'}]}, False),
+    (200, {'data': None, 'errors': [{'message': 'timeout'}]}, False),
+    (404, {'message': 'Not Found'}, True),
+    (403, {'message': 'rate limit'}, False),
+    (502, {}, False),
+])
+def test_store_skips_errors(cache, status, body, stored):
+    cache.store('key', _response(status, json.dumps(body).encode()))
+    response, fresh = cache.lookup('key')
+    assert (response is not None) == stored
+    if stored:
+        assert response.status_code == status and response.json() == body and fresh
+
+
+def test_store_keeps_other_content(cache):
+    for content in [b'', b'# errors\n', b'{"errors": ']:
+        cache.store(repr(content), _response(200, content))
+        assert cache.lookup(repr(content))[0].content == content
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = httpcache.ResponseCache(str(tmp_path / 'http.sqlite'), max_bytes=25)
+    for key in 'abc':
+        cache.store(key, _response(200, b'x' * 10))
+        if key == 'b':
+            cache.lookup('a')
+    assert [cache.lookup(key)[0] is not None for key in 'abc'] == [True, False, True]
+
+
+class _Stream:
+    """An endless streamed body, counting the bytes read."""
+    def __init__(self):
+        self.read, self.closed = 0, False
+
+    def iter_content(self, chunk_size):
+        while True:
+            self.read += chunk_size
+            yield b'x' * chunk_size
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.mark.parametrize('max_bytes, read', [(0, 0), (10, 10), (100000, 2 * 65536)])
+def test_read_capped(max_bytes, read):
+    response = _Stream()
+    httpcache._read_capped(response, max_bytes)
+    assert (len(response._content), response.read, response.closed) == (max_bytes, read, True)
@@ -0,0 +1,48 @@
+"""Importing the crawler modules must be fast and have no side effects.
+
+Notebooks and worker processes import these modules only to call one of
+their helpers, so an import must not read credentials, create files or load
+heavy dependencies (numpy, pandas, tqdm, requests, pdfminer), which are
+imported on first use instead.  Every module is imported in fresh
+interpreters without a GitHub token and with an empty home directory.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Seconds an import may take (the fastest of `REPEAT`), well above the few milliseconds they take
+BUDGETS = {'tracing': 0.02,
+           'httpcache': 0.02,
+           'github_api_stats': 0.02,
+           'arxiv2github': 0.02}
+HEAVY = ['numpy', 'pandas', 'tqdm', 'requests', 'pdfminer']
+REPEAT = 5
+
+_CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'time': elapsed, 'loaded': [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+@pytest.mark.parametrize('module', list(BUDGETS))
+def test_import(module, tmp_path):
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = {key: value for key, value in os.environ.items()
+           if key not in ('GITHUB_TOKEN', 'NASA_OSS_STATS_CACHE_DIR', 'NASA_OSS_STATS_TRACE')}
+    env.update(HOME=str(tmp_path), PYTHONPATH=here)
+    times = []
+    for _ in range(REPEAT):
+        proc = subprocess.run([sys.executable, '-c', _CHILD.format(module=module, heavy=HEAVY)],
+                              env=env, cwd=str(tmp_path), capture_output=True, text=True)
+        assert proc.returncode == 0, proc.stderr
+        result = json.loads(proc.stdout)
+        assert result['loaded'] == []
+        times.append(result['time'])
+    assert os.listdir(str(tmp_path)) == []
+    assert min(times) < BUDGETS[module]
@@ -0,0 +1,39 @@
+import numpy as np
+
+from ledger import Ledger
+
+
+def test_resumes_after_a_line_cut_short(tmp_path):
+    path = str(tmp_path / 'ledger.jsonl')
+    with Ledger(path) as ledger:
+        ledger.record('a/b', {'stars': np.int64(3)})
+        ledger.record('c/d', None)
+    with open(path, 'a') as f:
+        f.write('{"key": "e/f", "res')
+    with Ledger(path) as ledger:
+        assert (list(ledger.keys()), ledger['a/b']) == (['a/b', 'c/d'], {'stars': 3})
+        ledger.record('e/f', {'stars': 1})
+    with Ledger(path) as ledger:
+        assert list(ledger.keys()) == ['a/b', 'c/d', 'e/f']
+
+
+def test_todo_keeps_the_order(tmp_path):
+    with Ledger(str(tmp_path / 'ledger.jsonl')) as ledger:
+        ledger.record('c/d', None)
+        repositories = [('e', 'f'), ('c', 'd'), ('a', 'b')]
+        assert ledger.todo(repositories, key='/'.join) == [('e', 'f'), ('a', 'b')]
+        assert ledger.todo(['e/f', 'c/d']) == ['e/f']
+
+
+def test_to_frame_skips_empty_results(tmp_path):
+    with Ledger(str(tmp_path / 'ledger.jsonl')) as ledger:
+        ledger.record('a', {'x': 1})
+        ledger.record('b', None)
+        ledger.record('c', {'x': 3})
+        ledger.record('a', {'x': 2})
+        assert ledger.to_frame()['x'].tolist() == [2, 3]
+        df = ledger.to_frame(keys=['c', 'b', 'z', 'a'], columns=['x', 'y'])
+        assert df['x'].tolist() == [3, 2] and df['y'].isna().all()
+        ledger.compact()
+    with open(str(tmp_path / 'ledger.jsonl')) as f:
+        assert len(f.readlines()) == 3
@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+import pipeline
+
+
+class Numbers(pipeline.Stage):
+    name = 'numbers'
+    output = 'numbers.csv'
+
+    def params(self):
+        return {'n': self.options.get('n') or 3}
+
+    def run(self, inbox, emit):
+        for number in range(self.params()['n']):
+            emit(number)
+        pd.DataFrame({'number': range(self.params()['n'])}).to_csv(self.path(self.output), index=False)
+
+    def replay(self):
+        return pd.read_csv(self.path(self.output))['number']
+
+
+class Squares(pipeline.Stage):
+    name = 'squares'
+    upstream = 'numbers'
+    output = 'squares.csv'
+
+    def run(self, inbox, emit):
+        pd.DataFrame({'square': [number ** 2 for number in inbox]}).to_csv(self.path(self.output), index=False)
+
+
+@pytest.fixture
+def stages(monkeypatch, tmp_path):
+    monkeypatch.setattr(pipeline, 'STAGES', {'numbers': Numbers, 'squares': Squares})
+    return str(tmp_path)
+
+
+def _plan(workdir, selected, **options):
+    stages = {name: cls(workdir, **options) for name, cls in pipeline.STAGES.items()}
+    return pipeline.plan(selected, stages, pipeline._load_state(workdir))
+
+
+def test_stages_are_abstract():
+    with pytest.raises(TypeError):
+        pipeline.Stage()
+
+
+def test_plan_skips_up_to_date_stages(stages):
+    assert pipeline.run(workdir=stages) == {'numbers': 'run', 'squares': 'run'}
+    assert _plan(stages, ['numbers', 'squares']) == {'numbers': 'skip', 'squares': 'skip'}
+    # New parameters run the stage again, and its downstream stage
+    assert _plan(stages, ['numbers', 'squares'], n=4) == {'numbers': 'run', 'squares': 'run'}
+    # A changed upstream output makes the downstream stage stale
+    pd.DataFrame({'number': [5]}).to_csv(stages + '/numbers.csv', index=False)
+    assert _plan(stages, ['numbers', 'squares']) == {'numbers': 'run', 'squares': 'run'}
+    assert _plan(stages, ['squares']) == {'numbers': 'replay', 'squares': 'run'}
+
+
+def test_replay_feeds_downstream_stages(stages):
+    with pytest.raises(FileNotFoundError):
+        pipeline.run(['squares'], workdir=stages)
+    pipeline.run(['numbers'], workdir=stages, n=4)
+    assert pipeline.run(['squares'], workdir=stages) == {'numbers': 'replay', 'squares': 'run'}
+    assert pd.read_csv(stages + '/squares.csv')['square'].tolist() == [0, 1, 4, 9]
+    # A skipped stage is replayed for a downstream stage which runs
+    assert pipeline.run(workdir=stages, n=4, force=['squares']) == {'numbers': 'skip', 'squares': 'run'}
+    assert pd.read_csv(stages + '/squares.csv')['square'].tolist() == [0, 1, 4, 9]
@@ -0,0 +1,44 @@
+import re
+
+import pytest
+
+import query_ads
+
+
+@pytest.fixture
+def ads(monkeypatch):
+    """Replaces ADS by a list of papers `{'id', 'text'}`; returns it and the searches sent."""
+    papers, searches = [], []
+
+    def search(params):
+        searches.append(params['q'])
+        terms = re.findall(r'"([^"]+)"', params['q'])
+        ids = re.findall(r'id:\(([^)]*)\)', params['q'])
+        docs = [paper for paper in papers if any(term in paper['text'] for term in terms)
+                and (not ids or str(paper['id']) in ids[0].split(' OR '))]
+        yield {'response': {'docs': [{'id': paper['id'], 'identifier': []} for paper in docs]},
+               'highlighting': {str(paper['id']): {'body': [paper['snippet']]} for paper in docs}}
+    monkeypatch.setattr(query_ads, '_search', search)
+    return papers, searches
+
+
+def test_terms_are_matched_as_whole_names(ads):
+    papers, _ = ads
+    papers.append({'id': 1, 'text': 'github.com/a/b-c', 'snippet': 'see <em>github.com/a/b</em>-c'})
+    papers.append({'id': 2, 'text': 'github.com/a/b.', 'snippet': 'see <em>GitHub.com/a/b</em>.'})
+    papers.append({'id': 3, 'text': 'github.com/a/b.io', 'snippet': 'see <em>github.com/a/b</em>.io'})
+    found = dict(query_ads.query_ads_many(['github.com/a/b', 'github.com/a/b-c'], fields=[]))
+    assert [paper['id'] for paper in found['github.com/a/b']] == [2]
+    assert [paper['id'] for paper in found['github.com/a/b-c']] == [1]
+
+
+def test_papers_without_snippets_are_attributed_by_bisection(ads):
+    papers, searches = ads
+    papers.append({'id': 1, 'text': 'github.com/a/b and github.com/a/q', 'snippet': 'no highlight'})
+    papers.append({'id': 2, 'text': 'github.com/a/f', 'snippet': ''})
+    terms = ['github.com/a/{}'.format(name) for name in 'bcdefghijklmnopq']
+    found = dict(query_ads.query_ads_many(terms, fields=[], batch_size=16))
+    assert {term: [paper['id'] for paper in found[term]] for term in terms if found[term]} == \
+        {'github.com/a/b': [1], 'github.com/a/f': [2], 'github.com/a/q': [1]}
+    # The batch search, then both halves of every group of 16, 8, 4 and 2 terms with a mention
+    assert len(searches) == 1 + 2 + 4 + 6 + 6
@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+import github_api_stats
+import githubwebstats
+import httpcache
+import refresh
+
+
+@pytest.fixture
+def tables(tmp_path, monkeypatch):
+    """Writes a snapshot of two repositories; returns the paths of both tables and of the index."""
+    monkeypatch.setattr(httpcache, '_default_cache', httpcache.ResponseCache(str(tmp_path / 'http.sqlite')))
+    api_filename, web_filename = str(tmp_path / 'github-api-stats.csv'), str(tmp_path / 'web.csv')
+    pd.DataFrame({'n_stars': [50, 7], 'pushedAt': ['2019-01-01T00:00:00Z', '2019-01-01T00:00:00Z'],
+                  'repository_name': ['b', 'd'], 'repository_owner': ['a', 'c']}).to_csv(api_filename)
+    pd.DataFrame({'github_url': ['github.com/a/b', 'github.com/c/d'], 'readme': [True, False]}).to_csv(
+        web_filename, index=False)
+    monkeypatch.setattr(github_api_stats, 'get_pushed_at_many',
+                        lambda repositories: ['2020-01-01T00:00:00Z'] * len(repositories))
+    monkeypatch.setattr(githubwebstats, 'github2stats',
+                        lambda urls: pd.DataFrame({'github_url': urls, 'readme': True}))
+    return api_filename, web_filename, str(tmp_path / 'contributors.npz')
+
+
+def test_failed_repositories_keep_their_stats(tables, monkeypatch):
+    api_filename, web_filename, index_filename = tables
+
+    def get_repo_stats_many(repositories, **kwargs):
+        return [{} if repo == ('a', 'b') else
+                {'n_stars': 8, 'pushedAt': '2020-01-01T00:00:00Z', 'repository_owner': 'c', 'repository_name': 'd'}
+                for repo in repositories]
+    monkeypatch.setattr(github_api_stats, 'get_repo_stats_many', get_repo_stats_many)
+    changed = refresh.refresh(['github.com/a/b', 'github.com/c/d'], api_filename, web_filename, index_filename)
+    assert changed == [('a', 'b'), ('c', 'd')]
+    api_stats = pd.read_csv(api_filename, index_col=0)
+    assert api_stats['n_stars'].tolist() == [50, 8]
+    assert api_stats['pushedAt'].tolist() == ['2019-01-01T00:00:00Z', '2020-01-01T00:00:00Z']
+
+
+def test_all_queries_failed(tables, monkeypatch):
+    api_filename, web_filename, index_filename = tables
+    before = pd.read_csv(api_filename, index_col=0)
+    monkeypatch.setattr(github_api_stats, 'get_repo_stats_many', lambda repositories, **kwargs: [{}, {}])
+    refresh.refresh(['github.com/a/b', 'github.com/c/d'], api_filename, web_filename, index_filename)
+    pd.testing.assert_frame_equal(pd.read_csv(api_filename, index_col=0), before, check_dtype=False)
@@ -0,0 +1,47 @@
+from rules import Ruleset
+
+
+def test_overlapping_paths_count_for_every_feature():
+    rules = {'ci': {'paths': ['.github/workflows/*.yml']},
+             'tests_ci': {'paths': ['.github/workflows/test.yml']}}
+    paths = {'.github/', '.github/workflows/test.yml'}
+    assert Ruleset(rules).evaluate(paths) == {'ci': True, 'tests_ci': True}
+    reversed_rules = dict(reversed(list(rules.items())))
+    assert Ruleset(reversed_rules).evaluate(paths) == {'tests_ci': True, 'ci': True}
+
+
+def test_globs_stop_at_slashes():
+    ruleset = Ruleset({'ci': {'paths': ['.github/workflows/*.yml']}, 'docs': {'paths': ['doc?/']}})
+    assert ruleset.evaluate({'.github/workflows/old/ci.yml', 'docs'}) == {'ci': False, 'docs': False}
+    assert ruleset.evaluate({'.github/workflows/ci.yml', 'docs/'}) == {'ci': True, 'docs': True}
+
+
+def test_readme_keywords_overlap_and_ignore_case():
+    ruleset = Ruleset({'examples': {'readme': ['examples']}, 'install': {'readme': ['example', 'pip ']},
+                       'docs': {'readme': ['readthedocs']}})
+    assert ruleset.evaluate([], readme='See the EXAMPLES, or pip install it.') == \
+        {'examples': True, 'install': True, 'docs': False}
+    assert ruleset.evaluate([], readme='One example.') == {'examples': False, 'install': True, 'docs': False}
+
+
+def test_readme_decides():
+    ruleset = Ruleset({'installation': {'paths': ['INSTALL'], 'readme': ['pip '], 'readme_decides': True}})
+    assert ruleset.evaluate({'INSTALL'}) == {'installation': True}
+    assert ruleset.evaluate({'INSTALL'}, readme='No instructions.') == {'installation': False}
+    assert ruleset.evaluate(set(), readme='pip install it') == {'installation': True}
+
+
+def test_pages():
+    ruleset = Ruleset({'fancy_docs': {'pages': ['https://{owner}.github.io/{repo}']}})
+    assert ruleset.pages(owner='a', repo='b') == ['https://a.github.io/b']
+    assert ruleset.evaluate([], pages=['https://a.github.io/b'], owner='a', repo='b') == {'fancy_docs': True}
+    assert ruleset.evaluate([], pages=['https://a.github.io/b'], owner='a', repo='c') == {'fancy_docs': False}
+
+
+def test_literal_and_wildcard_paths_overlap():
+    ruleset = Ruleset({'ci': {'paths': ['.github/workflows/*.yml', '.travis.yml']},
+                       'tests_ci': {'paths': ['.github/workflows/test?.yml', '.github/workflows/test.yml']},
+                       'config': {'paths': ['*.yml']}})
+    assert ruleset.evaluate({'.travis.yml'}) == {'ci': True, 'tests_ci': False, 'config': True}
+    assert ruleset.evaluate({'.github/workflows/test.yml'}) == {'ci': True, 'tests_ci': True, 'config': False}
+    assert ruleset.evaluate(iter(['.github/workflows/test1.yml'])) == {'ci': True, 'tests_ci': True, 'config': False}
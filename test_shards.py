@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+
+import shards
+
+
+def test_parse_shard():
+    assert shards.parse_shard('2/4') == (2, 4) and shards.parse_shard(None) is None
+    for shard in ['0/4', '5/4', '1-4', 'a/b']:
+        with pytest.raises(ValueError):
+            shards.parse_shard(shard)
+
+
+def test_spellings_land_in_the_same_shard():
+    keys = ['https://GitHub.com/Owner/Repo', ('Owner', 'Repo'), 'www.github.com/owner/repo ']
+    assert len({shards.shard_of(key, 7) for key in keys}) == 1
+    assert shards.shard_of('arXiv:1901.00001', 7) == shards.shard_of('1901.00001', 7)
+
+
+def test_select_partitions_the_items():
+    items = ['github.com/a/{}'.format(i) for i in range(50)]
+    selected = [shards.select(items, '{}/3'.format(i)) for i in range(1, 4)]
+    assert sorted(sum(selected, [])) == sorted(items)
+    assert shards.select(items, None) == items
+    assert shards.shard_path('out/x.csv', '1/4') == 'out/x.shard-1-of-4.csv'
+
+
+def _write_shards(filename, urls, count):
+    for shard in range(1, count + 1):
+        df = pd.DataFrame({'github_url': shards.select(urls, (shard, count)), 'stars': 1})
+        df.to_csv(shards.shard_path(filename, (shard, count)), index=False)
+
+
+def test_merge(tmp_path):
+    filename = str(tmp_path / 'repo_opensource_metrics.csv')
+    urls = ['https://github.com/a/{}'.format(i) for i in range(20)]
+    _write_shards(filename, urls, 3)
+    df = shards.merge(filename, 3, expected=urls)
+    assert sorted(df['github_url']) == sorted(urls)
+    assert pd.read_csv(filename).equals(df)
+    with pytest.raises(ValueError, match='expected keys are missing'):
+        shards.merge(filename, 3, expected=urls + ['https://github.com/a/missing'])
+
+
+def test_merge_rejects_shards_of_another_count(tmp_path):
+    filename = str(tmp_path / 'repo_opensource_metrics.csv')
+    urls = ['https://github.com/a/{}'.format(i) for i in range(20)]
+    _write_shards(filename, urls, 3)
+    for shard in range(1, 5):
+        pd.DataFrame({'github_url': urls, 'stars': 1}).to_csv(shards.shard_path(filename, (shard, 4)), index=False)
+    with pytest.raises(ValueError, match='--shard i/4'):
+        shards.merge(filename, 4)
+    with pytest.raises(ValueError, match='Shard 1/2 is missing'):
+        shards.merge(filename, 2)
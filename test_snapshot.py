@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import snapshot
+from contributors import ContributorIndex
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.mark.parametrize('value, parsed', [
+    ("['2101.00001v1', 'arXiv:2101.00002']", ['2101.00001v1', 'arXiv:2101.00002']),
+    ("['Astrophysics - Instrumentation' \"Sun's corona\"]", ['Astrophysics - Instrumentation', "Sun's corona"]),
+    ('[]', []),
+    (['a', np.str_('b')], ['a', 'b']),
+    (np.nan, None),
+])
+def test_parse_list(value, parsed):
+    assert snapshot._parse_list(value) == parsed
+
+
+def test_round_trip(tmp_path):
+    csv = pd.DataFrame({'github_url': ['github.com/A/b', 'github.com/c/d'], 'repo_name': ['b', 'd'],
+                        'mentions': [2, 0], 'n_unq_authors': [3.0, np.nan], 'n_unq_first_authors': [1, 0],
+                        'arxiv_ids': ["['1', '2']", np.nan], 'citation_count': [10, 0],
+                        'nasa_ack_mentions': [1, 0], 'unq_keywords': ["['x' 'y z']", '[]']})
+    csv.to_csv(tmp_path / 'repo_success_metrics.csv', index=False)
+    root = str(tmp_path / 'snapshots')
+    # Without a snapshot, the csv file is converted
+    converted = snapshot.read('success', root=root, workdir=str(tmp_path))
+    snapshot.write('success', csv, date='2026-01-02', root=root)
+    df = snapshot.read('success', root=root)
+    assert snapshot.dates('success', root) == ['2026-01-02']
+    assert df['repo'].tolist() == ['a/b', 'c/d']
+    assert str(df['n_unq_authors'].dtype) == 'Int64' and df['n_unq_authors'].isna().tolist() == [False, True]
+    assert [None if value is None else list(value) for value in df['arxiv_ids']] == [['1', '2'], None]
+    assert [list(value) for value in df['unq_keywords']] == [['x', 'y z'], []]
+    assert converted['unq_keywords'].tolist() == [['x', 'y z'], []]
+    assert snapshot.read('success', columns=['repo', 'mentions'], root=root).columns.tolist() == ['repo', 'mentions']
+
+
+def test_api_table_types(tmp_path):
+    csv = pd.DataFrame({'repository_owner': ['A', 'c'], 'repository_name': ['B', 'd'],
+                        'createdAt': ['2019-01-02T03:04:05Z', np.nan], 'pushedAt': [np.nan, '2020-01-01T00:00:00Z'],
+                        'pseudoLicense': [True, np.nan], 'n_stars': [50.0, np.nan], 'license': ['MIT', np.nan]})
+    snapshot.write('api', csv, date='2026-01-02', root=str(tmp_path))
+    df = snapshot.read('api', root=str(tmp_path))
+    assert df.columns.tolist() == list(snapshot.SCHEMAS['api'])
+    assert df['repo'].tolist() == ['a/b', 'c/d']
+    assert df['createdAt'][0] == pd.Timestamp('2019-01-02T03:04:05Z') and pd.isna(df['createdAt'][1])
+    assert df['pseudoLicense'].tolist()[0] is True and pd.isna(df['pseudoLicense'][1])
+    assert df['n_stars'].tolist()[0] == 50 and pd.isna(df['n_stars'][1]) and pd.isna(df['n_forks']).all()
+
+
+def test_contributors_round_trip(tmp_path):
+    index = ContributorIndex()
+    index.add('a/b', 'issues', ['x', 'y'])
+    index.add('c/d', 'pullRequests', ['y'])
+    snapshot.write_contributors(index, date='2026-01-02', root=str(tmp_path))
+    loaded = snapshot.read_contributors(root=str(tmp_path))
+    assert loaded.logins == index.logins and loaded.repos == index.repos
+    assert loaded.logins_of(loaded.ids('c/d')) == ['y'] and loaded.count('a/b') == 2
@@ -0,0 +1,282 @@
+"""Request-level tracing and per-stage timing of the crawlers.
+
+When tracing is enabled, every HTTP request sent through `httpcache` and
+every timed CPU stage (pdf parsing, url extraction, DataFrame assembly, ...)
+is appended as one JSON line to a trace file:
+
+* `http` events: endpoint class (e.g. "raw:setup.py", "graphql:PRs"),
+  status, latency, bytes received, cache hit/miss and retry number.
+* `span` events: name, wall and CPU time, and the "self" time which
+  excludes nested spans and requests.
+
+Events also carry the attributes set with `context`, e.g. the repository
+being crawled, so requests can be counted per repository.  Tracing is off
+unless the `NASA_OSS_STATS_TRACE` environment variable names a file or
+`enable` is called; worker processes inherit the setting.
+
+Example use
+-----------
+>>> tracing.enable('trace.jsonl')
+>>> githubwebstats.github2stats(urls)
+>>> tracing.print_summary('trace.jsonl')
+
+or `$ NASA_OSS_STATS_TRACE=trace.jsonl python refresh.py` followed by
+`$ python tracing.py trace.jsonl`.
+"""
+import contextvars
+import json
+import os
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from contextlib import contextmanager
+
+TRACE_ENV = 'NASA_OSS_STATS_TRACE'
+
+_path = os.environ.get(TRACE_ENV) or None
+_fd = None
+_fd_pid = None
+_lock = threading.Lock()
+_context = contextvars.ContextVar('tracing_context', default={})
+_stack = threading.local()
+
+
+def enable(path):
+    """Appends trace events to `path`, in this process and in worker processes started later."""
+    global _path
+    disable()
+    _path = path
+    os.environ[TRACE_ENV] = path
+
+
+def disable():
+    global _path, _fd
+    with _lock:
+        if _fd is not None and _fd_pid == os.getpid():
+            os.close(_fd)
+        _path, _fd = None, None
+    os.environ.pop(TRACE_ENV, None)
+
+
+def enabled():
+    return _path is not None
+
+
+def record(event, **fields):
+    """Appends an event, with the current `context` attributes, to the trace."""
+    global _fd, _fd_pid
+    if _path is None:
+        return
+    fields = dict(_context.get(), event=event, time=time.time(), pid=os.getpid(), **fields)
+    line = (json.dumps(fields, default=str) + '\n').encode()
+    with _lock:
+        if _fd is None or _fd_pid != os.getpid():
+            _fd, _fd_pid = os.open(_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644), os.getpid()
+        # A single write of an O_APPEND file, so that lines of concurrent processes do not mix
+        os.write(_fd, line)
+
+
+@contextmanager
+def context(**attrs):
+    """Adds `attrs` to the events recorded in this block (and in the tasks it starts)."""
+    if _path is None:
+        yield
+        return
+    token = _context.set({**_context.get(), **attrs})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def run_in_context(func):
+    """Returns `func` wrapped to run in a copy of the current context, e.g. on a thread pool."""
+    if _path is None:
+        return func
+    return _ContextCall(func)
+
+
+class _ContextCall:
+    # Every call runs in its own copy, as a context cannot be entered by two threads at once
+    def __init__(self, func):
+        self.func = func
+        self.context = contextvars.copy_context()
+
+    def __call__(self, *args, **kwargs):
+        return self.context.copy().run(self.func, *args, **kwargs)
+
+
+class Span:
+    """A timed block; see `span`.  Attributes can be added with `set` until it ends."""
+    def __init__(self, name, event, attrs):
+        self.name = name
+        self.event = event
+        self.attrs = attrs
+        self.children = 0.
+        self.cancelled = False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def cancel(self):
+        """Records nothing for this span, e.g. for a request which was not sent after all."""
+        self.cancelled = True
+
+    def __enter__(self):
+        stack = _stack.__dict__.setdefault('spans', [])
+        stack.append(self)
+        self.wall, self.cpu = time.perf_counter(), time.thread_time()
+        return self
+
+    def __exit__(self, *exc):
+        wall, cpu = time.perf_counter() - self.wall, time.thread_time() - self.cpu
+        stack = _stack.spans
+        stack.pop()
+        if self.cancelled:
+            return
+        if stack:
+            stack[-1].children += wall
+        record(self.event, name=self.name, wall=wall, cpu=cpu, self_wall=wall - self.children, **self.attrs)
+
+
+class _NullSpan:
+    def set(self, **attrs):
+        pass
+
+    def cancel(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, event='span', **attrs):
+    """Times a block of code as the stage `name`.
+
+    Spans nest: the time of inner spans (and of requests, which are spans
+    of their own) is subtracted from the `self_wall` time of the outer one.
+    """
+    if _path is None:
+        return _NULL_SPAN
+    return Span(name, event, attrs)
+
+
+def timed(iterable, name, **attrs):
+    """Yields from `iterable`, timing the production of its items as a single span `name`.
+
+    Useful for generators whose work is interleaved with their consumer's,
+    e.g. pdf pages parsed one at a time and searched as they come.
+    """
+    if _path is None:
+        yield from iterable
+        return
+    iterator = iter(iterable)
+    wall = cpu = 0.
+    try:
+        while True:
+            start, start_cpu = time.perf_counter(), time.thread_time()
+            try:
+                item = next(iterator)
+            finally:
+                wall += time.perf_counter() - start
+                cpu += time.thread_time() - start_cpu
+            yield item
+    except StopIteration:
+        pass
+    finally:
+        stack = getattr(_stack, 'spans', [])
+        if stack:
+            stack[-1].children += wall
+        record('span', name=name, wall=wall, cpu=cpu, self_wall=wall, **attrs)
+
+
+_GRAPHQL_OPERATION = re.compile(r'query\s+(\w+)')
+
+
+def endpoint(url, query=None):
+    """Classifies a url by service and probe, e.g. "raw:README.md" or "graphql:RepoTree"."""
+    parts = urllib.parse.urlsplit(url)
+    host, path = parts.hostname or '', parts.path.strip('/').split('/')
+    if host == 'api.github.com':
+        match = _GRAPHQL_OPERATION.search(query or '')
+        return 'graphql:' + match.group(1) if match else 'graphql'
+    if host in ('raw.github.com', 'raw.githubusercontent.com'):
+        return 'raw:' + '/'.join(path[3:])
+    if host == 'github.com':
+        return 'github:repo' if len(path) <= 2 else 'github:tree/' + '/'.join(path[4:])
+    if host.endswith('.github.io'):
+        return 'github.io'
+    if host == 'api.adsabs.harvard.edu':
+        return 'ads:search'
+    if host == 'arxiv.org':
+        return 'arxiv:pdf'
+    return host
+
+
+def load(path):
+    """Returns the events of a trace file as a DataFrame."""
+    import pandas as pd
+    with open(path) as f:
+        return pd.DataFrame([json.loads(line) for line in f if line.endswith('\n')])
+
+
+def summarize(path):
+    """Summarizes a trace file.
+
+    Returns
+    -------
+    endpoints : pandas.DataFrame
+        Per endpoint class: requests, p50/p95 latency [ms], cache hit
+        fraction, MB received, retries, errors and requests per repository.
+    repositories : pandas.DataFrame
+        Distribution of the number of requests (and cache misses) per repository.
+    stages : pandas.DataFrame
+        Per span name (requests count as "http"): calls, self time [s] and
+        share of the total self time.
+    """
+    import pandas as pd
+    events = load(path)
+    for column in ['event', 'repo', 'endpoint', 'cache', 'retry', 'status', 'name']:
+        if column not in events:
+            events[column] = None
+    http = events[events['event'] == 'http']
+    n_repos = http['repo'].nunique()
+    endpoints = http.groupby('endpoint').agg(
+        requests=('endpoint', 'size'),
+        p50_ms=('wall', lambda wall: 1e3 * wall.quantile(.5)),
+        p95_ms=('wall', lambda wall: 1e3 * wall.quantile(.95)),
+        cache_hits=('cache', lambda cache: (cache == 'hit').mean()),
+        MB=('bytes', lambda nbytes: nbytes.sum() / 1e6),
+        retries=('retry', lambda retry: (retry.fillna(0) > 0).sum()),
+        errors=('status', lambda status: (status.fillna(0) >= 500).sum()))
+    endpoints['per_repo'] = endpoints['requests'] / max(n_repos, 1)
+    endpoints = endpoints.sort_values('requests', ascending=False)
+
+    per_repo = http.dropna(subset=['repo']).groupby('repo')
+    counts = pd.DataFrame({'requests': per_repo.size(),
+                           'misses': per_repo['cache'].agg(lambda cache: (cache != 'hit').sum())})
+    repositories = counts.describe(percentiles=[.5, .95]).T
+
+    stages = events[events['event'].isin(['span', 'http'])].copy()
+    stages = stages.groupby('name').agg(calls=('name', 'size'), self_s=('self_wall', 'sum'))
+    stages['share'] = stages['self_s'] / stages['self_s'].sum()
+    return endpoints, repositories, stages.sort_values('self_s', ascending=False)
+
+
+def print_summary(path):
+    endpoints, repositories, stages = summarize(path)
+    for title, table in [('Requests by endpoint', endpoints), ('Requests per repository', repositories),
+                         ('Time by stage', stages)]:
+        print('\n' + title + '\n' + table.to_string(float_format='{:.3g}'.format))
+
+
+if __name__ == "__main__":
+    print_summary(sys.argv[1] if len(sys.argv) > 1 else os.environ[TRACE_ENV])